@@ -1,14 +1,26 @@
 from flask import Flask
+from database.Row import RowJSONProvider
 from blueprints.errorHandlers import error_handlers_blueprint
 from blueprints.routes import routes_blueprint
+from blueprints.api import api_blueprint
+from blueprints.commands import commands_blueprint
 
 app = Flask(__name__)
 
+# Serialize the row objects returned by the managers in JSON responses and the tojson filter
+app.json = RowJSONProvider(app)
+
 # Register the error handlers blueprint
 app.register_blueprint(error_handlers_blueprint)
 
 # Register the routes blueprint
 app.register_blueprint(routes_blueprint)
+
+# Register the JSON API blueprint
+app.register_blueprint(api_blueprint)
+
+# Register the CLI commands blueprint
+app.register_blueprint(commands_blueprint)
     
 # Listener
 if __name__ == "__main__":
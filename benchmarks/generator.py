@@ -0,0 +1,196 @@
+"""
+Generates a seeded synthetic dataset of students, courses with a prerequisite DAG, terms and student term plans for benchmarking
+
+Usage (from the repository root, with the .env file pointing at a scratch database loaded from DDL.SQL):
+  python -m benchmarks.generator --students 2000 --courses 300 --terms 12
+  python -m benchmarks.generator --clear
+
+Generated rows are tagged so they can be removed again without touching the sample data:
+students get IDs starting with "~", courses get codes starting with "BENCH" and terms get names starting with "Bench".
+"""
+import argparse
+import random
+from database.DatabaseManager import DatabaseManager
+from database.DataVersionManager import DataVersionManager
+
+# Real student IDs are made of letters and digits, so generated students can be found and deleted by a "~" prefix
+# without touching a real student whose ID happens to start with the same letter
+STUDENT_PREFIX = "~"
+COURSE_PREFIX = "BENCH"
+TERM_PREFIX = "Bench"
+
+# Rows per executemany call
+CHUNK_SIZE = 5000
+
+# Tables written, so a running app's query cache drops what it read before
+TABLES = ("Courses", "Courses_has_Prerequisites", "Terms", "Terms_has_Courses", "Students", "StudentTermPlans", "StudentTermPlans_has_Courses")
+
+def insert(dm: DatabaseManager, query: str, rows: list) -> None:
+  """
+  Inserts rows in chunks of CHUNK_SIZE with one multi-row statement per chunk
+
+  Arguments:
+    - dm (DatabaseManager): The database manager to insert with
+    - query (str): The INSERT query with one VALUES tuple
+    - rows (list): The parameter tuples to insert
+  """
+  for start in range(0, len(rows), CHUNK_SIZE):
+    status, result = dm.execute_query(query=query, parameters=rows[start:start + CHUNK_SIZE], method="commit", many=True)
+    if status != 200:
+      raise RuntimeError(f"Insert failed: {result}")
+
+def select(dm: DatabaseManager, query: str, parameters: tuple = None) -> list:
+  """
+  Runs a SELECT query and returns every row
+  """
+  status, result = dm.execute_query(query=query, parameters=parameters, method="fetchall")
+  if status != 200:
+    raise RuntimeError(f"Select failed: {result}")
+  return result
+
+def generate(
+  dm: DatabaseManager,
+  students: int = 2000,
+  courses: int = 300,
+  terms: int = 12,
+  plan_density: float = 0.75,
+  courses_per_plan: int = 3,
+  prerequisites_per_course: int = 2,
+  term_offering: float = 0.6,
+  seed: int = 340
+) -> dict:
+  """
+  Generates the dataset in one transaction
+  Prerequisites only point from a course to courses generated before it, so they always form a DAG.
+  Each term offers a random share of the catalog, and each plan only picks courses its term offers.
+
+  Arguments:
+    - dm (DatabaseManager): The database manager to insert with
+    - students (int, optional): The number of students
+    - courses (int, optional): The number of courses in the catalog
+    - terms (int, optional): The number of terms
+    - plan_density (float, optional): The share of terms each student has a plan for
+    - courses_per_plan (int, optional): The number of courses planned in each plan
+    - prerequisites_per_course (int, optional): The most prerequisites a course has
+    - term_offering (float, optional): The share of the catalog each term offers
+    - seed (int, optional): Seed for the random picks, so runs are repeatable
+
+  Returns:
+    - Dictionary with the number of rows generated per table
+  """
+  picker = random.Random(seed)
+
+  with dm.transaction():
+    insert(dm, "INSERT INTO Courses (code, name, credit) VALUES (%s, %s, %s)", [
+      (f"{COURSE_PREFIX} {number}", f"Benchmark Course {number}", picker.choice((3, 4, 4, 4)))
+      for number in range(courses)
+    ])
+    insert(dm, "INSERT INTO Terms (name, startDate, endDate) VALUES (%s, %s, %s)", [
+      (f"{TERM_PREFIX} {number:03}", f"{2000 + number}-01-01", f"{2000 + number}-03-31")
+      for number in range(terms)
+    ])
+    insert(dm, "INSERT INTO Students (studentID, firstName, lastName) VALUES (%s, %s, %s)", [
+      (f"{STUDENT_PREFIX}{number:08}", f"First{number}", f"Last{number % 1000:03}")
+      for number in range(students)
+    ])
+
+    # Courses in generation order, so a course's prerequisites can be drawn from the courses before it
+    course_ids = [row[0] for row in select(dm, "SELECT courseID FROM Courses WHERE code LIKE %s ORDER BY courseID", (f"{COURSE_PREFIX} %",))]
+    term_ids = [row[0] for row in select(dm, "SELECT termID FROM Terms WHERE name LIKE %s ORDER BY startDate", (f"{TERM_PREFIX} %",))]
+
+    prerequisites = [
+      (course_id, prerequisite_id)
+      for index, course_id in enumerate(course_ids)
+      for prerequisite_id in picker.sample(course_ids[:index], min(index, picker.randint(0, prerequisites_per_course)))
+    ]
+    insert(dm, "INSERT INTO Courses_has_Prerequisites (courseID, prerequisiteID) VALUES (%s, %s)", prerequisites)
+
+    offerings = {
+      term_id: picker.sample(course_ids, max(min(courses_per_plan, len(course_ids)), round(term_offering * len(course_ids))))
+      for term_id in term_ids
+    }
+    insert(dm, "INSERT INTO Terms_has_Courses (termID, courseID) VALUES (%s, %s)", [
+      (term_id, course_id)
+      for term_id, offered in offerings.items()
+      for course_id in offered
+    ])
+
+    plans_per_student = min(terms, max(1, round(plan_density * terms)))
+    insert(dm, "INSERT INTO StudentTermPlans (studentID, termID, advisorApproved) VALUES (%s, %s, %s)", [
+      (f"{STUDENT_PREFIX}{number:08}", term_id, picker.randint(0, 1))
+      for number in range(students)
+      for term_id in picker.sample(term_ids, plans_per_student)
+    ])
+
+    plans = select(dm, "SELECT studentTermPlanID, termID FROM StudentTermPlans WHERE studentID LIKE %s", (f"{STUDENT_PREFIX}%",))
+    plan_courses = [
+      (plan_id, course_id)
+      for plan_id, term_id in plans
+      for course_id in picker.sample(offerings[term_id], min(courses_per_plan, len(offerings[term_id])))
+    ]
+    insert(dm, "INSERT INTO StudentTermPlans_has_Courses (studentTermPlanID, courseID) VALUES (%s, %s)", plan_courses)
+
+    DataVersionManager(dm).bump(*TABLES)
+
+  return {
+    "Courses": courses,
+    "Courses_has_Prerequisites": len(prerequisites),
+    "Terms": terms,
+    "Terms_has_Courses": sum(len(offered) for offered in offerings.values()),
+    "Students": students,
+    "StudentTermPlans": len(plans),
+    "StudentTermPlans_has_Courses": len(plan_courses)
+  }
+
+def clear(dm: DatabaseManager) -> None:
+  """
+  Deletes every generated row; plans and plan courses are removed by the ON DELETE CASCADE foreign keys
+  """
+  with dm.transaction():
+    for query, parameter in (
+      ("DELETE FROM Students WHERE studentID LIKE %s", f"{STUDENT_PREFIX}%"),
+      ("DELETE FROM Terms WHERE name LIKE %s", f"{TERM_PREFIX} %"),
+      ("DELETE FROM Courses WHERE code LIKE %s", f"{COURSE_PREFIX} %")
+    ):
+      # A 400 status only means there was nothing to delete
+      dm.execute_query(query=query, parameters=(parameter,), method="commit")
+
+    DataVersionManager(dm).bump(*TABLES)
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+  """
+  Adds the dataset size options of generate to a command line parser, see options
+  """
+  parser.add_argument("--students", type=int, default=2000, help="students to generate")
+  parser.add_argument("--courses", type=int, default=300, help="courses to generate")
+  parser.add_argument("--terms", type=int, default=12, help="terms to generate")
+  parser.add_argument("--plan-density", type=float, default=0.75, help="share of terms each student has a plan for")
+  parser.add_argument("--courses-per-plan", type=int, default=3, help="courses planned in each plan")
+  parser.add_argument("--prerequisites-per-course", type=int, default=2, help="most prerequisites a course has")
+  parser.add_argument("--term-offering", type=float, default=0.6, help="share of the catalog each term offers")
+  parser.add_argument("--seed", type=int, default=340, help="seed for the random picks")
+
+def options(arguments: argparse.Namespace) -> dict:
+  """
+  Returns the generate keyword arguments from options added with add_arguments
+  """
+  return {
+    name: getattr(arguments, name)
+    for name in ("students", "courses", "terms", "plan_density", "courses_per_plan", "prerequisites_per_course", "term_offering", "seed")
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  add_arguments(parser)
+  parser.add_argument("--clear", action="store_true", help="delete the generated rows instead of generating them")
+  arguments = parser.parse_args()
+
+  dm = DatabaseManager()
+  clear(dm)
+
+  if not arguments.clear:
+    for table, count in generate(dm, **options(arguments)).items():
+      print(f"{table:<30}{count:>10}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,414 @@
+"""
+Closed-loop HTTP load test of a running deployment, e.g. one gunicorn worker serving app:app
+
+Usage (from the repository root, with the app running against a database loaded with benchmarks.generator):
+  gunicorn -w 1 -b 127.0.0.1:8000 app:app
+  python -m benchmarks.loadtest --url http://127.0.0.1:8000 --users 16 --duration 30
+  python -m benchmarks.loadtest --url http://127.0.0.1:8000 --ramp 1 2 4 8 16 32 64 --duration 15
+  python -m benchmarks.loadtest --mix plans=10 add-plan=5 approve=5 --users 8
+
+Every virtual user is a thread with its own keep-alive connection that sends its next request as soon as
+the previous one finishes (plus --think seconds), picking the action at random from the weighted --mix.
+The default mix is mostly listing pages, with add, edit and delete traffic on the JSON routes:
+  plans, students, courses:  GET /student-term-plans, /students and /courses
+  add-student, add-plan:     POST /add-student and /add-student-term-plan for the user's own new students
+  approve:                   PATCH /update-student-term-plan-advisor-approval on an existing plan
+  delete-student:            DELETE /delete-student of one of the user's own students, which deletes their plans
+Students created by the test get IDs starting with "~L", which no real student ID has, and whatever a user has left
+is deleted through the app when its stage ends; any student that could not be deleted is reported at the end of the run.
+
+Throughput and p50/p95/p99 latency are reported per route. With --ramp, every stage runs with more users
+until the error rate passes --max-error-rate (or p95 passes --max-p95), and the stage with the highest
+throughput before that is reported as the saturation point.
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, TypedDict
+from urllib.parse import urlsplit
+from benchmarks.timing import summarize
+
+# Prefix of the IDs of students created by the test; real student IDs are letters and digits only
+STUDENT_PREFIX = "~L"
+
+# Attempts at deleting each of a user's students when its stage ends
+CLEANUP_ATTEMPTS = 3
+
+# Route reported for each action
+ACTIONS = {
+  "plans": "GET /student-term-plans",
+  "students": "GET /students",
+  "courses": "GET /courses",
+  "add-student": "POST /add-student",
+  "add-plan": "POST /add-student-term-plan",
+  "approve": "PATCH /update-student-term-plan-advisor-approval",
+  "delete-student": "DELETE /delete-student"
+}
+
+# Relative weight of each action
+DEFAULT_MIX = {
+  "plans": 40,
+  "students": 20,
+  "courses": 20,
+  "add-student": 5,
+  "add-plan": 5,
+  "approve": 5,
+  "delete-student": 5
+}
+
+# Courses in each plan added by the test
+COURSES_PER_PLAN = 3
+
+# Most existing plan IDs kept for the approve action
+MAX_PLAN_IDS = 1000
+
+class Catalog(TypedDict):
+  terms: Dict[int, List[int]]
+  plan_ids: List[int]
+
+class Recorder:
+  """
+  Collects the latency and outcome of every request, per route, from all virtual users
+  """
+
+  def __init__(self):
+    """
+    Initializes the Recorder instance with no requests
+    """
+    self._lock = threading.Lock()
+    self.samples: Dict[str, List[float]] = {}
+    self.errors: Dict[str, int] = {}
+
+  def add(self, route: str, milliseconds: float, ok: bool) -> None:
+    """
+    Records one request
+
+    Arguments:
+      - route (str): The reported route, see ACTIONS
+      - milliseconds (float): How long the request took, including reading the response body
+      - ok (bool): Whether the request got a response with a status below 400
+    """
+    with self._lock:
+      self.samples.setdefault(route, []).append(milliseconds)
+      if not ok:
+        self.errors[route] = self.errors.get(route, 0) + 1
+
+def connect(url: str) -> http.client.HTTPConnection:
+  """
+  Opens a connection to the host and port of a URL
+  """
+  parts = urlsplit(url)
+  connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+  return connection_class(parts.hostname, parts.port, timeout=30)
+
+def discover(url: str) -> Catalog:
+  """
+  Reads the terms with their offered courses, and up to MAX_PLAN_IDS existing plan IDs, through the JSON API
+
+  Returns:
+    - Dictionary with the offered course IDs per term ID and the plan IDs
+  """
+  connection = connect(url)
+
+  def get(path: str):
+    connection.request("GET", path)
+    response = connection.getresponse()
+    body = response.read()
+    if response.status != 200:
+      raise SystemExit(f"GET {path} returned {response.status}")
+    return json.loads(body)
+
+  terms = {
+    term["id"]: [course["id"] for course in term["courses"]]
+    for term in get("/api/terms")["terms"]
+    if len(term["courses"]) >= COURSES_PER_PLAN
+  }
+  plan_ids = [plan["studentTermPlanID"] for plan in get("/api/student-term-plans")["student_term_plans"]][:MAX_PLAN_IDS]
+  connection.close()
+
+  if not terms or not plan_ids:
+    raise SystemExit(f"Need at least one term offering {COURSES_PER_PLAN} courses and one plan, load benchmarks.generator first")
+
+  return {"terms": terms, "plan_ids": plan_ids}
+
+class VirtualUser(threading.Thread):
+  """
+  Sends requests back to back until its stage ends, keeping track of the students it created
+  """
+
+  def __init__(self, url: str, catalog: Catalog, mix: Dict[str, int], think: float, recorder: Recorder, stop: threading.Event, seed: int):
+    """
+    Initializes the VirtualUser instance
+
+    Arguments:
+      - url (str): The base URL of the deployment
+      - catalog (Catalog): The terms and plans to send write traffic for, see discover
+      - mix (dict): The relative weight of each action, see DEFAULT_MIX
+      - think (float): Seconds to wait between requests
+      - recorder (Recorder): Where every request is recorded
+      - stop (Event): Set when the stage ends
+      - seed (int): Seed for the action and data picks
+    """
+    super().__init__(daemon=True)
+    self._url = url
+    self._catalog = catalog
+    self._actions = list(mix)
+    self._weights = list(mix.values())
+    self._think = think
+    self._recorder = recorder
+    self._stage_over = stop
+    self._random = random.Random(seed)
+    self._connection = connect(url)
+
+    # Created student ID -> whether it has a plan yet
+    self._students: Dict[str, bool] = {}
+
+  def request(self, method: str, path: str, body: dict = None, route: str = None) -> int:
+    """
+    Sends one request and records it under the route, reconnecting if the connection was dropped
+
+    Returns:
+      - int: The response status, or 0 if the request failed without a response
+    """
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    payload = json.dumps(body) if body is not None else None
+
+    start = time.perf_counter()
+    try:
+      self._connection.request(method, path, body=payload, headers=headers)
+      response = self._connection.getresponse()
+      response.read()
+      status = response.status
+    except (OSError, http.client.HTTPException):
+      self._connection.close()
+      self._connection = connect(self._url)
+      status = 0
+
+    if route:
+      self._recorder.add(route, (time.perf_counter() - start) * 1000, 0 < status < 400)
+    return status
+
+  def add_student(self) -> None:
+    """
+    Adds a new student owned by this user
+    """
+    student_id = f"{STUDENT_PREFIX}{uuid.uuid4().hex[:7]}"
+    body = {"student_id": student_id, "first_name": "Load", "last_name": "Test"}
+
+    if self.request("POST", "/add-student", body, ACTIONS["add-student"]) == 200:
+      self._students[student_id] = False
+
+  def add_plan(self) -> None:
+    """
+    Adds a plan for one of this user's students without one, or a student if there is none
+    """
+    student_ids = [student_id for student_id, has_plan in self._students.items() if not has_plan]
+    if not student_ids:
+      return self.add_student()
+
+    student_id = self._random.choice(student_ids)
+    term_id = self._random.choice(list(self._catalog["terms"]))
+    body = {
+      "student_id": student_id,
+      "term_id": term_id,
+      "advisor_approved": 0,
+      "courses": self._random.sample(self._catalog["terms"][term_id], COURSES_PER_PLAN)
+    }
+
+    if self.request("POST", "/add-student-term-plan", body, ACTIONS["add-plan"]) == 200:
+      self._students[student_id] = True
+
+  def approve(self) -> None:
+    """
+    Sets the advisor approval of an existing plan
+    """
+    body = {"student_term_plan_id": self._random.choice(self._catalog["plan_ids"]), "advisor_approved": self._random.randint(0, 1)}
+    self.request("PATCH", "/update-student-term-plan-advisor-approval", body, ACTIONS["approve"])
+
+  def delete_student(self) -> None:
+    """
+    Deletes one of this user's students, or adds a student if there is none
+    """
+    if not self._students:
+      return self.add_student()
+
+    student_id = self._random.choice(list(self._students))
+    if self.request("DELETE", "/delete-student", {"student_id": student_id}, ACTIONS["delete-student"]) == 200:
+      del self._students[student_id]
+
+  def run(self) -> None:
+    """
+    Sends requests picked from the mix until the stage ends
+    """
+    writes = {
+      "add-student": self.add_student,
+      "add-plan": self.add_plan,
+      "approve": self.approve,
+      "delete-student": self.delete_student
+    }
+
+    while not self._stage_over.is_set():
+      action = self._random.choices(self._actions, self._weights)[0]
+
+      if action in writes:
+        writes[action]()
+      else:
+        method, path = ACTIONS[action].split(" ")
+        self.request(method, path, route=ACTIONS[action])
+
+      if self._think:
+        time.sleep(self._think)
+
+  def cleanup(self) -> List[str]:
+    """
+    Deletes the students this user created, unrecorded, retrying a failed delete up to CLEANUP_ATTEMPTS times
+
+    Returns:
+      - List: The IDs of the students that could not be deleted
+    """
+    left = []
+    for student_id in list(self._students):
+      if not any(self.request("DELETE", "/delete-student", {"student_id": student_id}) == 200 for _ in range(CLEANUP_ATTEMPTS)):
+        left.append(student_id)
+    self._students.clear()
+    self._connection.close()
+    return left
+
+def run_stage(url: str, catalog: Catalog, mix: Dict[str, int], users: int, duration: float, think: float, seed: int) -> dict:
+  """
+  Runs users virtual users for duration seconds
+
+  Returns:
+    - Dictionary with the user count, the elapsed seconds, the totals and the per-route results
+  """
+  recorder = Recorder()
+  stop = threading.Event()
+  virtual_users = [VirtualUser(url, catalog, mix, think, recorder, stop, seed + number) for number in range(users)]
+
+  start = time.perf_counter()
+  for virtual_user in virtual_users:
+    virtual_user.start()
+
+  time.sleep(duration)
+  stop.set()
+  for virtual_user in virtual_users:
+    virtual_user.join()
+  elapsed = time.perf_counter() - start
+
+  left_students = [student_id for virtual_user in virtual_users for student_id in virtual_user.cleanup()]
+
+  routes = {
+    route: {"throughput": len(samples) / elapsed, "errors": recorder.errors.get(route, 0), **summarize(samples)}
+    for route, samples in sorted(recorder.samples.items())
+  }
+  requests = sum(len(samples) for samples in recorder.samples.values())
+  errors = sum(recorder.errors.values())
+
+  return {
+    "users": users,
+    "seconds": elapsed,
+    "requests": requests,
+    "errors": errors,
+    "error_rate": errors / requests if requests else 0.0,
+    "throughput": requests / elapsed,
+    "p95": summarize([sample for samples in recorder.samples.values() for sample in samples])["p95"] if requests else None,
+    "routes": routes,
+    "left_students": left_students
+  }
+
+def print_routes(stage: dict) -> None:
+  """
+  Prints the per-route results of a stage
+  """
+  print(f"{'route':<52}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+  for route, result in stage["routes"].items():
+    print(f"{route:<52}{result['n']:>10}{result['errors']:>8}{result['throughput']:>9.1f}{result['p50']:>10.1f}{result['p95']:>10.1f}{result['p99']:>10.1f}")
+  print(f"{'total':<52}{stage['requests']:>10}{stage['errors']:>8}{stage['throughput']:>9.1f}")
+
+def within_limits(stage: dict, max_error_rate: float, max_p95: float = None) -> bool:
+  """
+  Whether a stage stayed within the error rate and, if given, the p95 latency limit of a ramp
+  """
+  if stage["error_rate"] > max_error_rate:
+    return False
+  return not (max_p95 and stage["p95"] and stage["p95"] > max_p95)
+
+def parse_mix(values: List[str]) -> Dict[str, int]:
+  """
+  Parses action=weight pairs; actions that are not given get no traffic
+
+  Raises:
+    - argparse.ArgumentTypeError: If an action is unknown or a weight is not a non-negative integer
+  """
+  mix = {}
+  for value in values:
+    action, _, weight = value.partition("=")
+    if action not in ACTIONS or not weight.isdigit():
+      raise argparse.ArgumentTypeError(f"Invalid mix entry {value}, expected action=weight with action one of {', '.join(ACTIONS)}")
+    mix[action] = int(weight)
+
+  if not any(mix.values()):
+    raise argparse.ArgumentTypeError("The mix needs at least one action with a positive weight")
+  return mix
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the running deployment")
+  parser.add_argument("--users", type=int, default=8, help="concurrent virtual users, without --ramp")
+  parser.add_argument("--ramp", type=int, nargs="+", help="user counts to run one stage each with, in order")
+  parser.add_argument("--duration", type=float, default=30, help="seconds per stage")
+  parser.add_argument("--think", type=float, default=0, help="seconds each user waits between requests")
+  parser.add_argument("--mix", nargs="+", help="action=weight pairs replacing the default mix")
+  parser.add_argument("--max-error-rate", type=float, default=0.01, help="error rate that ends a ramp")
+  parser.add_argument("--max-p95", type=float, help="p95 latency in milliseconds that ends a ramp")
+  parser.add_argument("--seed", type=int, default=340, help="seed for the action and data picks")
+  parser.add_argument("--output", help="write every stage's results as JSON to this file")
+  arguments = parser.parse_args()
+
+  try:
+    mix = parse_mix(arguments.mix) if arguments.mix else DEFAULT_MIX
+  except argparse.ArgumentTypeError as error:
+    parser.error(str(error))
+
+  catalog = discover(arguments.url)
+  stages = []
+
+  if not arguments.ramp:
+    stages.append(run_stage(arguments.url, catalog, mix, arguments.users, arguments.duration, arguments.think, arguments.seed))
+    print_routes(stages[0])
+
+  else:
+    print(f"{'users':>6}{'requests':>10}{'errors':>8}{'error %':>9}{'req/s':>9}{'p95 ms':>10}")
+    for users in arguments.ramp:
+      stage = run_stage(arguments.url, catalog, mix, users, arguments.duration, arguments.think, arguments.seed)
+      stages.append(stage)
+      p95 = f"{stage['p95']:.1f}" if stage["p95"] is not None else "-"
+      print(f"{users:>6}{stage['requests']:>10}{stage['errors']:>8}{stage['error_rate']:>9.2%}{stage['throughput']:>9.1f}{p95:>10}")
+      sys.stdout.flush()
+
+      if not within_limits(stage, arguments.max_error_rate, arguments.max_p95):
+        break
+
+    healthy = [stage for stage in stages if within_limits(stage, arguments.max_error_rate, arguments.max_p95)]
+    if healthy:
+      best = max(healthy, key=lambda stage: stage["throughput"])
+      print(f"\nsaturation: {best['throughput']:.1f} req/s with {best['users']} users")
+      print_routes(best)
+    else:
+      print("\nthe first stage already exceeded the limits")
+
+  left_students = [student_id for stage in stages for student_id in stage["left_students"]]
+  if left_students:
+    print(f"\n{len(left_students)} students created by the test could not be deleted: {', '.join(left_students)}", file=sys.stderr)
+
+  if arguments.output:
+    with open(arguments.output, "w", encoding="utf-8") as file:
+      json.dump({"url": arguments.url, "mix": mix, "duration": arguments.duration, "think": arguments.think, "stages": stages}, file, indent=2)
+
+if __name__ == "__main__":
+  main()
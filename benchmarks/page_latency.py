@@ -0,0 +1,69 @@
+"""
+Measures listing page latency with and without reconnecting to MySQL on every request
+
+Usage (from the repository root, with the .env file pointing at a loaded database):
+  python -m benchmarks.page_latency
+  python -m benchmarks.page_latency --requests 500 --routes /courses /students
+
+The "reconnect" mode reproduces the old behaviour of closing the connection at the start of every page view.
+The "reuse" mode keeps pooled connections open and relies on the read freshness mode for up-to-date reads.
+"""
+import argparse
+import time
+from app import app
+from blueprints.routes import dm
+from benchmarks.timing import summarize
+
+LISTING_ROUTES = ["/courses", "/terms", "/student-term-plans", "/students"]
+
+def measure(route: str, requests: int, reconnect: bool) -> dict:
+  """
+  Issues GET requests against a route through the Flask test client and records their latency
+  Each sample includes reading the whole body, since a streamed page only renders its rows and runs its queries as the body is read
+
+  Arguments:
+    - route (str): The route to request
+    - requests (int): The number of timed requests
+    - reconnect (bool): Whether every request has to open a new connection
+
+  Returns:
+    - Dictionary with the mean, p50, p95, min and max latency in milliseconds, see summarize
+  """
+  client = app.test_client()
+  samples = []
+
+  # Warm up templates and the connection pool
+  response = client.get(route)
+  response.get_data()
+  response.close()
+
+  for _ in range(requests):
+    if reconnect:
+      # Close the idle pooled connections so the request has to open a new one
+      dm._pool.close_all()
+
+    start = time.perf_counter()
+    response = client.get(route)
+    response.get_data()
+    response.close()
+    samples.append((time.perf_counter() - start) * 1000)
+
+    if response.status_code != 200:
+      raise RuntimeError(f"GET {route} returned {response.status_code}")
+
+  return summarize(samples)
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--requests", type=int, default=200, help="timed requests per route and mode")
+  parser.add_argument("--routes", nargs="+", default=LISTING_ROUTES, help="routes to measure")
+  arguments = parser.parse_args()
+
+  print(f"{'route':<22}{'mode':<11}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+  for route in arguments.routes:
+    for mode, reconnect in (("reconnect", True), ("reuse", False)):
+      result = measure(route, arguments.requests, reconnect)
+      print(f"{route:<22}{mode:<11}{result['mean']:>10.2f}{result['p50']:>10.2f}{result['p95']:>10.2f}{result['max']:>10.2f}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,110 @@
+"""
+Compares the student term plan listing query before and after replacing the correlated subquery with joins
+
+Usage (from the repository root, with the .env file pointing at a scratch database loaded from DDL.SQL):
+  python -m benchmarks.plan_listing --generate
+  python -m benchmarks.plan_listing --repeat 10
+
+--generate first loads 100k plan-course rows with benchmarks.generator.
+Both queries are EXPLAINed before they are timed; the run fails if the join-based query still has a dependent subquery.
+"""
+import argparse
+import statistics
+import time
+from benchmarks import generator
+from database.DatabaseManager import DatabaseManager
+from database.QueryManager import QueryManager
+
+# The listing query as it was, with one dependent subquery per plan-course row and no empty plans
+CORRELATED_QUERY = """
+  SELECT
+    stp.studentTermPlanID,
+    stp.studentID,
+    CONCAT(s.firstName, ' ', s.lastName) as studentName,
+    t.name as termName,
+    GROUP_CONCAT((SELECT CONCAT(code, ' ', name) FROM Courses WHERE courseID = stpc.courseID) ORDER BY stpc.courseID ASC SEPARATOR ', ') AS courses,
+    CASE WHEN stp.advisorApproved = 1 THEN 'Yes' ELSE 'No' End AS advisorApproved
+  FROM StudentTermPlans stp
+  INNER JOIN Terms t ON stp.termID = t.termID
+  INNER JOIN Students s ON s.studentID = stp.studentID
+  INNER JOIN StudentTermPlans_has_Courses stpc ON stp.studentTermPlanID = stpc.studentTermPlanID
+  GROUP BY stp.studentTermPlanID
+  ORDER BY stp.studentTermPlanID ASC
+"""
+
+def run(dm: DatabaseManager, query: str, parameters: tuple = None) -> list:
+  """
+  Runs a SELECT query and returns every row
+  """
+  status, result = dm.execute_query(query=query, parameters=parameters, method="fetchall")
+  if status != 200:
+    raise RuntimeError(f"Query failed: {result}")
+  return result
+
+def explain(dm: DatabaseManager, name: str, query: str, parameters: tuple = None) -> list:
+  """
+  Prints the EXPLAIN plan of a query and returns its select types
+
+  Arguments:
+    - dm (DatabaseManager): The database manager to query with
+    - name (str): The label to print above the plan
+    - query (str): The query to explain
+    - parameters (tuple, optional): The query parameters
+  """
+  rows = run(dm, "EXPLAIN " + query, parameters)
+
+  print(f"EXPLAIN {name}")
+  print(f"  {'id':<4}{'select_type':<22}{'table':<10}{'type':<8}{'key':<16}{'rows':>10}")
+  for row in rows:
+    print(f"  {row[0]!s:<4}{row[1]!s:<22}{row[2]!s:<10}{row[3]!s:<8}{row[5]!s:<16}{row[8]!s:>10}")
+  print()
+
+  return [row[1] for row in rows]
+
+def measure(dm: DatabaseManager, query: str, parameters: tuple, repeat: int) -> dict:
+  """
+  Times a query end to end, including fetching every row
+
+  Returns:
+    - Dictionary with the row count and the mean, p50 and min latency in milliseconds
+  """
+  samples = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    rows = run(dm, query, parameters)
+    samples.append((time.perf_counter() - start) * 1000)
+
+  return {"rows": len(rows), "mean": statistics.fmean(samples), "p50": statistics.median(samples), "min": min(samples)}
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--generate", action="store_true", help="load the generated dataset before measuring")
+  parser.add_argument("--plan-courses", type=int, default=100000, help="plan-course rows to generate with --generate")
+  parser.add_argument("--repeat", type=int, default=5, help="timed runs per query")
+  arguments = parser.parse_args()
+
+  dm = DatabaseManager()
+  qm = QueryManager(dm)
+
+  if arguments.generate:
+    generator.clear(dm)
+    # Every student plans every term, so the plan-course count is students * terms * courses per plan
+    generator.generate(dm, students=max(1, arguments.plan_courses // (12 * 4)), terms=12, plan_density=1.0, courses_per_plan=4)
+
+  joined_query, joined_parameters = qm._studentTermPlans._all_query()
+
+  explain(dm, "correlated", CORRELATED_QUERY)
+  if "DEPENDENT SUBQUERY" in explain(dm, "joined", joined_query, joined_parameters):
+    raise SystemExit("The join-based listing query still contains a dependent subquery")
+
+  print(f"{'query':<14}{'rows':>10}{'mean ms':>12}{'p50 ms':>12}{'min ms':>12}")
+  results = {}
+  for name, query, parameters in (("correlated", CORRELATED_QUERY, None), ("joined", joined_query, joined_parameters)):
+    results[name] = measure(dm, query, parameters, arguments.repeat)
+    result = results[name]
+    print(f"{name:<14}{result['rows']:>10}{result['mean']:>12.2f}{result['p50']:>12.2f}{result['min']:>12.2f}")
+
+  print(f"\nspeedup (p50): {results['correlated']['p50'] / results['joined']['p50']:.2f}x")
+
+if __name__ == "__main__":
+  main()
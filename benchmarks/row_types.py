@@ -0,0 +1,161 @@
+"""
+Compares the memory and build time of the managers' row objects with the per-row dictionaries they replaced
+
+Usage (from the repository root, with the .env file pointing at a scratch database loaded from DDL.SQL):
+  python -m benchmarks.row_types --generate --students 20000
+  python -m benchmarks.row_types --repeat 10
+
+Each listing query is run once; its result tuples are then turned into dictionaries and into row objects repeat times.
+Memory is the size of the built list as measured by tracemalloc, and JSON is the time to serialize it with the app's JSON provider.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable
+from app import app
+from blueprints.routes import dm, qm
+from benchmarks import generator
+from benchmarks.timing import summarize
+from database.CourseManager import CourseWithPrerequisites, CourseDetail
+from database.StudentManager import StudentFormatted
+from database.StudentTermPlanManager import StudentTermPlan, StudentTermPlanWithCourseDetails
+
+NESTED_PLANS_QUERY = """
+  SELECT
+    stp.studentTermPlanID, stp.studentID, CONCAT(s.firstName, ' ', s.lastName), t.termID, t.name, stp.advisorApproved,
+    c.courseID, c.code, c.name, c.credit
+  FROM StudentTermPlans stp
+  INNER JOIN Terms t ON stp.termID = t.termID
+  INNER JOIN Students s ON s.studentID = stp.studentID
+  LEFT JOIN StudentTermPlans_has_Courses stpc ON stp.studentTermPlanID = stpc.studentTermPlanID
+  LEFT JOIN Courses c ON stpc.courseID = c.courseID
+  ORDER BY stp.studentTermPlanID ASC, c.courseID ASC
+"""
+
+COURSES_QUERY = """
+  SELECT c.courseID, CONCAT(c.code, ' ', c.name), c.credit, GROUP_CONCAT(CONCAT(pc.code, ' ', pc.name) ORDER BY pc.code SEPARATOR ', ')
+  FROM Courses c
+  LEFT JOIN Courses_has_Prerequisites p ON c.courseID = p.courseID
+  LEFT JOIN Courses pc ON p.prerequisiteID = pc.courseID
+  GROUP BY c.courseID
+  ORDER BY c.code ASC
+"""
+
+STUDENTS_QUERY = """
+  SELECT CONCAT(lastName, ', ', firstName, ' - ', studentID), studentID
+  FROM Students
+  ORDER BY lastName ASC, studentID ASC
+"""
+
+def plan_dicts(rows: tuple) -> list:
+  return [
+    {"studentTermPlanID": row[0], "studentID": row[1], "studentName": row[2], "termName": row[3], "courses": row[4], "advisorApproved": row[5]}
+    for row in rows
+  ]
+
+def plan_rows(rows: tuple) -> list:
+  return [StudentTermPlan(*row) for row in rows]
+
+def nested_plan_dicts(rows: tuple) -> list:
+  plans = []
+  for _, group in groupby(rows, key=itemgetter(0)):
+    group = list(group)
+    plans.append({
+      "studentTermPlanID": group[0][0],
+      "studentID": group[0][1],
+      "studentName": group[0][2],
+      "termID": group[0][3],
+      "termName": group[0][4],
+      "advisorApproved": bool(group[0][5]),
+      "courses": [{"id": row[6], "code": row[7], "name": row[8], "credit": row[9]} for row in group if row[6] is not None]
+    })
+  return plans
+
+def nested_plan_rows(rows: tuple) -> list:
+  plans = []
+  for _, group in groupby(rows, key=itemgetter(0)):
+    group = list(group)
+    plans.append(StudentTermPlanWithCourseDetails(
+      *group[0][:5],
+      advisorApproved=bool(group[0][5]),
+      courses=[CourseDetail(*row[6:10]) for row in group if row[6] is not None]
+    ))
+  return plans
+
+def course_dicts(rows: tuple) -> list:
+  return [{"id": row[0], "course": row[1], "credit": row[2], "prerequisites": row[3]} for row in rows]
+
+def course_rows(rows: tuple) -> list:
+  return [CourseWithPrerequisites(*row) for row in rows]
+
+def student_dicts(rows: tuple) -> list:
+  return [{"student": row[0], "studentID": row[1]} for row in rows]
+
+def student_rows(rows: tuple) -> list:
+  return [StudentFormatted(*row) for row in rows]
+
+def measure(build: Callable[[tuple], list], rows: tuple, repeat: int) -> dict:
+  """
+  Builds the list repeat times and serializes it once
+
+  Returns:
+    - Dictionary with the build and JSON latency in milliseconds and the list's size in KiB
+  """
+  # Start every shape without garbage left over from the previous one
+  gc.collect()
+
+  samples = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    build(rows)
+    samples.append((time.perf_counter() - start) * 1000)
+
+  tracemalloc.start()
+  built = build(rows)
+  size = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+
+  with app.app_context():
+    start = time.perf_counter()
+    app.json.dumps(built)
+    json_ms = (time.perf_counter() - start) * 1000
+
+  return {"build": summarize(samples), "json_ms": json_ms, "kib": size / 1024}
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--generate", action="store_true", help="replace the generated dataset before measuring")
+  generator.add_arguments(parser)
+  parser.add_argument("--repeat", type=int, default=5, help="timed builds per listing and shape")
+  arguments = parser.parse_args()
+
+  if arguments.generate:
+    generator.clear(dm)
+    generator.generate(dm, **generator.options(arguments))
+
+  listings = (
+    ("plans", generator.select(dm, *qm._studentTermPlans._all_query()), plan_dicts, plan_rows),
+    ("nested plans", generator.select(dm, NESTED_PLANS_QUERY), nested_plan_dicts, nested_plan_rows),
+    ("courses", generator.select(dm, COURSES_QUERY), course_dicts, course_rows),
+    ("students", generator.select(dm, STUDENTS_QUERY), student_dicts, student_rows)
+  )
+
+  if not all(rows for _, rows, _, _ in listings):
+    raise SystemExit("Every listing needs rows, run with --generate first")
+
+  print(f"{'listing':<14}{'shape':<7}{'rows':>9}{'build p50 ms':>14}{'json ms':>10}{'KiB':>10}")
+  for name, rows, build_dicts, build_rows in listings:
+    results = {}
+    for shape, build in (("dict", build_dicts), ("row", build_rows)):
+      results[shape] = measure(build, rows, arguments.repeat)
+      result = results[shape]
+      print(f"{name:<14}{shape:<7}{len(rows):>9}{result['build']['p50']:>14.2f}{result['json_ms']:>10.2f}{result['kib']:>10.0f}")
+
+    print(f"{'':<14}{'row/dict':<16}{results['row']['build']['p50'] / results['dict']['build']['p50']:>14.2f}"
+          f"{results['row']['json_ms'] / results['dict']['json_ms']:>10.2f}{results['row']['kib'] / results['dict']['kib']:>10.2f}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,386 @@
+"""
+Times every manager method and every page and API endpoint against a generated dataset and emits the results as JSON
+
+Usage (from the repository root, with the .env file pointing at a scratch MySQL/MariaDB database loaded from DDL.SQL):
+  python -m benchmarks.suite --generate --students 2000 --output results.json
+  python -m benchmarks.suite --repeat 50 --baseline results.json
+  python -m benchmarks.suite --only courses. /api/
+
+--generate first replaces the generated dataset, see benchmarks.generator; the size options are the generator's.
+Manager reads are timed cold, with the query cache and the prerequisite graph dropped before every call.
+Manager writes run in a transaction that is rolled back after every call, so the dataset does not drift.
+Routes are timed through the Flask test client as they are served, with the query cache on.
+Write routes commit, so they only touch generated rows and generated rows are deleted once the run is done.
+
+The JSON document is written to stdout, or to --output, and a summary table to stderr.
+With --baseline, every result also gets the baseline p50 and the relative change, so runs can be compared over time.
+"""
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, TypedDict
+from app import app
+from blueprints.routes import dm, qm
+from benchmarks import generator
+from benchmarks.timing import summarize
+
+# Result kinds
+KIND_READ = "manager-read"
+KIND_WRITE = "manager-write"
+KIND_ROUTE = "route"
+
+class Case(TypedDict):
+  name: str
+  kind: str
+  setup: Callable
+  run: Callable
+
+class Rollback(Exception):
+  """
+  Raised after a timed manager write to roll its transaction back
+  """
+
+# Suffixes for the rows written by the benchmark itself, unique within a run
+serial = itertools.count()
+
+def sample() -> dict:
+  """
+  Picks generated rows to run the cases against
+
+  Returns:
+    - Dictionary with a course code and IDs, a term ID and name, a student ID and a plan with its courses
+  """
+  def first(query: str, parameters: tuple) -> tuple:
+    rows = generator.select(dm, query + " LIMIT 1", parameters)
+    if not rows:
+      raise SystemExit("No generated data found, run with --generate first")
+    return rows[0]
+
+  course_code, = first("SELECT code FROM Courses WHERE code LIKE %s ORDER BY courseID DESC", (f"{generator.COURSE_PREFIX} %",))
+  term_id, term_name = first("SELECT termID, name FROM Terms WHERE name LIKE %s ORDER BY termID", (f"{generator.TERM_PREFIX} %",))
+  plan_id, student_id, plan_term_id = first(
+    "SELECT studentTermPlanID, studentID, termID FROM StudentTermPlans WHERE studentID LIKE %s ORDER BY studentTermPlanID",
+    (f"{generator.STUDENT_PREFIX}%",)
+  )
+
+  course_ids = [row[0] for row in generator.select(dm, "SELECT courseID FROM Courses WHERE code LIKE %s ORDER BY courseID", (f"{generator.COURSE_PREFIX} %",))]
+  plan_course_ids = [row[0] for row in generator.select(dm, "SELECT courseID FROM StudentTermPlans_has_Courses WHERE studentTermPlanID = %s", (plan_id,))]
+
+  return {
+    "course_code": course_code,
+    "course_ids": course_ids,
+    "term_id": term_id,
+    "term_season": term_name.split(" ")[0],
+    "term_year": term_name.split(" ")[1],
+    "plan_term_id": plan_term_id,
+    "student_id": student_id,
+    "plan_id": plan_id,
+    "plan_course_ids": plan_course_ids,
+    "free_course_ids": [course_id for course_id in course_ids if course_id not in plan_course_ids]
+  }
+
+def make_course() -> str:
+  """
+  Creates a generated course and returns its code
+  """
+  code = f"{generator.COURSE_PREFIX} W{next(serial)}"
+  qm._courses.create(code, "Benchmark Write Course", 4)
+  return code
+
+def make_term() -> tuple:
+  """
+  Creates a generated term and returns its season, year and ID
+  """
+  season, year = generator.TERM_PREFIX, f"W{next(serial)}"
+  qm._terms.create(season, year, "2099-01-01", "2099-03-31")
+  return season, year, qm._terms.get(season, year)[0]
+
+def make_student() -> str:
+  """
+  Creates a generated student and returns their ID
+  """
+  student_id = f"{generator.STUDENT_PREFIX}W{next(serial):07}"
+  qm._students.create(student_id, "Benchmark", "Write")
+  return student_id
+
+def make_plan(data: dict) -> int:
+  """
+  Creates a plan with two courses for a new generated student and returns its ID
+  """
+  student_id = make_student()
+  qm._studentTermPlans.create(student_id, data["term_id"], 0)
+  qm._studentTermPlans.add_courses(data["course_ids"][:2], student_id=student_id, term_id=data["term_id"])
+  return qm._studentTermPlans.get(student_id, data["term_id"])
+
+def reset_caches() -> tuple:
+  """
+  Drops the query cache and the prerequisite graph so the next read goes to the database
+  """
+  qm._cache.clear()
+  qm._courses._prerequisite_graph = None
+  return ()
+
+def manager_cases(data: dict) -> List[Case]:
+  """
+  Builds a case for every manager method
+  Reads reset the caches in their setup; writes create what they need in their setup, inside the rolled-back transaction
+  """
+  courses, terms, students, plans = qm._courses, qm._terms, qm._students, qm._studentTermPlans
+  new_course_ids = data["free_course_ids"][:2]
+
+  def read(name: str, run: Callable) -> Case:
+    return {"name": name, "kind": KIND_READ, "setup": reset_caches, "run": run}
+
+  def write(name: str, run: Callable, setup: Callable = lambda: ()) -> Case:
+    return {"name": name, "kind": KIND_WRITE, "setup": setup, "run": run}
+
+  return [
+    read("courses.all", lambda: courses.all()),
+    read("courses.all(with_prerequisites)", lambda: courses.all(with_prerequisites=True)),
+    read("courses.all_nested", lambda: courses.all_nested()),
+    read("courses.get", lambda: courses.get(data["course_code"])),
+    read("courses.prerequisite_graph", lambda: courses.prerequisite_graph()),
+    write("courses.create", lambda: courses.create(f"{generator.COURSE_PREFIX} W{next(serial)}", "Benchmark Write Course", 4)),
+    write("courses.add_prerequisites", lambda code: courses.add_prerequisites(code, data["course_ids"][:2]), lambda: (make_course(),)),
+
+    read("terms.all", lambda: terms.all()),
+    read("terms.all_nested", lambda: terms.all_nested()),
+    read("terms.all_nested(term_id)", lambda: terms.all_nested(data["term_id"])),
+    read("terms.get", lambda: terms.get(data["term_season"], data["term_year"])),
+    write("terms.create", lambda: terms.create(generator.TERM_PREFIX, f"W{next(serial)}", "2099-01-01", "2099-03-31")),
+    write("terms.add_courses", lambda season, year, term_id: terms.add_courses(data["course_ids"][:10], term_id=term_id), make_term),
+
+    read("students.all", lambda: students.all()),
+    read("students.all(is_formatted)", lambda: students.all(is_formatted=True)),
+    read("students.all(limit)", lambda: students.all(limit=101)),
+    read("students.get", lambda: students.get(data["student_id"])),
+    write("students.create", lambda: students.create(f"{generator.STUDENT_PREFIX}W{next(serial):07}", "Benchmark", "Write")),
+    write("students.update", lambda: students.update("Benchmark", "Updated", data["student_id"])),
+    write("students.delete", lambda: students.delete(data["student_id"])),
+
+    read("studentTermPlans.all", lambda: plans.all()),
+    read("studentTermPlans.all(limit)", lambda: plans.all(limit=101)),
+    read("studentTermPlans.all(student_id)", lambda: plans.all(student_id=data["student_id"])),
+    read("studentTermPlans.all_nested", lambda: plans.all_nested()),
+    read("studentTermPlans.all_nested(student_term_plan_id)", lambda: plans.all_nested(data["plan_id"])),
+    read("studentTermPlans.get", lambda: plans.get(data["student_id"], data["plan_term_id"])),
+    write("studentTermPlans.create", lambda student_id: plans.create(student_id, data["term_id"], 0), lambda: (make_student(),)),
+    write("studentTermPlans.add_courses", lambda: plans.add_courses(new_course_ids, student_term_plan_id=data["plan_id"])),
+    write("studentTermPlans.update_courses", lambda: plans.update_courses(data["plan_id"], list(zip(data["plan_course_ids"], new_course_ids)))),
+    write("studentTermPlans.update_approval", lambda: plans.update_approval(data["plan_id"], 1)),
+    write("studentTermPlans.remove_courses", lambda: plans.remove_courses(data["plan_id"], data["plan_course_ids"])),
+    write("studentTermPlans.delete", lambda: plans.delete(data["plan_id"])),
+
+    read("planValidator.validate", lambda: qm._planValidator.validate(data["student_id"]))
+  ]
+
+def route_cases(data: dict, client) -> List[Case]:
+  """
+  Builds a case for every routes.py and api.py endpoint
+  Every case returns the response, which must not be an error
+  """
+  plan_id = data["plan_id"]
+
+  def route(name: str, run: Callable, setup: Callable = lambda: ()) -> Case:
+    return {"name": name, "kind": KIND_ROUTE, "setup": setup, "run": run}
+
+  def get(path: str) -> Case:
+    return route(f"GET {path}", lambda: client.get(path))
+
+  def new_plan() -> tuple:
+    plan = make_plan(data)
+    return plan, data["course_ids"][0]
+
+  return [
+    get("/"),
+    get("/courses"),
+    get("/terms"),
+    get("/students"),
+    get("/student-term-plans"),
+    get(f"/student-term-plans?student_id={data['student_id']}"),
+    get(f"/edit-student/{data['student_id']}"),
+    get("/metrics"),
+    get("/api/courses"),
+    get("/api/terms"),
+    get(f"/api/terms/{data['term_id']}"),
+    get("/api/student-term-plans"),
+    get(f"/api/student-term-plans/{plan_id}"),
+    get(f"/api/student-term-plans/violations?student_id={data['student_id']}"),
+
+    route("POST /add-course", lambda: client.post("/add-course", json={
+      "course_code": f"{generator.COURSE_PREFIX} W{next(serial)}",
+      "course_name": "Benchmark Write Course",
+      "course_credit": 4,
+      "prerequisite_course_ids": data["course_ids"][:2]
+    })),
+    route("POST /add-term", lambda: client.post("/add-term", json={
+      "term_season": generator.TERM_PREFIX,
+      "term_year": f"W{next(serial)}",
+      "term_start_date": "2099-01-01",
+      "term_end_date": "2099-03-31",
+      "term_course_ids": data["course_ids"][:10]
+    })),
+    route("PATCH /add-term-course", lambda season, year, term_id: client.patch("/add-term-course", json={
+      "term_id": term_id,
+      "new_course_id": data["course_ids"][0]
+    }), make_term),
+    route("POST /add-student", lambda: client.post("/add-student", json={
+      "student_id": f"{generator.STUDENT_PREFIX}W{next(serial):07}",
+      "first_name": "Benchmark",
+      "last_name": "Write"
+    })),
+    route("POST /edit-student/<id>", lambda student_id: client.post(f"/edit-student/{student_id}", data={
+      "edit_student": "1",
+      "studentID": student_id,
+      "first_name": "Benchmark",
+      "last_name": "Updated"
+    }), lambda: (make_student(),)),
+    route("DELETE /delete-student", lambda student_id: client.delete("/delete-student", json={"student_id": student_id}), lambda: (make_student(),)),
+    route("POST /add-student-term-plan", lambda student_id: client.post("/add-student-term-plan", json={
+      "student_id": student_id,
+      "term_id": data["term_id"],
+      "advisor_approved": 0,
+      "courses": data["course_ids"][:3]
+    }), lambda: (make_student(),)),
+    route("PATCH /edit-student-term-plan", lambda plan, course_id: client.patch("/edit-student-term-plan", json={
+      "student_term_plan_id": plan,
+      "action": "update",
+      "course_id": course_id,
+      "new_course_id": data["course_ids"][2]
+    }), new_plan),
+    route("PATCH /update-student-term-plan-advisor-approval", lambda plan, course_id: client.patch("/update-student-term-plan-advisor-approval", json={
+      "student_term_plan_id": plan,
+      "advisor_approved": 1
+    }), new_plan),
+    route("DELETE /delete-student-term-plan-course", lambda plan, course_id: client.delete("/delete-student-term-plan-course", json={
+      "student_term_plan_id": plan,
+      "course_id": course_id
+    }), new_plan),
+    route("DELETE /delete-student-term-plan/<id>", lambda plan, course_id: client.delete(f"/delete-student-term-plan/{plan}"), new_plan),
+    route("POST /api/student-term-plans/<id>/batch", lambda plan, course_id: client.post(f"/api/student-term-plans/{plan}/batch", json={
+      "operations": [
+        {"action": "update", "course_id": course_id, "new_course_id": data["course_ids"][2]},
+        {"action": "add", "course_id": data["course_ids"][3]}
+      ],
+      "advisor_approved": 1
+    }), new_plan)
+  ]
+
+def measure(case: Case, repeat: int) -> dict:
+  """
+  Runs a case once to warm up, then times it repeat times; only the run callable is timed, not its setup
+  A route's time includes reading the whole response body, since a streamed page runs its queries as the body is read
+
+  Returns:
+    - Dictionary with the case name and kind and the latency summary in milliseconds, see summarize
+  """
+  samples = []
+
+  for iteration in range(repeat + 1):
+    if case["kind"] == KIND_WRITE:
+      try:
+        with dm.transaction():
+          arguments = case["setup"]()
+          start = time.perf_counter()
+          case["run"](*arguments)
+          elapsed = time.perf_counter() - start
+          raise Rollback()
+      except Rollback:
+        pass
+    else:
+      arguments = case["setup"]()
+      start = time.perf_counter()
+      result = case["run"](*arguments)
+      if case["kind"] == KIND_ROUTE:
+        result.get_data()
+      elapsed = time.perf_counter() - start
+
+      if case["kind"] == KIND_ROUTE:
+        result.close()
+        if result.status_code >= 400:
+          raise RuntimeError(f"{case['name']} returned {result.status_code}: {result.get_data(as_text=True)[:200]}")
+
+    if iteration:
+      samples.append(elapsed * 1000)
+
+  return {"name": case["name"], "kind": case["kind"], **summarize(samples)}
+
+def compare(results: List[dict], baseline_path: str) -> None:
+  """
+  Adds the baseline p50 and the relative change of the p50 to every result that is also in the baseline
+  """
+  with open(baseline_path, encoding="utf-8") as file:
+    baseline = {result["name"]: result for result in json.load(file)["results"]}
+
+  for result in results:
+    previous = baseline.get(result["name"])
+    if previous:
+      result["baseline_p50"] = previous["p50"]
+      result["change"] = result["p50"] / previous["p50"] - 1 if previous["p50"] else None
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--generate", action="store_true", help="replace the generated dataset before measuring")
+  generator.add_arguments(parser)
+  parser.add_argument("--repeat", type=int, default=20, help="timed runs per case")
+  parser.add_argument("--only", nargs="+", help="only run cases whose name contains one of these strings")
+  parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+  parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+  arguments = parser.parse_args()
+
+  if arguments.generate:
+    generator.clear(dm)
+    counts = generator.generate(dm, **generator.options(arguments))
+  else:
+    counts = {
+      table: generator.select(dm, f"SELECT COUNT(*) FROM {table}")[0][0]
+      for table in generator.TABLES
+    }
+
+  data = sample()
+  cases = manager_cases(data) + route_cases(data, app.test_client())
+  if arguments.only:
+    cases = [case for case in cases if any(part in case["name"] for part in arguments.only)]
+
+  try:
+    results = [measure(case, arguments.repeat) for case in cases]
+  finally:
+    # Drop the rows committed by the write routes; --generate reloads the dataset next time
+    for query, parameter in (
+      ("DELETE FROM Students WHERE studentID LIKE %s", f"{generator.STUDENT_PREFIX}W%"),
+      ("DELETE FROM Terms WHERE name LIKE %s", f"{generator.TERM_PREFIX} W%"),
+      ("DELETE FROM Courses WHERE code LIKE %s", f"{generator.COURSE_PREFIX} W%")
+    ):
+      dm.execute_query(query=query, parameters=(parameter,), method="rowcount")
+    qm._dataVersions.bump(*generator.TABLES)
+
+  if arguments.baseline:
+    compare(results, arguments.baseline)
+
+  document = {
+    "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    "python": platform.python_version(),
+    "server": generator.select(dm, "SELECT VERSION()")[0][0],
+    "repeat": arguments.repeat,
+    "dataset": counts,
+    "results": results
+  }
+
+  print(f"{'case':<56}{'kind':<15}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'change':>9}", file=sys.stderr)
+  for result in results:
+    change = f"{result['change']:+.1%}" if result.get("change") is not None else ""
+    print(f"{result['name']:<56}{result['kind']:<15}{result['mean']:>10.2f}{result['p50']:>10.2f}{result['p95']:>10.2f}{change:>9}", file=sys.stderr)
+
+  if arguments.output:
+    with open(arguments.output, "w", encoding="utf-8") as file:
+      json.dump(document, file, indent=2)
+  else:
+    json.dump(document, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+  main()
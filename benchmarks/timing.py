@@ -0,0 +1,33 @@
+"""
+Shared helpers for summarizing benchmark latency samples
+"""
+import statistics
+
+def percentile(samples: list, fraction: float) -> float:
+  """
+  Returns the nearest-rank percentile of the samples
+
+  Arguments:
+    - samples (list): Sorted latency samples
+    - fraction (float): The percentile as a fraction, e.g. 0.95
+  """
+  index = min(len(samples) - 1, max(0, round(fraction * len(samples)) - 1))
+  return samples[index]
+
+def summarize(samples: list) -> dict:
+  """
+  Summarizes latency samples in milliseconds
+
+  Returns:
+    - Dictionary with the sample count and the mean, p50, p95, p99, min and max latency
+  """
+  samples = sorted(samples)
+  return {
+    "n": len(samples),
+    "mean": statistics.fmean(samples),
+    "p50": percentile(samples, 0.50),
+    "p95": percentile(samples, 0.95),
+    "p99": percentile(samples, 0.99),
+    "min": samples[0],
+    "max": samples[-1]
+  }
@@ -0,0 +1,172 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from blueprints.routes import dm, qm, idempotent
+from blueprints.errorHandlers import QueryError
+from database.ExportManager import EXPORT_ENTITIES, EXPORT_FORMATS
+from itertools import chain
+
+# Define blueprint
+api_blueprint = Blueprint('api', __name__, url_prefix="/api")
+
+# Define constants for batch edit actions
+BATCH_ADD = "add"
+BATCH_REPLACE = "replace"
+BATCH_REMOVE = "remove"
+
+# Helpers
+def batch_integer(value, name: str) -> int:
+  """
+  Converts a value from a batch edit request to an integer
+
+  Raises:
+    QueryError: If the value is missing or not an integer, so the client gets a 400 instead of a 500.
+  """
+  if isinstance(value, bool):
+    raise QueryError(f"{name} must be an integer, got {value!r}.")
+
+  try:
+    return int(value)
+  except (TypeError, ValueError):
+    raise QueryError(f"{name} must be an integer, got {value!r}.") from None
+
+# Routes
+@api_blueprint.route("/courses", methods=["GET"])
+def viewCoursesJson():
+  courses = qm._courses.all_nested()
+  return jsonify(courses = courses), 200
+
+@api_blueprint.route("/terms", methods=["GET"])
+def viewTermsJson():
+  terms = qm._terms.all_nested()
+  return jsonify(terms = terms), 200
+
+@api_blueprint.route("/terms/<int:term_id>", methods=["GET"])
+def viewTermJson(term_id):
+  terms = qm._terms.all_nested(term_id=term_id)
+
+  if not terms:
+    return jsonify(message = f"No term with id {term_id} exists."), 404
+  return jsonify(terms[0]), 200
+
+@api_blueprint.route("/student-term-plans", methods=["GET"])
+def viewStudentTermPlansJson():
+  student_term_plans = qm._studentTermPlans.all_nested()
+  return jsonify(student_term_plans = student_term_plans), 200
+
+@api_blueprint.route("/student-term-plans/<int:student_term_plan_id>", methods=["GET"])
+def viewStudentTermPlanJson(student_term_plan_id):
+  student_term_plans = qm._studentTermPlans.all_nested(student_term_plan_id=student_term_plan_id)
+
+  if not student_term_plans:
+    return jsonify(message = f"No student term plan with id {student_term_plan_id} exists."), 404
+  return jsonify(student_term_plans[0]), 200
+
+@api_blueprint.route("/student-term-plans/<int:student_term_plan_id>/batch", methods=["POST"])
+@idempotent
+def batchEditStudentTermPlan(student_term_plan_id):
+  """
+  Applies a list of course operations and an optional approval change to a plan in one transaction
+  Expects JSON of the form:
+    {
+      "operations": [
+        {"action": "add", "course_id": 5},
+        {"action": "replace", "course_id": 2, "new_course_id": 7},
+        {"action": "replace", "course_id": 4, "new_course_id": null},
+        {"action": "remove", "course_id": 3}
+      ],
+      "advisor_approved": 1
+    }
+  Removals, replacements and additions each run as one statement, and the plan's data versions are bumped once; the updated plan is returned
+  Replacements may swap or chain courses, e.g. 2 to 7 and 7 to 2, since the operations are checked against the plan's final courses
+  A null new_course_id keeps the plan's course row but sets its course to NULL, removing the relationship with an UPDATE
+  """
+  operations = request.get_json().get("operations", [])
+  advisor_approved = request.get_json().get("advisor_approved")
+
+  if not isinstance(operations, list) or not all(isinstance(operation, dict) for operation in operations):
+    raise QueryError("The operations must be a list of objects.")
+
+  if advisor_approved is not None:
+    advisor_approved = batch_integer(advisor_approved, "advisor_approved")
+
+  # Group the operations by action
+  added, replaced, removed = [], [], []
+  for operation in operations:
+    action = operation.get("action")
+
+    if action == BATCH_ADD:
+      added.append(batch_integer(operation.get("course_id"), "course_id"))
+    elif action == BATCH_REPLACE:
+      if "new_course_id" not in operation:
+        raise QueryError("new_course_id must be an integer or null, got nothing.")
+      new_course_id = operation["new_course_id"]
+      replaced.append((batch_integer(operation.get("course_id"), "course_id"), None if new_course_id is None else batch_integer(new_course_id, "new_course_id")))
+    elif action == BATCH_REMOVE:
+      removed.append(batch_integer(operation.get("course_id"), "course_id"))
+    else:
+      return jsonify(message = f"Unsupported batch action: {action}"), 400
+
+  with dm.transaction():
+    student_term_plans = qm._studentTermPlans.all_nested(student_term_plan_id=student_term_plan_id)
+    if not student_term_plans:
+      return jsonify(message = f"No student term plan with id {student_term_plan_id} exists."), 404
+
+    # Check the operations against the plan's current and final courses before writing anything
+    current_course_ids = {course["id"] for course in student_term_plans[0]["courses"]}
+    changed_course_ids = removed + [course_id for course_id, _ in replaced]
+    new_course_ids = added + [new_course_id for _, new_course_id in replaced if new_course_id is not None]
+    kept_course_ids = current_course_ids - set(changed_course_ids)
+
+    if len(set(changed_course_ids)) != len(changed_course_ids) or not set(changed_course_ids) <= current_course_ids:
+      raise QueryError("Each replaced or removed course must be in the plan and can only be changed once.")
+
+    if len(set(new_course_ids)) != len(new_course_ids) or kept_course_ids & set(new_course_ids):
+      raise QueryError("Each added or replacement course can only appear once in the plan.")
+
+    if not kept_course_ids and not new_course_ids:
+      raise QueryError("A student term plan must have a minimum of 1 course.")
+
+    qm._studentTermPlans.remove_courses(student_term_plan_id, removed)
+    qm._studentTermPlans.update_courses(student_term_plan_id, replaced)
+    qm._studentTermPlans.add_courses(student_term_plan_id=student_term_plan_id, courses=added)
+
+    if advisor_approved is not None and bool(advisor_approved) != student_term_plans[0]["advisorApproved"]:
+      qm._studentTermPlans.update_approval(student_term_plan_id, advisor_approved)
+
+    student_term_plans = qm._studentTermPlans.all_nested(student_term_plan_id=student_term_plan_id)
+
+  return jsonify(student_term_plans[0]), 200
+
+@api_blueprint.route("/student-term-plans/violations", methods=["GET"])
+def viewPlanViolations():
+  # Optionally limit validation to one student
+  student_id = request.args.get("student_id")
+
+  violations = qm._planValidator.validate(student_id=student_id)
+  return jsonify(count = len(violations), violations = violations), 200
+
+@api_blueprint.route("/export/<entity>", methods=["GET"])
+def exportEntity(entity):
+  """
+  Streams every student, course, term or student term plan as CSV or NDJSON, read in one pass and sent as it is written
+  Query parameters:
+    - format: csv (default) or ndjson
+    - gzip: 1 to send the export gzip compressed, as a .gz file
+  """
+  export_format = request.args.get("format", "csv")
+  compress = request.args.get("gzip", 0, type=int) == 1
+
+  if entity not in EXPORT_ENTITIES:
+    return jsonify(message = f"No export named {entity} exists. Expected one of {', '.join(EXPORT_ENTITIES)}."), 404
+  if export_format not in EXPORT_FORMATS:
+    return jsonify(message = f"Unsupported export format: {export_format}. Expected one of {', '.join(EXPORT_FORMATS)}."), 400
+
+  # Read the first rows before the response starts, so a failing query is answered with an error response
+  pieces = qm._exports.export(entity, export_format=export_format, compress=compress)
+  first = next(pieces)
+
+  filename = f"{entity}.{export_format}{'.gz' if compress else ''}"
+  # The export streams on the request's connection, so the request context is kept until the last piece is sent
+  response = Response(stream_with_context(chain((first,), pieces)), mimetype="application/gzip" if compress else EXPORT_FORMATS[export_format])
+  response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+  response.call_on_close(pieces.close)
+  return response
@@ -0,0 +1,49 @@
+import click
+import json
+from flask import Blueprint
+from blueprints.routes import qm
+from database.ExportManager import EXPORT_ENTITIES, EXPORT_FORMATS
+
+# Define blueprint; commands are registered at the top level, e.g. `flask validate-plans`
+commands_blueprint = Blueprint('commands', __name__, cli_group=None)
+
+# Commands
+@commands_blueprint.cli.command("validate-plans")
+@click.option("--student-id", default=None, help="Only validate this student's plans.")
+@click.option("--output", type=click.File("w"), default="-", help="File to write the JSON violations to. Defaults to stdout.")
+def validatePlans(student_id, output):
+  """
+  Reports planned courses whose prerequisites are not planned in an earlier term, as JSON
+  """
+  violations = qm._planValidator.validate(student_id=student_id)
+  json.dump({"count": len(violations), "violations": violations}, output, indent=2)
+  output.write("\n")
+
+@commands_blueprint.cli.command("migrate")
+@click.option("--target", type=int, default=None, help="Migrate up to this version. Defaults to the newest migration.")
+@click.option("--status", is_flag=True, help="Only show the current version and pending migrations.")
+def migrate(target, status):
+  """
+  Applies the pending migrations in database/migrations in version order
+  """
+  if status:
+    click.echo(f"Schema version: {qm._migrations.current()}")
+    for migration in qm._migrations.pending():
+      click.echo(f"Pending: {migration['name']}")
+    return
+
+  for migration in qm._migrations.migrate(target=target):
+    click.echo(f"Applied: {migration['name']}")
+  click.echo(f"Schema version: {qm._migrations.current()}")
+
+@commands_blueprint.cli.command("export")
+@click.argument("entity", type=click.Choice(list(EXPORT_ENTITIES)))
+@click.option("--format", "export_format", type=click.Choice(list(EXPORT_FORMATS)), default="csv", help="Output format. Defaults to csv.")
+@click.option("--gzip", "compress", is_flag=True, help="Gzip compress the output.")
+@click.option("--output", type=click.File("wb"), default="-", help="File to write the export to. Defaults to stdout.")
+def export(entity, export_format, compress, output):
+  """
+  Exports every student, course, term or student term plan as CSV or NDJSON, reading and writing the rows in one pass
+  """
+  for piece in qm._exports.export(entity, export_format=export_format, compress=compress):
+    output.write(piece)
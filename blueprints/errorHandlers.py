@@ -14,6 +14,12 @@ class QueryError(Exception):
   """
   pass
 
+class QueryBudgetError(Exception):
+  """
+  Custom exception class for requests that run more queries than their query budget allows
+  """
+  pass
+
 # Define blueprint
 error_handlers_blueprint = Blueprint('ErrorHandlers', __name__)
 
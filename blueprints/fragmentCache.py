@@ -0,0 +1,99 @@
+from flask import Flask
+from jinja2 import Environment, nodes
+from jinja2.ext import Extension
+from jinja2.parser import Parser
+from database.LRUCache import LRUCache
+from typing import Callable, List, Tuple
+
+class FragmentCacheExtension(Extension):
+  """
+  Jinja extension adding a {% cache %} tag, which renders a template block once per data version and reuses the markup
+  The first argument names the fragment, the others are the tables whose data the block shows.
+  The cache key is the name, the tables and their current data versions, so any write to one of the tables renders the block again.
+  Fragments are shared by every template and request in the worker process, so two templates using the same name share the markup.
+
+  Usage:
+    {% cache "student_options", "Students" %}
+      {% for student in students %}<option value={{ student["studentID"] }}>{{ student["student"] }}</option>{% endfor %}
+    {% endcache %}
+
+  The block must only depend on the listed tables, not on the request, e.g. the page or the filters.
+  Until init_fragment_cache is called, blocks are rendered every time.
+  """
+
+  tags = {"cache"}
+
+  def __init__(self, environment: Environment):
+    """
+    Initializes the FragmentCacheExtension instance and adds the cache attributes to the environment
+    """
+    super().__init__(environment)
+    environment.extend(fragment_cache=None, fragment_cache_versions=None)
+
+  def parse(self, parser: Parser) -> nodes.Node:
+    """
+    Parses {% cache name, table, ... %} ... {% endcache %} into a call to render
+    """
+    lineno = next(parser.stream).lineno
+
+    arguments = [parser.parse_expression()]
+    while parser.stream.skip_if("comma"):
+      arguments.append(parser.parse_expression())
+
+    body = parser.parse_statements(("name:endcache",), drop_needle=True)
+    return nodes.CallBlock(self.call_method("render", [nodes.List(arguments)]), [], [], body).set_lineno(lineno)
+
+  def render(self, arguments: List[str], caller: Callable[[], str]) -> str:
+    """
+    Returns the cached markup of a block, rendering and caching it on a miss
+
+    Arguments:
+      - arguments (list): The fragment name followed by the table names
+      - caller (callable): Renders the block
+    """
+    cache, versions = self.environment.fragment_cache, self.environment.fragment_cache_versions
+    if cache is None:
+      return caller()
+
+    tables = tuple(arguments[1:])
+    key = (arguments[0], tables) + versions(tables)
+
+    found, markup = cache.get(key)
+    if not found:
+      markup = caller()
+      cache.set(key, markup)
+
+    return markup
+
+def init_fragment_cache(app: Flask, versions: Callable[[Tuple[str, ...]], Tuple[int, ...]], max_size: int = 64) -> None:
+  """
+  Adds the {% cache %} tag to an app's templates, see FragmentCacheExtension
+
+  Arguments:
+    - app (Flask): The app whose templates get the tag
+    - versions (callable): Returns the current data versions of a tuple of table names, e.g. QueryCache.versions
+    - max_size (int, optional): The maximum number of cached fragments, least recently used first out. Defaults to 64.
+  """
+  app.jinja_env.add_extension(FragmentCacheExtension)
+  app.jinja_env.fragment_cache = LRUCache(max_size=max_size)
+  app.jinja_env.fragment_cache_versions = versions
+
+def render_fragment_cache_metrics(app: Flask) -> str:
+  """
+  Renders the fragment cache hit, miss and size counters in the Prometheus text exposition format
+  """
+  cache = app.jinja_env.fragment_cache
+  if cache is None:
+    return ""
+
+  return "\n".join([
+    "# HELP template_fragment_cache_hits_total Template fragments served from the fragment cache",
+    "# TYPE template_fragment_cache_hits_total counter",
+    f"template_fragment_cache_hits_total {cache.hits}",
+    "# HELP template_fragment_cache_misses_total Template fragments rendered because they were not cached for the current data versions",
+    "# TYPE template_fragment_cache_misses_total counter",
+    f"template_fragment_cache_misses_total {cache.misses}",
+    "# HELP template_fragment_cache_entries Template fragments currently cached",
+    "# TYPE template_fragment_cache_entries gauge",
+    f"template_fragment_cache_entries {len(cache)}"
+  ]) + "\n"
@@ -1,7 +1,18 @@
-from flask import Blueprint, request, jsonify, render_template, redirect
+from flask import Blueprint, Response, request, jsonify, render_template, stream_template, redirect, make_response, g, current_app
 from database.DatabaseManager import DatabaseManager
 from database.QueryManager import QueryManager
+from database.QueryBudget import query_budget
+from blueprints.fragmentCache import init_fragment_cache, render_fragment_cache_metrics
 from operator import itemgetter
+from functools import wraps, lru_cache
+from itertools import chain
+from typing import Any, Callable, Iterator
+import base64
+import binascii
+import hashlib
+import json
+import os
+import time
 
 # Define blueprint
 routes_blueprint = Blueprint('routes', __name__)
@@ -10,21 +21,264 @@ routes_blueprint = Blueprint('routes', __name__)
 dm = DatabaseManager()
 qm = QueryManager(dm)
 
+# Return each app context's pooled connection when the context is torn down
+routes_blueprint.record_once(lambda state: state.app.teardown_appcontext(dm.release_connection))
+
+# Cache {% cache %} template fragments per data version, keeping up to fragment_cache_max_size fragments per worker process
+routes_blueprint.record_once(lambda state: init_fragment_cache(state.app, qm._cache.versions, max_size=int(os.environ.get("fragment_cache_max_size", 64))))
+
+# Time every request to the app and record it with its query count and database time
+@routes_blueprint.before_app_request
+def startRequestTimer():
+  g.request_started = time.perf_counter()
+
+# A streamed response runs queries while its body is sent, after the request's after_request functions,
+# so it is recorded and checked once it closes, against its g since g is no longer current by then
+def on_response_end(response: Response, callback: Callable[[Any], None]) -> None:
+  """
+  Calls callback with the request's g now, or once the response closes if it is streamed
+  """
+  request_globals = g._get_current_object()
+
+  if response.is_streamed:
+    response.call_on_close(lambda: callback(request_globals))
+  else:
+    callback(request_globals)
+
+@routes_blueprint.after_app_request
+def recordRequestMetrics(response):
+  # Label by URL rule rather than path, so /terms/1 and /terms/2 share one series
+  route = request.url_rule.rule if request.url_rule else "unmatched"
+  on_response_end(response, lambda request_globals: dm._metrics.observe_request(route, time.perf_counter() - request_globals.request_started, request_globals))
+  return response
+
+# In debug and test runs, flag requests that run too many or repeated queries, see QueryBudget
+@routes_blueprint.after_app_request
+def checkQueryBudget(response):
+  route = request.url_rule.rule if request.url_rule else "unmatched"
+  on_response_end(response, lambda request_globals: dm._query_budget.enforce(route, response, request_globals))
+  return response
+
+# Listing pages are served in keyset pages of this many rows unless the request asks for a smaller limit
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Helpers
+def encode_cursor(key) -> str:
+  """
+  Encodes the sort key of a page's last row into an opaque, URL-safe cursor for the "after" parameter
+  """
+  return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor: str):
+  """
+  Decodes a cursor created by encode_cursor, returning None if there is no cursor
+
+  Raises:
+    ValueError: If the cursor is malformed.
+  """
+  if not cursor:
+    return None
+
+  try:
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+  except (binascii.Error, UnicodeError, json.JSONDecodeError) as error:
+    raise ValueError(f"Invalid cursor: {cursor}") from error
+
+def page_limit() -> int:
+  """
+  Reads the "limit" request parameter, clamped to between 1 and MAX_PAGE_SIZE
+  """
+  return max(1, min(request.args.get("limit", PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+
+# Streamed pages are sent in pieces of at least this many characters rather than one piece per template output node
+STREAM_CHUNK_SIZE = 16384
+
+class StreamedPage:
+  """
+  One keyset page of rows that are read from a row stream while the page is rendered, see stream_page
+  The stream must be queried for limit + 1 rows; the extra row is only read to tell whether there is a next page.
+  The first row is read up front, so a failing query is answered with an error response instead of a cut off page.
+  next_cursor is only known once the rows have been iterated, so templates must read it after their loop.
+  """
+
+  def __init__(self, rows: Iterator, limit: int, cursor_key: Callable[[Any], Any]):
+    """
+    Initializes the StreamedPage instance and reads the stream's first row
+
+    Arguments:
+      - rows (iterator): The row stream, e.g. StudentTermPlanManager.stream
+      - limit (int): The number of rows shown on the page
+      - cursor_key (callable): Returns the sort key of a row, which becomes the next page's cursor
+    """
+    self._rows = rows
+    self._limit = limit
+    self._cursor_key = cursor_key
+    self._first = next(rows, None)
+    self.next_cursor = None
+
+  def __iter__(self) -> Iterator:
+    rows = self._rows if self._first is None else chain((self._first,), self._rows)
+    self._first = None
+
+    last = None
+    for count, row in enumerate(rows):
+      # Keep reading past the extra row, so the stream ends and returns its connection to the pool
+      if count >= self._limit:
+        self.next_cursor = encode_cursor(self._cursor_key(last))
+        continue
+      last = row
+      yield row
+
+  def close(self) -> None:
+    """
+    Closes the row stream, returning its connection if the page was not rendered to the end
+    """
+    self._rows.close()
+
+def stream_page(template_name: str, page: StreamedPage, **context) -> Response:
+  """
+  Renders a template as a streamed response, so a page's rows are rendered and sent while they are read instead of being loaded first
+
+  Arguments:
+    - template_name (str): The template to render
+    - page (StreamedPage): The streamed rows, closed when the response is closed
+    - context: The template variables
+  """
+  # stream_template keeps the request context alive while the template renders
+  rendered = stream_template(template_name, **context)
+
+  def pieces():
+    buffer, size = [], 0
+    for piece in rendered:
+      buffer.append(piece)
+      size += len(piece)
+      if size >= STREAM_CHUNK_SIZE:
+        yield "".join(buffer)
+        buffer, size = [], 0
+    yield "".join(buffer)
+
+  response = Response(pieces(), mimetype="text/html")
+  response.call_on_close(page.close)
+  return response
+
+class IdempotencyConflict(Exception):
+  """
+  Raised when a concurrent request stored a response under the same idempotency key first
+  """
+  pass
+
+class IdempotentServerError(Exception):
+  """
+  Raised inside the idempotent transaction when the route answered with a server error, so its writes are rolled back
+  """
+  def __init__(self, response: Response):
+    super().__init__(response.status)
+    self.response = response
+
+def idempotent(view):
+  """
+  Decorator for write routes that makes requests sent with an Idempotency-Key header safe to retry
+  The route runs in one transaction with storing its response under the key, so the writes and the stored response commit together.
+  A request with a key that already has a stored response gets the stored response back without running the route again.
+  """
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if not idempotency_key:
+      return view(*args, **kwargs)
+
+    stored = qm._idempotencyKeys.get(idempotency_key)
+
+    if stored is None:
+      try:
+        with dm.transaction():
+          response = make_response(view(*args, **kwargs))
+
+          # Server errors are neither committed nor stored, so the request can be retried
+          if response.status_code >= 500:
+            raise IdempotentServerError(response)
+          if qm._idempotencyKeys.save(idempotency_key, request.path, response.status_code, response.get_data(as_text=True)):
+            return response
+          raise IdempotencyConflict()
+
+      # The transaction has rolled back whatever the route wrote before failing
+      except IdempotentServerError as error:
+        return error.response
+
+      # Roll back this request's writes and answer with the response the other request stored
+      except IdempotencyConflict:
+        stored = qm._idempotencyKeys.get(idempotency_key)
+
+    if stored["requestPath"] != request.path:
+      return jsonify(message = "The idempotency key has already been used for a different request."), 422
+
+    return Response(stored["responseBody"], status=stored["statusCode"], mimetype="application/json", headers={"Idempotent-Replayed": "true"})
+
+  return wrapper
+
+@lru_cache(maxsize=None)
+def template_digest(template_folder: str) -> str:
+  """
+  Hashes the contents of every template once per process, so a deploy with changed templates changes every page's ETag
+  Every worker of one deploy computes the same digest
+  """
+  digest = hashlib.sha1()
+  for name in sorted(os.listdir(template_folder)):
+    with open(os.path.join(template_folder, name), "rb") as file:
+      digest.update(name.encode() + b"\0" + file.read())
+  return digest.hexdigest()[:12]
+
+def conditional(*tables: str):
+  """
+  Decorator for GET pages that answers a matching If-None-Match header with 304 Not Modified without running the page's queries or template
+  The ETag is built from the data versions of the tables the page reads, which every manager write bumps, and the template digest.
+  Versions are read before the view runs, so a write landing in between at worst makes the next request miss; it never makes a stale page match.
+  Responses carry Cache-Control: no-cache, so browsers revalidate on every visit instead of showing a stored copy.
+
+  Arguments:
+    - tables (str): The names of the tables the page reads
+  """
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      versions = "-".join(str(version) for version in qm._cache.versions(tables))
+      etag = f"{template_digest(os.path.join(current_app.root_path, current_app.template_folder))}-{versions}"
+
+      if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+      else:
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+          return response
+
+      response.set_etag(etag, weak=True)
+      response.headers["Cache-Control"] = "no-cache"
+      return response
+
+    return wrapper
+  return decorator
+
 # Routes
 @routes_blueprint.route("/", methods=["GET"])
 @routes_blueprint.route("/index", methods=["GET"])
 def index():
   return render_template("index.j2")
 
+@routes_blueprint.route("/metrics", methods=["GET"])
+def viewMetrics():
+  return Response(dm._metrics.render() + render_fragment_cache_metrics(current_app), mimetype="text/plain; version=0.0.4")
+
 @routes_blueprint.route("/courses", methods=["GET"])
+@conditional("Courses", "Courses_has_Prerequisites")
 def viewCourses():
-  # Close db connection to avoid caching of data
-  dm.close_connection()
-
   courses = qm._courses.all(with_prerequisites = True)
   return render_template("courses.j2", courses=courses)
   
 @routes_blueprint.route("/add-course", methods=["POST"])
+# Like the other add routes, runs every statement once however many rows it inserts, so a per-row query fails the budget as an N+1
+@query_budget(max_queries=10, max_repeats=1)
+@idempotent
 def addCourse():
   course_code, course_credit, course_name = itemgetter("course_code", "course_credit", "course_name")(request.get_json())
   prerequisite_course_ids = request.get_json().get("prerequisite_course_ids", [])
@@ -32,27 +286,24 @@ def addCourse():
   if any(parameter is None for parameter in [course_code, course_credit, course_name]):
     return jsonify(message = "Not all required attributes were provided in the request"), 400
 
-  if qm._courses.get(course_code):
-    return jsonify(message = f"A class with code {course_code} already exists"), 400
-
-  qm._courses.create(course_code, course_name, course_credit)
-
-  for prerequisite_course_id in prerequisite_course_ids:
-    qm._courses.add_prerequisite(course_code, prerequisite_course_id)
+  # Create course and its prerequisites in one transaction
+  with dm.transaction():
+    if not qm._courses.create(course_code, course_name, course_credit):
+      return jsonify(message = f"A class with code {course_code} already exists"), 400
+    qm._courses.add_prerequisites(course_code, prerequisite_course_ids)
   
   return jsonify(message = "The course and prerequisite(s) if any have been added."), 200
 
 @routes_blueprint.route("/terms", methods=["GET"])
+@conditional("Terms", "Terms_has_Courses", "Courses")
 def viewTerms():
-  # Close db connection to avoid caching of data
-  dm.close_connection()
-
-  terms = qm._terms.all()
-  courses = qm._courses.all()
+  terms, courses = qm.gather(qm._terms.all, qm._courses.all)
 
   return render_template("terms.j2", terms=terms, courses=courses)
     
 @routes_blueprint.route("/add-term", methods=["POST"])
+@query_budget(max_queries=6, max_repeats=1)
+@idempotent
 def addTerm():
   # Get posted form data
   term_season, term_year, term_start_date, term_end_date = itemgetter("term_season", "term_year", "term_start_date", "term_end_date")(request.get_json())
@@ -61,14 +312,11 @@ def addTerm():
   if any(parameter is None for parameter in [term_season, term_year, term_start_date, term_end_date]):
     return jsonify(message = "Not all required attributes were provided in the request"), 400
 
-  # Check if term already exists
-  if qm._terms.get(term_season, term_year):
-    return jsonify(message = f"A term with the name of {term_season} {term_year} already exists"), 400
-
-  qm._terms.create(term_season, term_year, term_start_date, term_end_date)
-
-  for term_course_id in term_course_ids:
-    qm._terms.add_course(term_season=term_season, term_year=term_year, term_course_id=term_course_id)
+  # Create term and its courses in one transaction
+  with dm.transaction():
+    if not qm._terms.create(term_season, term_year, term_start_date, term_end_date):
+      return jsonify(message = f"A term with the name of {term_season} {term_year} already exists"), 400
+    qm._terms.add_courses(term_course_ids, term_season=term_season, term_year=term_year)
 
   return jsonify(message = "The term and courses if any have been added."), 200
 
@@ -81,18 +329,40 @@ def addTermCourse():
   return jsonify(message = f"The course has been added."), 200
   
 @routes_blueprint.route("/student-term-plans", methods=["GET"])
+@conditional("StudentTermPlans", "StudentTermPlans_has_Courses", "Students", "Terms", "Terms_has_Courses", "Courses")
 def viewStudentTermPlans():
-  # Close db connection to avoid caching of data
-  dm.close_connection()
-  
-  student_term_plans = qm._studentTermPlans.all()    # Retrieve all term plans from 'StudentTermPlans' table
-  students = qm._students.all(is_formatted=True)     # Retrieve all students from 'Students' table
-  terms = qm._terms.all()                            # Retrieve all terms from 'Terms' table
-  courses = qm._courses.all()                        # Retrieve all courses from 'Courses' table
-
-  return render_template("student-term-plans.j2", student_term_plans=student_term_plans, students=students, terms=terms, courses=courses)
+  limit = page_limit()
+  try:
+    after = decode_cursor(request.args.get("after"))
+    # bool is a subclass of int, but true/false are not plan IDs
+    if after is not None and (not isinstance(after, int) or isinstance(after, bool)):
+      raise ValueError(f"Invalid cursor: {request.args.get('after')}")
+  except ValueError as error:
+    return jsonify(message = str(error)), 400
+
+  # Optional filters, kept on the pagination links
+  filters = {
+    "student_id": request.args.get("student_id") or None,
+    "term_id": request.args.get("term_id", type=int),
+    "advisor_approved": request.args.get("advisor_approved", type=int)
+  }
+  filters = {key: value for key, value in filters.items() if value is not None}
+
+  # Retrieve the dropdown options concurrently, each on its own connection
+  students, terms, courses = qm.gather(
+    lambda: qm._students.all(is_formatted=True),                                 # All students from 'Students' table
+    qm._terms.all,                                                               # All terms from 'Terms' table
+    qm._courses.all                                                              # All courses from 'Courses' table
+  )
+
+  # Stream one page of term plans into the page as it renders, plus one row to tell whether there is a next page
+  student_term_plans = StreamedPage(qm._studentTermPlans.stream(limit=limit + 1, after=after, **filters), limit, itemgetter("studentTermPlanID"))
+
+  return stream_page("student-term-plans.j2", student_term_plans, student_term_plans=student_term_plans, students=students, terms=terms, courses=courses, limit=limit, after=after, filters=filters)
         
 @routes_blueprint.route("/add-student-term-plan", methods=["POST"])
+@query_budget(max_queries=6, max_repeats=1)
+@idempotent
 def addStudentTermPlan():
   # Get posted form data
   student_id, term_id, advisor_approved, courses = itemgetter("student_id", "term_id", "advisor_approved", "courses")(request.get_json())
@@ -100,12 +370,11 @@ def addStudentTermPlan():
   if any(parameter is None for parameter in [student_id, term_id, advisor_approved, courses]):
     return jsonify(message = "Not all required attributes were provided in the request"), 400
   
-  # Check if student term plan already exists for provided student/term
-  if qm._studentTermPlans.get(student_id, term_id):
-    return jsonify(message = "A student term plan already exists for the provided student and term."), 400
-
-  qm._studentTermPlans.create(student_id, term_id, advisor_approved)    
-  qm._studentTermPlans.add_courses(student_id=student_id, term_id=term_id, courses=courses)
+  # Create student term plan and its courses in one transaction
+  with dm.transaction():
+    if not qm._studentTermPlans.create(student_id, term_id, advisor_approved):
+      return jsonify(message = "A student term plan already exists for the provided student and term."), 400
+    qm._studentTermPlans.add_courses(student_id=student_id, term_id=term_id, courses=courses)
 
   return jsonify(message = f"The student term plan and associated course(s) has been added."), 200
 
@@ -160,14 +429,28 @@ def deleteStudentTermPlanCourse():
   return jsonify(message = "The student course plan course has been deleted."), 200
 
 @routes_blueprint.route("/students", methods=["GET"])
+@conditional("Students")
 def viewStudents():
-  # Close db connection to avoid caching of data
-  dm.close_connection()
-
-  students = qm._students.all()  
-  return render_template("students.j2", students=students)
+  limit = page_limit()
+  try:
+    after = decode_cursor(request.args.get("after"))
+    # The cursor is a [lastName, studentID] pair of strings; anything else would reach the query cache key and the SQL parameters
+    if after is not None and not (isinstance(after, list) and len(after) == 2 and all(isinstance(value, str) for value in after)):
+      raise ValueError(f"Invalid cursor: {request.args.get('after')}")
+  except ValueError as error:
+    return jsonify(message = str(error)), 400
+
+  # Retrieve one page of students, plus one row to tell whether there is a next page
+  students = qm._students.all(limit=limit + 1, after=tuple(after) if after else None)
+  next_cursor = None
+  if len(students) > limit:
+    students = students[:limit]
+    next_cursor = encode_cursor([students[-1]["lastName"], students[-1]["id"]])
+
+  return render_template("students.j2", students=students, limit=limit, after=after, next_cursor=next_cursor)
   
 @routes_blueprint.route("/add-student", methods=["POST"])
+@idempotent
 def addStudent():
   # Get posted form data
   student_id, first_name, last_name = itemgetter("student_id", "first_name", "last_name")(request.get_json())
@@ -175,11 +458,9 @@ def addStudent():
   if any(parameter is None for parameter in [student_id, first_name, last_name]):
     return jsonify(message = "Not all required attributes were provided in the request"), 400
   
-  # Check if student already exists in database
-  if qm._students.get(student_id):
+  if not qm._students.create(student_id, first_name, last_name):
     return jsonify(message = "A student already exists for the provided student id."), 400
 
-  qm._students.create(student_id, first_name, last_name)
   return jsonify(message = "This student has been added."), 200
 
 @routes_blueprint.route("/delete-student", methods=["DELETE"])
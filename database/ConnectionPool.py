@@ -0,0 +1,134 @@
+import threading
+import time
+from blueprints.errorHandlers import DatabaseError
+from typing import Any, Callable, List, Tuple
+
+class ConnectionPool:
+  """
+  Thread-safe pool of MySQL connections
+  Handles the following:
+    - Opening the minimum number of connections up front
+    - Checking out an idle connection, or opening a new one while below the maximum size
+    - Health checking connections that sat idle longer than the check interval before handing them out
+    - Waiting a bounded amount of time for a connection to be returned when the pool is exhausted
+    - Returning or discarding checked out connections
+    - Closing every idle connection
+  """
+
+  def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10, timeout: float = 10.0,
+               is_alive: Callable[[Any], bool] = None, check_after: float = 30.0):
+    """
+    Initializes the ConnectionPool instance and opens min_size connections
+
+    Arguments:
+      - connect (callable): Factory that opens and returns a new database connection
+      - min_size (int, optional): The number of connections opened up front and kept idle. Defaults to 1.
+      - max_size (int, optional): The maximum number of connections open at once. Defaults to 10.
+      - timeout (float, optional): The number of seconds to wait for a connection before giving up. Defaults to 10.
+      - is_alive (callable, optional): Health check that returns False for a broken connection. Defaults to no health check.
+      - check_after (float, optional): The number of idle seconds after which a connection is health checked on checkout. Defaults to 30.
+
+    Raises:
+      DatabaseError: If the pool sizes are invalid or a connection cannot be opened.
+    """
+    if min_size < 0 or max_size < 1 or min_size > max_size:
+      raise DatabaseError(f"Invalid connection pool size: min_size={min_size}, max_size={max_size}")
+
+    self._connect = connect
+    self._min_size = min_size
+    self._max_size = max_size
+    self._timeout = timeout
+    self._is_alive = is_alive
+    self._check_after = check_after
+    self._idle: List[Tuple[Any, float]] = []
+    self._size = 0
+    self._available = threading.Condition(threading.Lock())
+
+    for _ in range(min_size):
+      self._idle.append((self._connect(), time.monotonic()))
+      self._size += 1
+
+  def acquire(self, wait: bool = True) -> Any:
+    """
+    Checks out a connection from the pool
+    Idle connections are reused most-recently-returned first so that rarely needed extras can go stale and be closed by the server
+
+    Arguments:
+      - wait (bool, optional): Whether to wait for a connection when every connection is in use. Defaults to True.
+
+    Returns:
+      - A database connection that must be handed back with release, or None if wait is False and every connection is in use
+
+    Raises:
+      DatabaseError: If no connection becomes available within the pool timeout or a new connection cannot be opened.
+    """
+    deadline = time.monotonic() + self._timeout
+
+    while True:
+      with self._available:
+        while not self._idle and self._size >= self._max_size:
+          if not wait:
+            return None
+          remaining = deadline - time.monotonic()
+          if remaining <= 0:
+            raise DatabaseError(f"Timed out after {self._timeout} seconds waiting for a database connection ({self._max_size} in use)")
+          self._available.wait(remaining)
+
+        if not self._idle:
+          # Reserve a slot before connecting so the lock is not held during the handshake
+          self._size += 1
+          break
+
+        connection, idle_since = self._idle.pop()
+
+      # Only connections that sat idle long enough to have been dropped by the server are health checked
+      if self._is_alive is None or time.monotonic() - idle_since < self._check_after or self._is_alive(connection):
+        return connection
+
+      self.release(connection, discard=True)
+
+    try:
+      return self._connect()
+
+    except Exception:
+      with self._available:
+        self._size -= 1
+        self._available.notify()
+      raise
+
+  def release(self, connection: Any, discard: bool = False) -> None:
+    """
+    Returns a checked out connection to the pool
+
+    Arguments:
+      - connection: The connection previously returned by acquire
+      - discard (bool, optional): Whether the connection is broken and should be closed instead of reused. Defaults to False.
+    """
+    if discard:
+      try:
+        connection.close()
+      except Exception:
+        pass
+
+    with self._available:
+      if discard:
+        self._size -= 1
+      else:
+        self._idle.append((connection, time.monotonic()))
+      self._available.notify()
+
+  def close_all(self) -> None:
+    """
+    Closes every idle connection
+    Connections that are currently checked out are closed when they are released with discard=True
+    """
+    with self._available:
+      idle, self._idle = self._idle, []
+      self._size -= len(idle)
+      self._available.notify_all()
+
+    for connection, _ in idle:
+      try:
+        connection.close()
+      except Exception:
+        pass
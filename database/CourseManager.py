@@ -1,33 +1,56 @@
 from database.DatabaseManager import DatabaseManager
+from database.QueryCache import QueryCache
+from database.PrerequisiteGraph import PrerequisiteGraph
+from database.Row import Row
 from blueprints.errorHandlers import QueryError
-from typing import List, TypedDict, Any, Union
+from itertools import groupby
+from operator import itemgetter
+from dataclasses import dataclass
+from typing import List, Any, Union
 
-class CourseWithPrerequisites(TypedDict):  
-  id: int  
-  course: str  
-  credit: int  
+# Row fields follow the column order of the queries that build them
+@dataclass(slots=True)
+class CourseWithPrerequisites(Row):
+  id: int
+  course: str
+  credit: int
   prerequisites: str
 
-class Course(TypedDict):  
-  course: str  
-  id: int 
+@dataclass(slots=True)
+class Course(Row):
+  course: str
+  id: int
+
+@dataclass(slots=True)
+class CourseDetail(Row):
+  id: int
+  code: str
+  name: str
+  credit: int
+
+@dataclass(slots=True)
+class CourseWithPrerequisiteDetails(CourseDetail):
+  prerequisites: List[CourseDetail]
 
 class CourseManager:
   """
   Manages all database queries related to Courses and interacts with the DatabaseManager to execute the queries.
   """
 
-  def __init__(self, database_manager: DatabaseManager):
+  def __init__(self, database_manager: DatabaseManager, query_cache: QueryCache):
     """
-    Initializes the CourseManager instance and stores the provided DatabaseManager instance.
+    Initializes the CourseManager instance and stores the provided DatabaseManager and QueryCache instances.
 
     Arguments:
       - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+      - query_cache (QueryCache): Caches read results and invalidates them when this manager writes.
     """
     self._database_manager = database_manager
+    self._query_cache = query_cache
+    self._prerequisite_graph = None
     self._HTTP_OK = 200
 
-  def perform_query(self, query: str, parameters: tuple = None, method: str = None) -> Any:
+  def perform_query(self, query: str, parameters: tuple = None, method: str = None, many: bool = False) -> Any:
     """
     Helper function that calls the execute_query method of the DatabaseManager class
 
@@ -35,6 +58,7 @@ class CourseManager:
       - query (str): The SQL query to execute
       - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
       - method (str, optional): The query method, e.g., "fetchall", "fetchone", or "commit".
+      - many (bool, optional): Whether parameters is a list of parameter tuples to insert in one multi-row statement. Defaults to False.
 
     Returns:
       - Result if method is "fetchall" or "fetchone", else None
@@ -43,7 +67,7 @@ class CourseManager:
       QueryError: If an error occurs during the query execution.
     """  
     # Execute query and catch status code and query result/error response
-    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method)  
+    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method, many=many)  
 
     if status != self._HTTP_OK:  
       raise QueryError(f"An error occurred while executing the query: {result}")  
@@ -52,24 +76,35 @@ class CourseManager:
   def all(self, with_prerequisites: bool = False) -> Union[List[CourseWithPrerequisites], List[Course]]:
     """
     Retrieves all courses and optionally prerequisites
+    Results are served from the query cache until the courses or prerequisites are written
 
     Arguments: 
       - with_prerequisites (bool, optional): Whether course prerequisites should be retrieved with the courses, defaults to False.
 
     Returns:
-      - If with_prerequisites is True, list of dictionaries representing the courses. Each dictionary contains:
+      - If with_prerequisites is True, list of CourseWithPrerequisites rows representing the courses. Each row contains:
         - "id" (int): The course ID.
         - "course" (str): The course name and code.
         - "credit" (int): The number of credits.
         - "prerequisites" (str): A comma-separated list of prerequisite courses.
       
-      - If with_prerequisites is False: list of dictionaries representing the courses. Each dictionary contains:
+      - If with_prerequisites is False: list of Course rows representing the courses. Each row contains:
         - "course" (str): The course name and code.
         - "id" (int): The course ID.
 
     Raises:
       QueryError: If an error occurs during the query execution.
     """
+    return self._query_cache.fetch(
+      key=("CourseManager.all", with_prerequisites),
+      tables=("Courses", "Courses_has_Prerequisites") if with_prerequisites else ("Courses",),
+      loader=lambda: self._load_all(with_prerequisites)
+    )
+
+  def _load_all(self, with_prerequisites: bool = False):
+    """
+    Runs the all query without the cache, see all
+    """
     self._database_manager.check_connection()
 
     if with_prerequisites:
@@ -88,15 +123,7 @@ class CourseManager:
         ORDER BY c.code ASC
       """
     
-      return [
-        {
-          "id": row[0],
-          "course": row[1],
-          "credit": row[2],
-          "prerequisites": row[3]
-        }
-        for row in self.perform_query(query=query, method="fetchall")
-      ]
+      return [CourseWithPrerequisites(*row) for row in self.perform_query(query=query, method="fetchall")]
   
     else:
       query = """
@@ -107,13 +134,56 @@ class CourseManager:
         ORDER BY code ASC
       """
 
-      return [
-        {
-          "course": row[0],
-          "id": row[1]
-        }
-        for row in self.perform_query(query=query, method="fetchall")
-      ]
+      return [Course(*row) for row in self.perform_query(query=query, method="fetchall")]
+
+  def all_nested(self) -> List[CourseWithPrerequisiteDetails]:
+    """
+    Retrieves all courses with their prerequisites as nested course objects
+    Runs one flat join and groups the rows in Python, so course names containing commas are never split apart
+    Results are served from the query cache until the courses or prerequisites are written
+
+    Returns:
+      - List: A list of CourseWithPrerequisiteDetails rows representing the courses, ordered by code. Each row contains:
+        - "id" (int): The course ID
+        - "code" (str): The course code
+        - "name" (str): The course name
+        - "credit" (int): The number of credits
+        - "prerequisites" (list): The prerequisite courses ordered by code, each with "id", "code", "name" and "credit"
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    return self._query_cache.fetch(
+      key=("CourseManager.all_nested",),
+      tables=("Courses", "Courses_has_Prerequisites"),
+      loader=self._load_all_nested
+    )
+
+  def _load_all_nested(self) -> List[CourseWithPrerequisiteDetails]:
+    """
+    Runs the all_nested query without the cache, see all_nested
+    """
+    self._database_manager.check_connection()
+
+    query = """
+      SELECT
+        c.courseID, c.code, c.name, c.credit,
+        pc.courseID, pc.code, pc.name, pc.credit
+      FROM Courses c
+      LEFT JOIN Courses_has_Prerequisites p ON c.courseID = p.courseID
+      LEFT JOIN Courses pc ON p.prerequisiteID = pc.courseID
+      ORDER BY c.code ASC, c.courseID ASC, pc.code ASC
+    """
+
+    courses = []
+    for _, rows in groupby(self.perform_query(query=query, method="fetchall"), key=itemgetter(0)):
+      rows = list(rows)
+      courses.append(CourseWithPrerequisiteDetails(
+        *rows[0][:4],
+        prerequisites=[CourseDetail(*row[4:8]) for row in rows if row[4] is not None]
+      ))
+
+    return courses
 
   def get(self, course_code: int, fields: list = ["courseID"]) -> Course:
     """
@@ -139,9 +209,10 @@ class CourseManager:
 
     return self.perform_query(query=query, parameters=(course_code,), method="fetchone")
 
-  def create(self, course_code: str, course_name: str, course_credit: int) -> None:
+  def create(self, course_code: str, course_name: str, course_credit: int) -> bool:
     """
     Creates a new course
+    Runs as one upsert, so an existing row is reported from the affected row count instead of a separate lookup
 
     Arguments:
       - course_code (str): The code of the course (e.g. "CS161")
@@ -149,7 +220,7 @@ class CourseManager:
       - course_credit (int): The number of credits the course is worth
 
     Returns:
-      - None
+      - bool: True if it was created, False if a course with the code already exists
 
     Raises:
       QueryError: If an error occurs during the query execution.
@@ -159,13 +230,19 @@ class CourseManager:
     query = """
       INSERT INTO Courses (code, name, credit)
       VALUES (%s, %s, %s)
+      ON DUPLICATE KEY UPDATE code = code
     """
 
-    self.perform_query(query=query, parameters=(course_code, course_name, course_credit), method="commit")
+    with self._database_manager.transaction():
+      created = self.perform_query(query=query, parameters=(course_code, course_name, course_credit), method="rowcount") > 0
+      if created:
+        self._query_cache.invalidate("Courses")
+
+    return created
 
   def add_prerequisite(self, course_code: str, prerequisite_course_id: int) -> None:
     """
-    Adds prerequisites to a course
+    Adds a prerequisite to a course
 
     Arguments:
       - course_code (str): The code of the course (e.g. "CS161")
@@ -177,11 +254,91 @@ class CourseManager:
     Raises:
       QueryError: If an error occurs during the query execution.
     """
+    self.add_prerequisites(course_code, [prerequisite_course_id])
+
+  def add_prerequisites(self, course_code: str, prerequisite_course_ids: List[int]) -> None:
+    """
+    Adds prerequisites to a course in a single multi-row INSERT
+    The course ID is resolved from its code once for all rows
+    Edges that would make a course its own direct or transitive prerequisite are rejected
+
+    Arguments:
+      - course_code (str): The code of the course (e.g. "CS161")
+      - prerequisite_course_ids (list): The ids of the prerequisite courses
+
+    Returns:
+      - None
+
+    Raises:
+      QueryError: If the course does not exist, an edge would create a prerequisite cycle, or an error occurs during the query execution.
+    """
+    if not prerequisite_course_ids:
+      return
+
+    prerequisite_course_ids = [int(prerequisite_course_id) for prerequisite_course_id in prerequisite_course_ids]
+
+    with self._database_manager.transaction():
+      course = self.get(course_code)
+      if course is None:
+        raise QueryError(f"An error occurred while executing the query: no course with code {course_code} exists.")
+      course_id = course[0]
+
+      # Locking the version row first makes concurrent prerequisite writers check for cycles one at a time,
+      # each against a graph that includes the edges committed by the writers before it
+      version = self._query_cache.lock("Courses_has_Prerequisites")
+      graph = self.prerequisite_graph(version=version)
+
+      for prerequisite_course_id in prerequisite_course_ids:
+        if graph.would_create_cycle(course_id, prerequisite_course_id):
+          raise QueryError(f"Course {prerequisite_course_id} cannot be a prerequisite of {course_code} because it would create a prerequisite cycle.")
+
+      query = """
+        INSERT INTO Courses_has_Prerequisites (courseID, prerequisiteID)
+        VALUES (%s, %s)
+      """
+
+      self.perform_query(query=query, parameters=[(course_id, prerequisite_course_id) for prerequisite_course_id in prerequisite_course_ids], method="commit", many=True)
+      self._query_cache.invalidate("Courses_has_Prerequisites")
+
+      # Update the in-memory graph in place once the new edges are committed, at the version the commit bumped it to
+      def update_graph():
+        graph.add_edges(course_id, prerequisite_course_ids)
+        graph.version = version + 1
+        self._prerequisite_graph = graph
+
+      self._database_manager.on_commit(update_graph)
+
+  def prerequisite_graph(self, version: int = None) -> PrerequisiteGraph:
+    """
+    Returns the in-memory prerequisite graph, rebuilding it from one bulk read of Courses_has_Prerequisites when it is out of date
+
+    Arguments:
+      - version (int, optional): The Courses_has_Prerequisites data version the graph must be at. Defaults to the current version.
+
+    Returns:
+      - PrerequisiteGraph: The prerequisite graph
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    if version is None:
+      (version,) = self._query_cache.versions(("Courses_has_Prerequisites",))
+
+    graph = self._prerequisite_graph
+    if graph is not None and graph.version == version:
+      return graph
+
     self._database_manager.check_connection()
-    
-    query = """
-      INSERT INTO Courses_has_Prerequisites (courseID, prerequisiteID)
-      VALUES ((SELECT courseID FROM Courses WHERE code = %s), %s)
+
+    # Inside a transaction a locking read sees the latest committed edges even when the transaction has an older snapshot
+    lock = "LOCK IN SHARE MODE" if self._database_manager.in_transaction() else ""
+
+    query = f"""
+      SELECT courseID, prerequisiteID
+      FROM Courses_has_Prerequisites
+      {lock}
     """
 
-    self.perform_query(query=query, parameters=(course_code, prerequisite_course_id), method="commit")
\ No newline at end of file
+    graph = PrerequisiteGraph(self.perform_query(query=query, method="fetchall"), version=version)
+    self._prerequisite_graph = graph
+    return graph
@@ -0,0 +1,178 @@
+from database.DatabaseManager import DatabaseManager
+from blueprints.errorHandlers import QueryError
+from flask import g, has_app_context
+from typing import Dict, Set, Tuple, Any
+
+class DataVersionManager:
+  """
+  Manages the per-table data version counters stored in the DataVersions table and interacts with the DatabaseManager to execute the queries.
+  Every write through a manager bumps the counters of the tables it changed, in the same transaction as the write.
+  Since the counters live in the database, every gunicorn worker sees a bump as soon as the write commits.
+  """
+
+  def __init__(self, database_manager: DatabaseManager):
+    """
+    Initializes the DataVersionManager instance and stores the provided DatabaseManager instance.
+
+    Arguments:
+      - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+    """
+    self._database_manager = database_manager
+    self._HTTP_OK = 200
+
+  def perform_query(self, query: str, parameters: tuple = None, method: str = None, many: bool = False) -> Any:
+    """
+    Helper function that calls the execute_query method of the DatabaseManager class
+
+    Arguments:
+      - query (str): The SQL query to execute
+      - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
+      - method (str, optional): The query method, e.g., "fetchall", "fetchone", or "commit".
+      - many (bool, optional): Whether parameters is a list of parameter tuples to insert in one multi-row statement. Defaults to False.
+
+    Returns:
+      - Result if method is "fetchall" or "fetchone", else None
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    # Execute query and catch status code and query result/error response
+    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method, many=many)
+
+    if status != self._HTTP_OK:
+      raise QueryError(f"An error occurred while executing the query: {result}")
+    return result
+
+  def all(self) -> Dict[str, int]:
+    """
+    Retrieves every table's data version
+    Inside a request the versions are read once and reused until the request bumps a version
+
+    Returns:
+      - Dictionary of table name to version; tables that were never written are absent
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    if has_app_context() and "data_versions" in g:
+      return g.data_versions
+
+    self._database_manager.check_connection()
+
+    query = """
+      SELECT tableName, version
+      FROM DataVersions
+    """
+
+    versions = {row[0]: row[1] for row in self.perform_query(query=query, method="fetchall")}
+
+    if has_app_context():
+      g.data_versions = versions
+
+    return versions
+
+  def get(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+    """
+    Retrieves the data versions of the given tables
+
+    Arguments:
+      - tables (tuple): The table names
+
+    Returns:
+      - Tuple of versions in the same order as tables, 0 for tables that were never written
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    versions = self.all()
+    return tuple(versions.get(table, 0) for table in tables)
+
+  def bump(self, *tables: str) -> None:
+    """
+    Increments the data versions of the given tables
+    Call inside the same transaction as the write so the bump commits or rolls back with it
+    Inside a transaction the tables are collected and bumped once, right before the transaction commits,
+    so a transaction that writes one table several times, e.g. a plan batch edit, bumps its version once
+
+    Arguments:
+      - tables (str): The names of the tables that were written
+
+    Returns:
+      - None
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    if self._database_manager.in_transaction():
+      state = self._database_manager.transaction_state()
+      if "data_version_bumps" not in state:
+        state["data_version_bumps"] = set()
+        self._database_manager.before_commit(lambda: self._bump_now(*sorted(state["data_version_bumps"])))
+      state["data_version_bumps"].update(tables)
+      return
+
+    self._bump_now(*tables)
+
+  def lock(self, table: str) -> int:
+    """
+    Locks a table's data version row until the current transaction ends and returns the table's committed version
+    Writers that lock the same table run one at a time, e.g. to check a write against data no other writer is changing.
+    Bumps of the table in the same transaction still wait for the commit, so once it commits the version is one higher.
+
+    Arguments:
+      - table (str): The table name
+
+    Returns:
+      - int: The version, 0 if the table was never written
+
+    Raises:
+      QueryError: If called outside of a transaction or an error occurs during the query execution.
+    """
+    if not self._database_manager.in_transaction():
+      raise QueryError("An error occurred while executing the query: data versions can only be locked inside a transaction")
+
+    self._database_manager.check_connection()
+
+    # A missing row could only be gap locked, which does not keep a second writer out, so create it first
+    query = """
+      INSERT INTO DataVersions (tableName, version)
+      VALUES (%s, 0)
+      ON DUPLICATE KEY UPDATE version = version
+    """
+
+    self.perform_query(query=query, parameters=(table,), method="rowcount")
+
+    # A locking read sees the latest committed version even when the transaction has an older snapshot
+    query = """
+      SELECT version
+      FROM DataVersions
+      WHERE tableName = %s
+      FOR UPDATE
+    """
+
+    (version,) = self.perform_query(query=query, parameters=(table,), method="fetchone")
+    return version
+
+  def pending(self) -> Set[str]:
+    """
+    Returns the tables written in the current transaction whose bumps wait for it to commit; empty outside of a transaction
+    """
+    return self._database_manager.transaction_state().get("data_version_bumps", set())
+
+  def _bump_now(self, *tables: str) -> None:
+    """
+    Runs the bump query, see bump
+    """
+    self._database_manager.check_connection()
+
+    query = """
+      INSERT INTO DataVersions (tableName, version)
+      VALUES (%s, 1)
+      ON DUPLICATE KEY UPDATE version = version + 1
+    """
+
+    self.perform_query(query=query, parameters=[(table,) for table in tables], method="commit", many=True)
+
+    # Versions read earlier in this request are now out of date
+    if has_app_context():
+      g.pop("data_versions", None)
@@ -1,105 +1,430 @@
 import MySQLdb
-from blueprints.errorHandlers import DatabaseError
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_app_context
+from blueprints.errorHandlers import DatabaseError, QueryError
+from database.ConnectionPool import ConnectionPool
+from database.QueryMetrics import QueryMetrics
+from database.QueryBudget import QueryBudget
 from dotenv import load_dotenv
 import os
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Supported read freshness modes, see DatabaseManager docstring
+READ_FRESHNESS_MODES = ("read_committed", "autocommit", "repeatable_read")
+
+# MySQL client error codes meaning the server connection was lost: server gone away, lost during query, lost (SSL/other)
+LOST_CONNECTION_ERRORS = (2006, 2013, 2055)
+
+# Query methods that only read, so running them twice is safe; execute_query defaults to fetchall
+READ_METHODS = (None, "fetchall", "fetchone")
+
 class DatabaseManager:
   """
-  Manages the connection to the MySQL database
+  Manages the connections to the MySQL database
   Handles the following:
     - Connecting to the database
-    - Checking the connection status
-    - Executing queries
-    - Closing the cursor
+    - Checking connections out of and back into the connection pool
+    - Checking the connection status lazily, only after the connection has been idle for the ping interval
+    - Executing queries, reconnecting and replaying a read once if the connection was lost
+    - Streaming large reads through a server-side cursor
+    - Grouping queries from several manager calls into one transaction
+    - Recording query metrics and checking requests against the query budget
     - Closing the db connection
+
+  Each Flask app context (or, outside of Flask, each thread) checks out its own connection from the pool on first use.
+  The connection is returned to the pool when the app context is torn down, so concurrent requests never share a connection or cursor.
+
+  Reused connections still see up-to-date data because of the read freshness mode applied to every new session:
+    - read_committed (default): Every SELECT reads the latest committed data, even inside an open transaction
+    - autocommit: Every statement runs in its own transaction, so no read snapshot outlives its statement
+    - repeatable_read: The MySQL default; reads within a transaction share one snapshot
   """
 
   def __init__(self):
     """
     Initializes the DatabaseManager instance and environment variables to store as attributes
+    Opens the connection pool with the following optional environment variables:
+      - mysql_pool_min_size: Connections opened up front, defaults to 1
+      - mysql_pool_max_size: Maximum connections open at once, defaults to 10
+      - mysql_pool_timeout: Seconds to wait for a free connection, defaults to 10
+      - mysql_read_freshness: One of read_committed, autocommit or repeatable_read, defaults to read_committed
+      - mysql_ping_interval: Idle seconds after which a connection is pinged before it is used again, defaults to 30
+      - mysql_stream_chunk_size: Rows fetched per round trip by stream, defaults to 1000
+    Checks requests against a query budget with the following optional environment variables:
+      - query_budget_mode: One of off, warn or raise, defaults to off
+      - query_budget_max_queries: Statements a request may run, defaults to 20
+      - query_budget_max_repeats: Times a request may run one statement shape, defaults to 3
+
+    Raises:
+      DatabaseError: If the read freshness or query budget mode is not supported or the pool cannot connect.
     """
     # Initialize connection variables
     self._mysql_host = os.environ.get("mysql_host")
     self._mysql_user = os.environ.get("mysql_user")
     self._mysql_password = os.environ.get("mysql_password")
     self._mysql_database = os.environ.get("mysql_database")
-    self._mysql_connection = None
-    self._mysql_cursor = None
-    self.make_connection()
+    self._read_freshness = os.environ.get("mysql_read_freshness", "read_committed")
+    self._ping_interval = float(os.environ.get("mysql_ping_interval", 30))
+    self._stream_chunk_size = int(os.environ.get("mysql_stream_chunk_size", 1000))
+
+    if self._read_freshness not in READ_FRESHNESS_MODES:
+      raise DatabaseError(f"Unsupported read freshness mode: {self._read_freshness}. Expected one of {', '.join(READ_FRESHNESS_MODES)}")
+
+    # Initialize query metrics, query budget and connection pool
+    self._metrics = QueryMetrics()
+    self._query_budget = QueryBudget(
+      mode=os.environ.get("query_budget_mode", "off"),
+      max_queries=int(os.environ.get("query_budget_max_queries", 20)),
+      max_repeats=int(os.environ.get("query_budget_max_repeats", 3))
+    )
+    self._thread_state = threading.local()
+    self._pool = ConnectionPool(
+      self.make_connection,
+      min_size=int(os.environ.get("mysql_pool_min_size", 1)),
+      max_size=int(os.environ.get("mysql_pool_max_size", 10)),
+      timeout=float(os.environ.get("mysql_pool_timeout", 10)),
+      is_alive=self.is_alive,
+      check_after=self._ping_interval
+    )
 
-  def make_connection(self):
+  def _context(self):
     """
-    Makes a connection to the MySQL database using the provided environment variables
-    Sets up a cursor for executing queries
+    Returns the object that holds per-caller state: Flask's g inside an app context, otherwise a thread-local namespace
+    g itself rather than its proxy is returned, so a stream can still reach its context's state once the context is no longer current
+    """
+    return g._get_current_object() if has_app_context() else self._thread_state
+
+  def make_connection(self) -> MySQLdb.connections.Connection:
+    """
+    Makes a new connection to the MySQL database using the provided environment variables
+    Applies the read freshness mode to the new session
+    Used by the connection pool whenever it needs to open a connection
+
+    Returns:
+      - The new MySQL connection
+
+    Raises:
+      DatabaseError: If the connection cannot be made.
     """
     try:
-      # Make connection
-      self._mysql_connection = MySQLdb.connect(
-        self._mysql_host, 
-        self._mysql_user, 
-        self._mysql_password, 
-        self._mysql_database
+      connection = MySQLdb.connect(
+        self._mysql_host,
+        self._mysql_user,
+        self._mysql_password,
+        self._mysql_database,
+        autocommit=self._read_freshness == "autocommit"
       )
-      # Set cursor
-      self._mysql_cursor = self._mysql_connection.cursor()
-    
+
+      if self._read_freshness == "read_committed":
+        cursor = connection.cursor()
+        cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        cursor.close()
+
+      return connection
+
     except MySQLdb.DatabaseError as error:
       raise DatabaseError(f"An error occurred while connecting to the database: {error}")
 
-  def check_connection(self):
+  def is_alive(self, connection: MySQLdb.connections.Connection) -> bool:
     """
-    Checks if the current connection to the MySQL database is still active
-    If the connection is lost or encounters an error, it attempts to reconnect by calling the make_connection method
+    Pings a connection to check that it is still usable
+
+    Arguments:
+      - connection (Connection): The MySQL connection to check
+
+    Returns:
+      - bool: True if the server answered the ping, otherwise False
     """
     try:
-      # Check MySQL connection
-      self._mysql_connection.ping()
-
-      # Set cursor
-      self._mysql_cursor = self._mysql_connection.cursor()
+      connection.ping()
+      return True
 
     except MySQLdb.Error as error:
-      # If connection failed, restart connection
       print(f"Error connecting to database: {error}. Attempting to reconnect.")
-      self.make_connection()
+      return False
+
+  def get_connection(self) -> MySQLdb.connections.Connection:
+    """
+    Returns the connection checked out by the current app context or thread, checking one out of the pool if needed
+    Connections that sat idle in the pool past the ping interval are health checked by the pool before being handed out
+
+    Raises:
+      DatabaseError: If no connection becomes available within the pool timeout.
+    """
+    context = self._context()
+    connection = getattr(context, "mysql_connection", None)
+
+    if connection is None:
+      connection = self._pool.acquire()
+      context.mysql_connection = connection
+      context.mysql_last_used = time.monotonic()
+
+    return connection
+
+  def try_acquire_connection(self) -> MySQLdb.connections.Connection:
+    """
+    Checks a connection out of the pool without waiting, to hand to another thread with adopt_connection
+
+    Returns:
+      - The connection, or None if every connection is in use
+
+    Raises:
+      DatabaseError: If a new connection cannot be opened.
+    """
+    return self._pool.acquire(wait=False)
+
+  def adopt_connection(self, connection: MySQLdb.connections.Connection) -> None:
+    """
+    Makes a connection checked out with try_acquire_connection the current app context or thread's connection
+    It is returned to the pool by release_connection like any other connection
 
-  def close_cursor(self):
+    Arguments:
+      - connection (Connection): The checked out connection
+    """
+    context = self._context()
+    context.mysql_connection = connection
+    context.mysql_last_used = time.monotonic()
+
+  def release_connection(self, exception: BaseException = None) -> None:
+    """
+    Returns the current app context or thread's connection to the pool
+    Any uncommitted work is rolled back first so the next borrower starts clean
+    Registered as an app context teardown function, so exception is the error that ended the context if any
+    Flask tears a streamed response's context down once before its body is sent and again after; a stream that is still reading
+    from the connection then keeps it and returns it itself when it ends, see stream
+
+    Arguments:
+      - exception (BaseException, optional): Unused, passed by Flask on teardown
+    """
+    context = self._context()
+
+    if getattr(context, "mysql_streaming", False):
+      context.mysql_release_after_stream = True
+      return
+
+    self._release(context)
+
+  def _release(self, context, discard: bool = False) -> None:
     """
-    Closes the MySQL cursor
-    This method is called after each query is executed
+    Returns the connection held by the given per-caller state to the pool, or closes it if discard is True, see release_connection
     """
+    connection = getattr(context, "mysql_connection", None)
+
+    if connection is None:
+      return
+
+    context.mysql_connection = None
+
+    if discard:
+      self._pool.release(connection, discard=True)
+      return
+
     try:
-      self._mysql_cursor.close()
+      connection.rollback()
+      self._pool.release(connection)
 
-    except MySQLdb.DatabaseError as error:
-      raise DatabaseError(f"An error occurred while closing the database cursor: {error}")
+    except MySQLdb.Error:
+      self._pool.release(connection, discard=True)
+
+  def in_transaction(self) -> bool:
+    """
+    Returns whether the current app context or thread is inside a transaction block
+    """
+    return getattr(self._context(), "mysql_transaction_depth", 0) > 0
+
+  def on_commit(self, callback) -> None:
+    """
+    Runs a callback once the current transaction commits, or immediately outside of a transaction
+    Callbacks registered in a transaction that rolls back are dropped
+
+    Arguments:
+      - callback (callable): Function taking no arguments
+    """
+    if not self.in_transaction():
+      callback()
+      return
+
+    self._context().mysql_on_commit.append(callback)
+
+  def before_commit(self, callback) -> None:
+    """
+    Runs a callback inside the current transaction right before it commits, or immediately outside of a transaction
+    Queries run by the callback are part of the transaction, so they commit or roll back with it; a callback that raises rolls it back
+    Callbacks registered in a transaction that rolls back are dropped
+
+    Arguments:
+      - callback (callable): Function taking no arguments
+    """
+    if not self.in_transaction():
+      callback()
+      return
+
+    self._context().mysql_before_commit.append(callback)
+
+  def transaction_state(self) -> dict:
+    """
+    Returns a dictionary that lives as long as the current outermost transaction, for collecting work to do before it commits
+    Outside of a transaction a new, empty dictionary is returned every time
+    """
+    if not self.in_transaction():
+      return {}
+
+    return self._context().mysql_transaction_state
+
+  @contextmanager
+  def transaction(self):
+    """
+    Groups every query run inside the with block into one transaction
+    Managers join it automatically: their "commit" queries are deferred until the outermost block exits, which commits once
+    If the block raises, including a QueryError from a failed manager call, everything is rolled back and the exception is re-raised
+    Blocks may be nested; only the outermost one commits or rolls back
+
+    Usage:
+      with dm.transaction():
+        qm._studentTermPlans.create(...)
+        qm._studentTermPlans.add_courses(...)
+
+    Raises:
+      DatabaseError: If the transaction cannot be started, committed or rolled back.
+    """
+    context = self._context()
+    depth = getattr(context, "mysql_transaction_depth", 0)
+    connection = self.get_connection()
+
+    if depth == 0:
+      try:
+        connection.begin()
+      except MySQLdb.Error as error:
+        raise DatabaseError(f"An error occurred while starting a transaction: {error}")
+
+    if depth == 0:
+      context.mysql_on_commit = []
+      context.mysql_before_commit = []
+      context.mysql_transaction_state = {}
+    context.mysql_transaction_depth = depth + 1
+
+    try:
+      yield
+
+      # Run the before commit callbacks while the transaction is still open, including any they register themselves
+      if depth == 0:
+        while context.mysql_before_commit:
+          context.mysql_before_commit.pop(0)()
+
+    except BaseException:
+      context.mysql_transaction_depth = depth
+      if depth == 0:
+        try:
+          connection.rollback()
+        except MySQLdb.Error:
+          # The rollback failed because the connection is gone, so the server has already discarded the transaction
+          self.close_connection()
+      raise
+
+    context.mysql_transaction_depth = depth
+    if depth == 0:
+      try:
+        connection.commit()
+      except MySQLdb.Error as error:
+        self.close_connection()
+        raise DatabaseError(f"An error occurred while committing the transaction: {error}")
+
+      callbacks, context.mysql_on_commit = context.mysql_on_commit, []
+      for callback in callbacks:
+        callback()
+
+  def check_connection(self):
+    """
+    Checks if the current connection to the MySQL database is still active
+    The connection is only pinged once it has been idle for longer than the ping interval, so back to back queries cost no extra round trip
+    If the connection is lost or encounters an error, it is discarded and replaced with a new connection from the pool
+    A connection lost between checks is handled by execute_query, which reconnects and replays a read once
+    Inside a transaction the connection is never replaced, since that would silently drop the transaction's earlier queries
+    """
+    connection = self.get_connection()
+    context = self._context()
+
+    if self.in_transaction() or getattr(context, "mysql_streaming", False) or time.monotonic() - context.mysql_last_used < self._ping_interval:
+      return
+
+    if self.is_alive(connection):
+      context.mysql_last_used = time.monotonic()
+    else:
+      # If connection failed, replace connection
+      self._metrics.observe_reconnect()
+      self.close_connection()
+      self.get_connection()
 
   def close_connection(self):
     """
-    Closes the MySQL connection
-    This method is called on select pages to reset db cache
+    Closes the current app context or thread's MySQL connection instead of returning it to the pool
+    Only needed for a connection that is known to be unusable; stale reads are handled by the read freshness mode
+    """
+    self._release(self._context(), discard=True)
+
+  def _run_query(self, connection: MySQLdb.connections.Connection, query: str, parameters: tuple, method: str, many: bool):
+    """
+    Runs a single query on the given connection, see execute_query
+    MySQL errors are left for execute_query to handle
     """
+    cursor = connection.cursor()
+
     try:
-      self._mysql_connection.close()
-    
-    except MySQLdb.DatabaseError as error:
-      raise DatabaseError(f"An error occurred while closing the connection to the database: {error}")
+      if many:
+        cursor.executemany(query, parameters)
+      else:
+        cursor.execute(query, parameters)
+
+      if not method or method == "fetchall":
+        return (200, cursor.fetchall())
 
-  def execute_query(self, query: str, parameters: tuple = None, method: str = None):
+      elif method == "fetchone":
+        return (200, cursor.fetchone())
+
+      elif method == "commit":
+        # Inside a transaction block the commit is deferred to the end of the block
+        if not self.in_transaction():
+          connection.commit()
+        if cursor.rowcount == 0:
+          return (400, "Commit unsuccessful")
+        return (200, "Commit successful")
+
+      elif method == "rowcount":
+        # Like commit, but reports the affected row count instead of treating 0 rows as a failure
+        if not self.in_transaction():
+          connection.commit()
+        return (200, cursor.rowcount)
+
+      else:
+        return(500, f"Unsupported query method received: {method}")
+
+    finally:
+      try:
+        cursor.close()
+      except MySQLdb.Error:
+        pass
+
+  def execute_query(self, query: str, parameters: tuple = None, method: str = None, many: bool = False):
     """
     Executes a MySQL query on the database
     Depending on the method passed, it returns:
       - All results (fetchall)
       - A single result (fetchone)
-      - Commit changes (commit) 
+      - Commit changes (commit), deferred to the end of the block when called inside transaction()
+      - Commit changes and return the affected row count (rowcount), e.g. 0 when an upsert found an existing row
+    If the connection turns out to have been lost outside of a transaction, it is replaced, and a read is replayed once on the new connection.
+    Writes are not replayed, since a write, or its commit, may have reached the server before the connection was lost; the error is returned instead.
+    Every call is recorded in the query metrics and, when enabled, the request's query budget log
 
     Arguments:
       - query (str): The SQL query to execute
       - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
-      - method (str, optional): The query method, e.g., "fetchall", "fetchone", or "commit". Defaults to "fetchall".
+      - method (str, optional): The query method, e.g., "fetchall", "fetchone", "commit", or "rowcount". Defaults to "fetchall".
+      - many (bool, optional): Whether parameters is a list of parameter tuples to run with executemany, which sends an INSERT ... VALUES as one multi-row statement. Defaults to False.
 
     Returns:
       - Tuple with a status code and either the result or an error message
@@ -107,26 +432,127 @@ class DatabaseManager:
     if not parameters:
       parameters = ()
 
+    started = time.perf_counter()
+    status, result = self._execute_query(query, parameters, method, many)
+    self._metrics.observe_query(query, method, time.perf_counter() - started, status, result)
+    self._query_budget.record(query)
+
+    return (status, result)
+
+  def _execute_query(self, query: str, parameters: tuple, method: str, many: bool):
+    """
+    Runs a query, reconnecting and replaying a read once if the connection was lost, see execute_query
+    """
+    if getattr(self._context(), "mysql_streaming", False):
+      return (500, "The connection is still reading the rows of a stream; read the stream to the end first")
+
+    for attempt in range(2):
+      try:
+        result = self._run_query(self.get_connection(), query, parameters, method, many)
+        self._context().mysql_last_used = time.monotonic()
+        return result
+
+      except MySQLdb.OperationalError as error:
+        if self.in_transaction() or error.args[0] not in LOST_CONNECTION_ERRORS:
+          return (500, error)
+
+        # The lost connection cannot be used again, so the next query checks out a new one
+        self._metrics.observe_reconnect()
+        self.close_connection()
+
+        # Only reads are replayed; a write may already have been applied, and applying it twice would duplicate it
+        if attempt or method not in READ_METHODS:
+          return (500, error)
+
+        print(f"Lost connection to database: {error}. Reconnecting and retrying query.")
+
+      except MySQLdb.DatabaseError as error:
+        return (500, error)
+
+  def stream(self, query: str, parameters: tuple = None, chunk_size: int = None):
+    """
+    Runs a read query with an unbuffered server-side cursor (SSCursor) and yields its rows in chunks, so the whole result is never held in memory
+    The query runs on the current app context or thread's own connection, which is otherwise idle while e.g. a page renders the rows,
+    so a stream never waits on the pool for a second connection; inside a transaction it sees the transaction's writes.
+    A connection cannot run other queries until an unbuffered result has been read to the end, so until the stream ends
+    execute_query refuses to run on it. Inside a request, read the stream within the request, e.g. with stream_with_context.
+    A stream that is closed early, e.g. because the client went away, discards the connection instead of reading the rest of the rows
+    from the server; the next query checks out a new one. A stream whose context was torn down while it was reading,
+    e.g. a streamed response's, returns the connection to the pool itself when it ends.
+    The query is recorded in the query metrics once the stream ends, with the time spent waiting on the server.
+
+    Usage:
+      for chunk in dm.stream("SELECT studentID, firstName, lastName FROM Students"):
+        for row in chunk:
+          ...
+
+    Arguments:
+      - query (str): The SQL query to execute
+      - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
+      - chunk_size (int, optional): The number of rows fetched per round trip. Defaults to the mysql_stream_chunk_size environment variable.
+
+    Returns:
+      - Generator of row tuple lists
+
+    Raises:
+      DatabaseError: If no connection becomes available within the pool timeout.
+      QueryError: If another stream is open on the connection, the query fails or the connection is lost while streaming.
+    """
+    if not parameters:
+      parameters = ()
+
+    context = self._context()
+    if getattr(context, "mysql_streaming", False):
+      raise QueryError("An error occurred while executing the query: another stream is still reading from the connection")
+
+    self.check_connection()
+    self._query_budget.record(query)
+    connection = self.get_connection()
+    context.mysql_streaming = True
+    cursor = None
+    finished = False
+    status, rows, seconds = 500, 0, 0.0
+
     try:
-      self._mysql_cursor.execute(query, parameters)
-      
-      if not method or method == "fetchall":
-        return (200, self._mysql_cursor.fetchall())
-      
-      elif method == "fetchone":
-        return (200, self._mysql_cursor.fetchone())
-      
-      elif method == "commit":
-        self._mysql_connection.commit()
-        if self._mysql_cursor.rowcount == 0:
-          return (400, "Commit unsuccessful")
-        return (200, "Commit successful")
-      
-      else:
-        return(500, f"Unsupported query method received: {method}")
+      started = time.perf_counter()
+      cursor = connection.cursor(MySQLdb.cursors.SSCursor)
+      cursor.execute(query, parameters)
+
+      chunk = cursor.fetchmany(chunk_size or self._stream_chunk_size)
+      while chunk:
+        seconds += time.perf_counter() - started
+        rows += len(chunk)
+        yield chunk
+
+        started = time.perf_counter()
+        chunk = cursor.fetchmany(chunk_size or self._stream_chunk_size)
+
+      seconds += time.perf_counter() - started
+      status, finished = 200, True
+      cursor.close()
 
     except MySQLdb.DatabaseError as error:
-      return (500, error)
-    
+      raise QueryError(f"An error occurred while executing the query: {error}")
+
     finally:
-      self._mysql_cursor.close()
\ No newline at end of file
+      context.mysql_streaming = False
+      context.mysql_last_used = time.monotonic()
+
+      # Rows left unread keep the connection busy, so it is discarded rather than drained, unless that would drop an open transaction;
+      # only the context that still holds it may discard it, since it may have handed it back or thrown it away in the meantime.
+      # The context may no longer be current, e.g. when a client that went away closes a streamed response, so its state is used directly
+      if not finished and getattr(context, "mysql_connection", None) is connection:
+        if getattr(context, "mysql_transaction_depth", 0) > 0 and cursor is not None:
+          try:
+            cursor.close()
+          except MySQLdb.Error:
+            self._release(context, discard=True)
+        else:
+          self._release(context, discard=True)
+
+      # The context was torn down while the stream was reading, so nothing else will return its connection
+      if getattr(context, "mysql_release_after_stream", False):
+        context.mysql_release_after_stream = False
+        self._release(context)
+
+      self._metrics.observe_query(query, "stream", seconds, status, rows)
@@ -0,0 +1,167 @@
+from database.DatabaseManager import DatabaseManager
+from blueprints.errorHandlers import QueryError
+from dataclasses import dataclass
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Iterator, Tuple
+import csv
+import io
+import json
+import zlib
+
+@dataclass(frozen=True)
+class ExportEntity:
+  columns: Tuple[str, ...]
+  query: str
+  # Whether the last column collects the IDs of a joined table, one query row per ID
+  grouped: bool = False
+
+# Exportable entities by name, each read by one query ordered by its primary key
+EXPORT_ENTITIES = {
+  "students": ExportEntity(
+    columns=("studentID", "firstName", "lastName"),
+    query="""
+      SELECT studentID, firstName, lastName
+      FROM Students
+      ORDER BY studentID ASC
+    """
+  ),
+  "courses": ExportEntity(
+    columns=("courseID", "code", "name", "credit", "prerequisiteIDs"),
+    query="""
+      SELECT c.courseID, c.code, c.name, c.credit, p.prerequisiteID
+      FROM Courses c
+      LEFT JOIN Courses_has_Prerequisites p ON c.courseID = p.courseID
+      ORDER BY c.courseID ASC, p.prerequisiteID ASC
+    """,
+    grouped=True
+  ),
+  "terms": ExportEntity(
+    columns=("termID", "name", "startDate", "endDate", "courseIDs"),
+    query="""
+      SELECT t.termID, t.name, t.startDate, t.endDate, tc.courseID
+      FROM Terms t
+      LEFT JOIN Terms_has_Courses tc ON t.termID = tc.termID
+      ORDER BY t.termID ASC, tc.courseID ASC
+    """,
+    grouped=True
+  ),
+  "student-term-plans": ExportEntity(
+    columns=("studentTermPlanID", "studentID", "termID", "advisorApproved", "courseIDs"),
+    query="""
+      SELECT stp.studentTermPlanID, stp.studentID, stp.termID, stp.advisorApproved, stpc.courseID
+      FROM StudentTermPlans stp
+      LEFT JOIN StudentTermPlans_has_Courses stpc ON stp.studentTermPlanID = stpc.studentTermPlanID
+      ORDER BY stp.studentTermPlanID ASC, stpc.courseID ASC
+    """,
+    grouped=True
+  )
+}
+
+# Supported export formats and their media types
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Exports are written out in pieces of at least this many characters
+EXPORT_CHUNK_SIZE = 65536
+
+class ExportManager:
+  """
+  Exports whole tables as CSV or newline delimited JSON for bulk consumers, e.g. the registrar's nightly pull
+  Handles the following:
+    - Reading an entity in one pass through a server-side cursor, see DatabaseManager.stream
+    - Grouping the joined rows of each record, e.g. a plan's course IDs, without holding more than one record
+    - Writing the records out incrementally, optionally gzip compressed
+  Memory use stays the same however many rows are exported.
+  """
+
+  def __init__(self, database_manager: DatabaseManager):
+    """
+    Initializes the ExportManager instance and stores the provided DatabaseManager instance.
+
+    Arguments:
+      - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+    """
+    self._database_manager = database_manager
+
+  def records(self, entity: str) -> Iterator[tuple]:
+    """
+    Streams an entity's records in primary key order, one tuple of values per record in the order of its columns
+    The IDs of a grouped entity's last column are collected into a list, which is empty when there are none
+
+    Arguments:
+      - entity (str): One of the EXPORT_ENTITIES names
+
+    Returns:
+      - Generator of record tuples
+
+    Raises:
+      QueryError: If the entity is not exportable or an error occurs during the query execution.
+    """
+    if entity not in EXPORT_ENTITIES:
+      raise QueryError(f"Unsupported export entity: {entity}. Expected one of {', '.join(EXPORT_ENTITIES)}")
+
+    export_entity = EXPORT_ENTITIES[entity]
+    rows = chain.from_iterable(self._database_manager.stream(query=export_entity.query))
+
+    if not export_entity.grouped:
+      yield from rows
+      return
+
+    for _, group in groupby(rows, key=itemgetter(0)):
+      first = next(group)
+      ids = [] if first[-1] is None else [first[-1]]
+      ids.extend(row[-1] for row in group)
+      yield first[:-1] + (ids,)
+
+  def export(self, entity: str, export_format: str = "csv", compress: bool = False) -> Iterator[bytes]:
+    """
+    Streams an entity's records as CSV, with a header row and the IDs joined by semicolons, or as one JSON object per line
+    The output is encoded as UTF-8 and yielded in pieces; no piece is yielded before the first rows have been read,
+    so a failing query raises on the first next() rather than partway through the output
+
+    Arguments:
+      - entity (str): One of the EXPORT_ENTITIES names
+      - export_format (str, optional): "csv" or "ndjson". Defaults to "csv".
+      - compress (bool, optional): Whether to gzip the output. Defaults to False.
+
+    Returns:
+      - Generator of byte strings
+
+    Raises:
+      QueryError: If the entity or format is not supported or an error occurs during the query execution.
+    """
+    if entity not in EXPORT_ENTITIES:
+      raise QueryError(f"Unsupported export entity: {entity}. Expected one of {', '.join(EXPORT_ENTITIES)}")
+    if export_format not in EXPORT_FORMATS:
+      raise QueryError(f"Unsupported export format: {export_format}. Expected one of {', '.join(EXPORT_FORMATS)}")
+
+    records = self.records(entity)
+    columns = EXPORT_ENTITIES[entity].columns
+    grouped = EXPORT_ENTITIES[entity].grouped
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+
+    if export_format == "csv":
+      writer = csv.writer(buffer, lineterminator="\n")
+      writer.writerow(columns)
+
+    try:
+      for record in records:
+        if export_format == "csv":
+          writer.writerow(record[:-1] + (";".join(map(str, record[-1])),) if grouped else record)
+        else:
+          buffer.write(json.dumps(dict(zip(columns, record)), default=str))
+          buffer.write("\n")
+
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+          piece = buffer.getvalue().encode()
+          buffer.seek(0)
+          buffer.truncate()
+          yield compressor.compress(piece) if compressor else piece
+
+      piece = buffer.getvalue().encode()
+      yield compressor.compress(piece) + compressor.flush() if compressor else piece
+
+    finally:
+      # Return the stream's connection when the consumer stops early
+      records.close()
@@ -0,0 +1,119 @@
+from database.DatabaseManager import DatabaseManager
+from blueprints.errorHandlers import QueryError
+from typing import TypedDict, Any
+
+class StoredResponse(TypedDict):
+  requestPath: str
+  statusCode: int
+  responseBody: str
+
+class IdempotencyKeyManager:
+  """
+  Manages all database queries related to IdempotencyKeys and interacts with the DatabaseManager to execute the queries.
+  A write request sent with an Idempotency-Key header has its response stored under the key in the same transaction as the write,
+  so a retry of the request can be answered with the stored response instead of being applied again.
+  """
+
+  def __init__(self, database_manager: DatabaseManager, ttl: int = 86400):
+    """
+    Initializes the IdempotencyKeyManager instance and stores the provided DatabaseManager instance.
+
+    Arguments:
+      - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+      - ttl (int, optional): Seconds a stored response is kept. Defaults to one day.
+    """
+    self._database_manager = database_manager
+    self._ttl = ttl
+    self._HTTP_OK = 200
+
+  def perform_query(self, query: str, parameters: tuple = None, method: str = None, many: bool = False) -> Any:
+    """
+    Helper function that calls the execute_query method of the DatabaseManager class
+
+    Arguments:
+      - query (str): The SQL query to execute
+      - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
+      - method (str, optional): The query method, e.g., "fetchall", "fetchone", "commit", or "rowcount".
+      - many (bool, optional): Whether parameters is a list of parameter tuples to insert in one multi-row statement. Defaults to False.
+
+    Returns:
+      - Result if method is "fetchall", "fetchone" or "rowcount", else None
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    # Execute query and catch status code and query result/error response
+    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method, many=many)
+
+    if status != self._HTTP_OK:
+      raise QueryError(f"An error occurred while executing the query: {result}")
+    return result
+
+  def get(self, idempotency_key: str) -> StoredResponse:
+    """
+    Retrieves the response stored under an idempotency key, ignoring expired responses
+
+    Arguments:
+      - idempotency_key (str): The value of the request's Idempotency-Key header
+
+    Returns:
+      - Dictionary: A dictionary representing the stored response, or None if there is none. It contains:
+        - "requestPath" (str): The path of the request that stored the response
+        - "statusCode" (int): The response status code
+        - "responseBody" (str): The response body
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    self._database_manager.check_connection()
+
+    query = """
+      SELECT requestPath, statusCode, responseBody
+      FROM IdempotencyKeys
+      WHERE idempotencyKey = %s AND createdAt > NOW() - INTERVAL %s SECOND
+    """
+
+    result = self.perform_query(query=query, parameters=(idempotency_key, self._ttl), method="fetchone")
+
+    if result is None:
+      return None
+
+    return {
+      "requestPath": result[0],
+      "statusCode": result[1],
+      "responseBody": result[2]
+    }
+
+  def save(self, idempotency_key: str, request_path: str, status_code: int, response_body: str) -> bool:
+    """
+    Stores a response under an idempotency key, replacing an expired response stored under the same key
+    Call this in the transaction that made the request's writes, so the response is only stored if they commit
+
+    Arguments:
+      - idempotency_key (str): The value of the request's Idempotency-Key header
+      - request_path (str): The request path
+      - status_code (int): The response status code
+      - response_body (str): The response body
+
+    Returns:
+      - bool: True if the response was stored, False if a concurrent request already stored a response under the key
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    self._database_manager.check_connection()
+
+    with self._database_manager.transaction():
+      self.perform_query(
+        query="DELETE FROM IdempotencyKeys WHERE createdAt <= NOW() - INTERVAL %s SECOND",
+        parameters=(self._ttl,),
+        method="rowcount"
+      )
+
+      query = """
+        INSERT INTO IdempotencyKeys (idempotencyKey, requestPath, statusCode, responseBody)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE idempotencyKey = idempotencyKey
+      """
+
+      return self.perform_query(query=query, parameters=(idempotency_key, request_path, status_code, response_body), method="rowcount") > 0
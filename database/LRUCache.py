@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+class LRUCache:
+  """
+  Thread-safe, size-bounded least-recently-used cache with an optional time to live
+  Handles the following:
+    - Looking up entries, counting hits and misses
+    - Storing entries, evicting the least recently used entry once the cache is full
+    - Expiring entries older than the time to live
+  """
+
+  def __init__(self, max_size: int = 128, ttl: float = None):
+    """
+    Initializes the LRUCache instance
+
+    Arguments:
+      - max_size (int, optional): The maximum number of entries kept. Defaults to 128.
+      - ttl (float, optional): The number of seconds an entry stays valid. Defaults to no expiry.
+    """
+    self._max_size = max_size
+    self._ttl = ttl
+    self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key: Hashable) -> Tuple[bool, Any]:
+    """
+    Looks up an entry and marks it as most recently used
+
+    Arguments:
+      - key (hashable): The entry key
+
+    Returns:
+      - Tuple of whether the entry was found and its value (None if not found)
+    """
+    with self._lock:
+      entry = self._entries.get(key)
+
+      if entry is not None and (self._ttl is None or time.monotonic() - entry[0] < self._ttl):
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return (True, entry[1])
+
+      if entry is not None:
+        del self._entries[key]
+      self.misses += 1
+      return (False, None)
+
+  def set(self, key: Hashable, value: Any) -> None:
+    """
+    Stores an entry, evicting the least recently used entry if the cache is full
+
+    Arguments:
+      - key (hashable): The entry key
+      - value: The value to store
+    """
+    with self._lock:
+      self._entries[key] = (time.monotonic(), value)
+      self._entries.move_to_end(key)
+
+      while len(self._entries) > self._max_size:
+        self._entries.popitem(last=False)
+
+  def clear(self) -> None:
+    """
+    Removes every entry
+    """
+    with self._lock:
+      self._entries.clear()
+
+  def __len__(self) -> int:
+    return len(self._entries)
@@ -0,0 +1,154 @@
+from database.DatabaseManager import DatabaseManager
+from blueprints.errorHandlers import QueryError
+from typing import List, TypedDict, Any
+import os
+import re
+
+class Migration(TypedDict):
+  version: int
+  name: str
+  path: str
+
+class MigrationManager:
+  """
+  Applies the numbered SQL migrations in database/migrations and records each applied version in the SchemaVersion table
+  Migration files are named NNN_description.sql and are applied in version order.
+  Each file must be idempotent, e.g. CREATE ... IF NOT EXISTS, since MySQL commits DDL statements implicitly
+  and a migration interrupted half-way is simply run again.
+  """
+
+  MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+  def __init__(self, database_manager: DatabaseManager, migrations_directory: str = None):
+    """
+    Initializes the MigrationManager instance and stores the provided DatabaseManager instance.
+
+    Arguments:
+      - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+      - migrations_directory (str, optional): The directory containing the migration files. Defaults to database/migrations.
+    """
+    self._database_manager = database_manager
+    self._migrations_directory = migrations_directory or self.MIGRATIONS_DIRECTORY
+    self._HTTP_OK = 200
+
+  def perform_query(self, query: str, parameters: tuple = None, method: str = None, many: bool = False) -> Any:
+    """
+    Helper function that calls the execute_query method of the DatabaseManager class
+
+    Arguments:
+      - query (str): The SQL query to execute
+      - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
+      - method (str, optional): The query method, e.g., "fetchall", "fetchone", or "commit".
+      - many (bool, optional): Whether parameters is a list of parameter tuples to insert in one multi-row statement. Defaults to False.
+
+    Returns:
+      - Result if method is "fetchall" or "fetchone", else None
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    # Execute query and catch status code and query result/error response
+    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method, many=many)
+
+    if status != self._HTTP_OK:
+      raise QueryError(f"An error occurred while executing the query: {result}")
+    return result
+
+  def available(self) -> List[Migration]:
+    """
+    Lists the migration files in version order
+
+    Returns:
+      - List: A list of dictionaries representing the migrations. Each dictionary contains:
+        - "version" (int): The migration number
+        - "name" (str): The file name
+        - "path" (str): The path to the file
+    """
+    migrations = []
+    for name in sorted(os.listdir(self._migrations_directory)):
+      match = re.match(r"^(\d+)_\w+\.sql$", name)
+      if match:
+        migrations.append({"version": int(match.group(1)), "name": name, "path": os.path.join(self._migrations_directory, name)})
+
+    return sorted(migrations, key=lambda migration: migration["version"])
+
+  def current(self) -> int:
+    """
+    Retrieves the highest applied migration version, creating the SchemaVersion table if it does not exist yet
+
+    Returns:
+      - int: The schema version, 0 if no migration has been applied
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    self._database_manager.check_connection()
+
+    self.perform_query(query="""
+      CREATE TABLE IF NOT EXISTS SchemaVersion (
+        version INT NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        appliedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (version)
+      )
+    """, method="fetchall")
+
+    result = self.perform_query(query="SELECT MAX(version) FROM SchemaVersion", method="fetchone")
+    return result[0] or 0
+
+  def pending(self) -> List[Migration]:
+    """
+    Lists the migrations newer than the current schema version, see available
+    """
+    current = self.current()
+    return [migration for migration in self.available() if migration["version"] > current]
+
+  def migrate(self, target: int = None) -> List[Migration]:
+    """
+    Applies every pending migration up to and including the target version
+    Each migration's statements and its SchemaVersion row are run in one transaction,
+    so the version is only recorded once every statement has succeeded
+
+    Arguments:
+      - target (int, optional): The version to migrate to. Defaults to the newest migration.
+
+    Returns:
+      - List: The migrations that were applied, see available
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    applied = []
+
+    for migration in self.pending():
+      if target is not None and migration["version"] > target:
+        break
+
+      with open(migration["path"], encoding="utf-8") as file:
+        statements = self.split_statements(file.read())
+
+      with self._database_manager.transaction():
+        for statement in statements:
+          self.perform_query(query=statement, method="fetchall")
+
+        self.perform_query(
+          query="INSERT INTO SchemaVersion (version, name) VALUES (%s, %s)",
+          parameters=(migration["version"], migration["name"]),
+          method="commit"
+        )
+
+      applied.append(migration)
+
+    return applied
+
+  @staticmethod
+  def split_statements(sql: str) -> List[str]:
+    """
+    Splits the contents of a migration file into its statements, dropping "--" comment lines
+    Statements end with a semicolon at the end of a line
+
+    Arguments:
+      - sql (str): The contents of a migration file
+    """
+    sql = "\n".join(line for line in sql.splitlines() if not line.strip().startswith("--"))
+    return [statement.strip() for statement in re.split(r";\s*$", sql, flags=re.MULTILINE) if statement.strip()]
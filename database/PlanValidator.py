@@ -0,0 +1,121 @@
+from database.DatabaseManager import DatabaseManager
+from database.CourseManager import CourseManager
+from blueprints.errorHandlers import QueryError
+from itertools import groupby
+from operator import itemgetter
+from typing import List, TypedDict, Any
+
+class PlanViolation(TypedDict):
+  studentID: str
+  studentTermPlanID: int
+  termID: int
+  termName: str
+  courseID: int
+  missingPrerequisiteIDs: List[int]
+
+class PlanValidator:
+  """
+  Checks every student term plan for courses whose prerequisites are not covered by the student's plans in earlier terms.
+  Loads all plans and prerequisite edges in two set-based queries and evaluates every student in a single pass.
+  """
+
+  def __init__(self, database_manager: DatabaseManager, course_manager: CourseManager):
+    """
+    Initializes the PlanValidator instance and stores the provided DatabaseManager and CourseManager instances.
+
+    Arguments:
+      - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+      - course_manager (CourseManager): Provides the prerequisite graph.
+    """
+    self._database_manager = database_manager
+    self._courses = course_manager
+    self._HTTP_OK = 200
+
+  def perform_query(self, query: str, parameters: tuple = None, method: str = None, many: bool = False) -> Any:
+    """
+    Helper function that calls the execute_query method of the DatabaseManager class
+
+    Arguments:
+      - query (str): The SQL query to execute
+      - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
+      - method (str, optional): The query method, e.g., "fetchall", "fetchone", or "commit".
+      - many (bool, optional): Whether parameters is a list of parameter tuples to insert in one multi-row statement. Defaults to False.
+
+    Returns:
+      - Result if method is "fetchall" or "fetchone", else None
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    # Execute query and catch status code and query result/error response
+    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method, many=many)
+
+    if status != self._HTTP_OK:
+      raise QueryError(f"An error occurred while executing the query: {result}")
+    return result
+
+  def validate(self, student_id: str = None) -> List[PlanViolation]:
+    """
+    Finds every planned course with a direct prerequisite that is not planned in one of the student's earlier terms
+    Terms are ordered by start date, then by term ID for terms that share a start date; courses planned in the same term do not satisfy each other's prerequisites
+    Checking direct prerequisites is enough, since a missing transitive prerequisite is reported against the earlier course that needs it
+
+    Arguments:
+      - student_id (str, optional): Only validate this student's plans. Defaults to every student.
+
+    Returns:
+      - List: A list of dictionaries representing the violations, ordered by student and term. Each dictionary contains:
+        - "studentID" (str): The student ID
+        - "studentTermPlanID" (int): The plan containing the course
+        - "termID" (int): The term ID
+        - "termName" (str): The term name
+        - "courseID" (int): The course missing prerequisites
+        - "missingPrerequisiteIDs" (list): The IDs of the prerequisites not planned in an earlier term
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    graph = self._courses.prerequisite_graph()
+
+    self._database_manager.check_connection()
+
+    query = """
+      SELECT
+        stp.studentID,
+        t.startDate,
+        stp.studentTermPlanID,
+        t.termID,
+        t.name,
+        stpc.courseID
+      FROM StudentTermPlans stp
+      INNER JOIN Terms t ON stp.termID = t.termID
+      INNER JOIN StudentTermPlans_has_Courses stpc ON stp.studentTermPlanID = stpc.studentTermPlanID
+      WHERE stpc.courseID IS NOT NULL {}
+      ORDER BY stp.studentID, t.startDate, t.termID, stp.studentTermPlanID
+    """.format("AND stp.studentID = %s" if student_id else "")
+
+    rows = self.perform_query(query=query, parameters=(student_id,) if student_id else None, method="fetchall")
+
+    violations = []
+    for _, student_rows in groupby(rows, key=itemgetter(0)):
+      # Courses planned in the student's earlier terms
+      completed = set()
+
+      for _, term_rows in groupby(student_rows, key=itemgetter(1, 3)):
+        term_rows = list(term_rows)
+
+        for studentID, _, studentTermPlanID, termID, termName, courseID in term_rows:
+          missing = graph.direct_prerequisites(courseID) - completed
+          if missing:
+            violations.append({
+              "studentID": studentID,
+              "studentTermPlanID": studentTermPlanID,
+              "termID": termID,
+              "termName": termName,
+              "courseID": courseID,
+              "missingPrerequisiteIDs": sorted(missing)
+            })
+
+        completed.update(row[5] for row in term_rows)
+
+    return violations
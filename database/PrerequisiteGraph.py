@@ -0,0 +1,92 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+class PrerequisiteGraph:
+  """
+  In-memory directed graph of course prerequisites, keyed by integer course ID
+  Handles the following:
+    - Building the graph from (courseID, prerequisiteID) edges
+    - Adding edges incrementally
+    - Finding every direct or transitive prerequisite of a course
+    - Checking whether a new edge would create a prerequisite cycle
+  Lookups walk each course and edge at most once, so they run in time linear in the size of the graph.
+  """
+
+  def __init__(self, edges: Iterable[Tuple[int, int]] = (), version: int = None):
+    """
+    Initializes the PrerequisiteGraph instance
+
+    Arguments:
+      - edges (iterable, optional): (courseID, prerequisiteID) pairs, e.g. the rows of Courses_has_Prerequisites
+      - version (int, optional): The Courses_has_Prerequisites data version the edges were read at
+    """
+    self._prerequisites: Dict[int, Set[int]] = defaultdict(set)
+    self._lock = threading.RLock()
+    self.version = version
+
+    for course_id, prerequisite_id in edges:
+      self._prerequisites[int(course_id)].add(int(prerequisite_id))
+
+  def add_edges(self, course_id: int, prerequisite_ids: Iterable[int]) -> None:
+    """
+    Adds prerequisites to a course
+
+    Arguments:
+      - course_id (int): The course ID
+      - prerequisite_ids (iterable): The IDs of the prerequisite courses
+    """
+    with self._lock:
+      self._prerequisites[int(course_id)].update(int(prerequisite_id) for prerequisite_id in prerequisite_ids)
+
+  def direct_prerequisites(self, course_id: int) -> Set[int]:
+    """
+    Returns the IDs of the courses that are direct prerequisites of a course
+
+    Arguments:
+      - course_id (int): The course ID
+    """
+    with self._lock:
+      return set(self._prerequisites.get(int(course_id), ()))
+
+  def prerequisites_of(self, course_id: int) -> Set[int]:
+    """
+    Returns the IDs of every direct and transitive prerequisite of a course
+
+    Arguments:
+      - course_id (int): The course ID
+    """
+    found: Set[int] = set()
+    stack: List[int] = [int(course_id)]
+
+    with self._lock:
+      while stack:
+        for prerequisite_id in self._prerequisites.get(stack.pop(), ()):
+          if prerequisite_id not in found:
+            found.add(prerequisite_id)
+            stack.append(prerequisite_id)
+
+    return found
+
+  def would_create_cycle(self, course_id: int, prerequisite_id: int) -> bool:
+    """
+    Checks whether making prerequisite_id a prerequisite of course_id would create a cycle
+    That is the case when the course is the prerequisite itself or already one of the prerequisite's own transitive prerequisites
+
+    Arguments:
+      - course_id (int): The course ID
+      - prerequisite_id (int): The ID of the prospective prerequisite course
+    """
+    course_id = int(course_id)
+    return course_id == int(prerequisite_id) or course_id in self.prerequisites_of(prerequisite_id)
+
+  def edges(self) -> List[Tuple[int, int]]:
+    """
+    Returns every (courseID, prerequisiteID) edge
+    """
+    with self._lock:
+      return [
+        (course_id, prerequisite_id)
+        for course_id, prerequisite_ids in self._prerequisites.items()
+        for prerequisite_id in prerequisite_ids
+      ]
@@ -0,0 +1,162 @@
+import re
+from collections import Counter
+from functools import wraps
+from flask import g, has_app_context
+from blueprints.errorHandlers import DatabaseError, QueryBudgetError
+from typing import List
+
+# Supported query budget modes, see QueryBudget docstring
+QUERY_BUDGET_MODES = ("off", "warn", "raise")
+
+# Shapes are memoized per query string up to this many distinct strings
+MAX_QUERY_SHAPES = 2048
+
+# Runs of placeholders, e.g. the "%s, %s, %s" of an IN list or the "(%s, %s), (%s, %s)" of a multi-row VALUES
+PLACEHOLDER_RUN_PATTERN = re.compile(r"(\(?%s(?:\s*,\s*%s)*\)?)(?:\s*,\s*\(?%s(?:\s*,\s*%s)*\)?)+")
+
+class QueryBudget:
+  """
+  Records every statement run during a request and checks the request against a query budget
+  Flags two problems:
+    - More statements than the budget allows
+    - The same statement shape run more times than allowed, which usually means a query is issued once per item (N+1)
+  Modes:
+    - off (default): Nothing is recorded
+    - warn: Problems are printed and the request's query count is added as an X-Query-Count response header
+    - raise: As warn, but the request fails with a QueryBudgetError, which the Flask test client re-raises in tests
+  """
+
+  def __init__(self, mode: str = "off", max_queries: int = 20, max_repeats: int = 3):
+    """
+    Initializes the QueryBudget instance
+
+    Arguments:
+      - mode (str, optional): One of off, warn or raise. Defaults to off.
+      - max_queries (int, optional): The most statements a request may run. Defaults to 20.
+      - max_repeats (int, optional): The most times a request may run one statement shape. Defaults to 3.
+
+    Raises:
+      DatabaseError: If the mode is not supported.
+    """
+    if mode not in QUERY_BUDGET_MODES:
+      raise DatabaseError(f"Unsupported query budget mode: {mode}. Expected one of {', '.join(QUERY_BUDGET_MODES)}")
+
+    self.mode = mode
+    self.max_queries = max_queries
+    self.max_repeats = max_repeats
+    self._shapes = {}
+
+  @property
+  def enabled(self) -> bool:
+    """
+    Whether statements are being recorded
+    """
+    return self.mode != "off"
+
+  def shape(self, query: str) -> str:
+    """
+    Normalizes a query so that calls differing only in their number of parameters share one shape
+    Whitespace is collapsed and every run of placeholders becomes a single "%s..."
+
+    Arguments:
+      - query (str): The SQL query
+    """
+    shape = self._shapes.get(query)
+
+    if shape is None:
+      shape = PLACEHOLDER_RUN_PATTERN.sub("%s...", " ".join(query.split()))
+
+      if len(self._shapes) < MAX_QUERY_SHAPES:
+        self._shapes[query] = shape
+
+    return shape
+
+  def record(self, query: str) -> None:
+    """
+    Adds a statement to the current request's query log; does nothing when the budget is off or outside a request
+
+    Arguments:
+      - query (str): The SQL query
+    """
+    if not self.enabled or not has_app_context():
+      return
+
+    if "query_log" not in g:
+      g.query_log = []
+    g.query_log.append(self.shape(query))
+
+  def check(self, request_globals=None) -> List[str]:
+    """
+    Checks the current request's query log against the budget, using the route's own limits if it set any with query_budget
+
+    Arguments:
+      - request_globals (optional): The request's g, see enforce. Defaults to g.
+
+    Returns:
+      - List of the problems found, empty if the request is within budget
+    """
+    request_globals = g if request_globals is None else request_globals
+    log = request_globals.get("query_log", [])
+    max_queries, max_repeats = request_globals.get("query_budget_limits", (None, None))
+    max_queries = self.max_queries if max_queries is None else max_queries
+    max_repeats = self.max_repeats if max_repeats is None else max_repeats
+
+    problems = []
+    if len(log) > max_queries:
+      problems.append(f"ran {len(log)} queries, over the budget of {max_queries}")
+
+    for shape, count in Counter(log).most_common():
+      if count <= max_repeats:
+        break
+      problems.append(f"ran the same query {count} times (possible N+1): {shape}")
+
+    return problems
+
+  def enforce(self, route: str, response, request_globals=None) -> None:
+    """
+    Checks the current request against the budget and reports any problems according to the mode
+    A streamed response runs queries while its body is sent, so it is checked once it closes; by then its headers are sent,
+    so it gets no X-Query-Count header and in raise mode the error is raised to whatever closes the response, e.g. the test client
+
+    Arguments:
+      - route (str): The matched URL rule, used in the report
+      - response (Response): The response, which gets an X-Query-Count header unless it is streamed
+      - request_globals (optional): The request's g, for checking a streamed response once it closes and g is no longer current. Defaults to g.
+
+    Raises:
+      QueryBudgetError: If the mode is raise and the request is over budget.
+    """
+    if not self.enabled:
+      return
+
+    request_globals = g if request_globals is None else request_globals
+
+    if not response.is_streamed:
+      response.headers["X-Query-Count"] = str(len(request_globals.get("query_log", [])))
+
+    problems = self.check(request_globals)
+    if not problems:
+      return
+
+    report = f"Query budget exceeded by {route}: " + "; ".join(problems)
+    if self.mode == "raise":
+      # Clear the log so the error response is not checked again
+      request_globals.pop("query_log", None)
+      raise QueryBudgetError(report)
+    print(report)
+
+def query_budget(max_queries: int = None, max_repeats: int = None):
+  """
+  Decorator that gives a route its own query budget in place of the default
+
+  Arguments:
+    - max_queries (int, optional): The most statements the route may run
+    - max_repeats (int, optional): The most times the route may run one statement shape
+  """
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      g.query_budget_limits = (max_queries, max_repeats)
+      return view(*args, **kwargs)
+    return wrapper
+  return decorator
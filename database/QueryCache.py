@@ -0,0 +1,102 @@
+from database.DatabaseManager import DatabaseManager
+from database.DataVersionManager import DataVersionManager
+from database.LRUCache import LRUCache
+from typing import Any, Callable, Hashable, Tuple
+
+class QueryCache:
+  """
+  Read-through cache for manager read queries, invalidated by per-table data versions
+  Entries are keyed by the manager method, its arguments and the current versions of the tables the query reads.
+  A write bumps the versions of the tables it changed, so every worker stops using the old entries as soon as the write commits.
+  Entries also expire after the time to live and the least recently used entries are evicted once the cache is full.
+  """
+
+  def __init__(self, database_manager: DatabaseManager, data_versions: DataVersionManager, ttl: float = 300, max_size: int = 128):
+    """
+    Initializes the QueryCache instance
+
+    Arguments:
+      - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+      - data_versions (DataVersionManager): Reads and bumps the per-table data versions
+      - ttl (float, optional): The number of seconds an entry stays valid. Defaults to 300.
+      - max_size (int, optional): The maximum number of cached results. Defaults to 128.
+    """
+    self._database_manager = database_manager
+    self._data_versions = data_versions
+    self._entries = LRUCache(max_size=max_size, ttl=ttl)
+
+  def fetch(self, key: Tuple[Hashable, ...], tables: Tuple[str, ...], loader: Callable[[], Any]) -> Any:
+    """
+    Returns the cached result for the key, running the loader and caching its result on a miss
+    Results loaded inside a transaction are not cached, since they may include writes that are later rolled back,
+    and reads of tables the transaction has written skip the cache, since their data versions are only bumped when it commits
+    Cached results are shared between requests and must not be modified by callers
+
+    Arguments:
+      - key (tuple): The manager method name and its arguments
+      - tables (tuple): The names of the tables the query reads
+      - loader (callable): Runs the query and returns its result
+
+    Returns:
+      - The query result
+
+    Raises:
+      QueryError: If an error occurs while reading the data versions or running the loader.
+    """
+    if self._database_manager.in_transaction() and self._data_versions.pending().intersection(tables):
+      return loader()
+
+    versioned_key = key + self._data_versions.get(tables)
+    found, result = self._entries.get(versioned_key)
+
+    if found:
+      return result
+
+    result = loader()
+
+    if not self._database_manager.in_transaction():
+      self._entries.set(versioned_key, result)
+
+    return result
+
+  def versions(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+    """
+    Returns the current data versions of the given tables, see DataVersionManager.get
+
+    Arguments:
+      - tables (tuple): The table names
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    return self._data_versions.get(tables)
+
+  def lock(self, table: str) -> int:
+    """
+    Locks a table's data version until the current transaction ends and returns its committed version, see DataVersionManager.lock
+
+    Arguments:
+      - table (str): The table name
+
+    Raises:
+      QueryError: If called outside of a transaction or an error occurs during the query execution.
+    """
+    return self._data_versions.lock(table)
+
+  def invalidate(self, *tables: str) -> None:
+    """
+    Invalidates the cached results of queries that read the given tables by bumping their data versions
+
+    Arguments:
+      - tables (str): The names of the tables that were written
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    self._data_versions.bump(*tables)
+
+  def clear(self) -> None:
+    """
+    Drops every cached result in this process, e.g. to time queries without the cache
+    """
+    self._entries.clear()
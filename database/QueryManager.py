@@ -1,8 +1,18 @@
 from database.DatabaseManager import DatabaseManager
+from database.DataVersionManager import DataVersionManager
+from database.QueryCache import QueryCache
 from database.CourseManager import CourseManager
 from database.TermManager import TermManager
 from database.StudentManager import StudentManager
 from database.StudentTermPlanManager import StudentTermPlanManager
+from database.PlanValidator import PlanValidator
+from database.MigrationManager import MigrationManager
+from database.IdempotencyKeyManager import IdempotencyKeyManager
+from database.ExportManager import ExportManager
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, current_app, g, has_app_context
+from typing import Any, Callable, Dict, List, Tuple
+import os
 
 class QueryManager:
   """
@@ -12,12 +22,121 @@ class QueryManager:
   def __init__(self, database_manager: DatabaseManager):
     """
     Initializes the QueryManager instance and stores the provided CourseManager, TermManager, StudentManager, and StudentTermPlanManager instances.
+    The managers share one query cache, configured with the following optional environment variables:
+      - query_cache_ttl: Seconds a cached result stays valid, defaults to 300
+      - query_cache_max_size: Maximum number of cached results, defaults to 128
+    Responses stored under idempotency keys are kept for idempotency_key_ttl seconds, defaults to 86400
+    gather runs up to query_gather_workers reads at once besides the caller's own, defaults to 3; 0 runs them one after another
 
     Arguments:
       - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
     """
     self._database_manager = database_manager
-    self._courses = CourseManager(self._database_manager)
-    self._terms = TermManager(self._database_manager)
-    self._students = StudentManager(self._database_manager)
-    self._studentTermPlans = StudentTermPlanManager(self._database_manager)
\ No newline at end of file
+    self._dataVersions = DataVersionManager(self._database_manager)
+    self._cache = QueryCache(
+      self._database_manager,
+      self._dataVersions,
+      ttl=float(os.environ.get("query_cache_ttl", 300)),
+      max_size=int(os.environ.get("query_cache_max_size", 128))
+    )
+    self._courses = CourseManager(self._database_manager, self._cache)
+    self._terms = TermManager(self._database_manager, self._cache)
+    self._students = StudentManager(self._database_manager, self._cache)
+    self._studentTermPlans = StudentTermPlanManager(self._database_manager, self._cache)
+    self._planValidator = PlanValidator(self._database_manager, self._courses)
+    self._migrations = MigrationManager(self._database_manager)
+    self._exports = ExportManager(self._database_manager)
+    self._idempotencyKeys = IdempotencyKeyManager(self._database_manager, ttl=int(os.environ.get("idempotency_key_ttl", 86400)))
+    self._gather_workers = int(os.environ.get("query_gather_workers", 3))
+    self._gather_executor = ThreadPoolExecutor(max_workers=self._gather_workers, thread_name_prefix="query-gather") if self._gather_workers > 0 else None
+
+  def gather(self, *calls: Callable[[], Any]) -> List[Any]:
+    """
+    Runs independent manager reads concurrently and returns their results in call order, so a page costs about as much as its slowest query
+    The first call runs in the calling thread, the others on the gather thread pool, each on its own pooled connection.
+    A pooled call's connection is checked out without waiting before the call is handed to the thread pool; when every connection
+    is in use the call runs in the calling thread on its connection instead, so concurrent requests never wait on each other's connections.
+    Inside a request, each pooled call runs in a fresh app context that starts from the request's data versions,
+    and its query count, database time and query log are added to the request's, so metrics and the query budget still see every query.
+    Inside a transaction the calls run one after another on the transaction's connection, so they see its uncommitted writes.
+    Only pass reads: a write in a pooled call would commit on its own connection, outside any transaction.
+
+    Usage:
+      students, terms = qm.gather(qm._students.all, qm._terms.all)
+      plans, courses = qm.gather(lambda: qm._studentTermPlans.all(limit=100), qm._courses.all)
+
+    Arguments:
+      - calls (callable): Functions taking no arguments
+
+    Returns:
+      - List: The result of every call, in the order the calls were given
+
+    Raises:
+      QueryError: If a call fails; the first failure in call order is raised once every call has finished.
+    """
+    if len(calls) < 2 or self._gather_executor is None or self._database_manager.in_transaction():
+      return [call() for call in calls]
+
+    app = current_app._get_current_object() if has_app_context() else None
+
+    # Read the data versions once for every call instead of once per connection
+    versions = self._dataVersions.all() if app else None
+
+    futures, inline = {}, [0]
+    for index in range(1, len(calls)):
+      connection = self._database_manager.try_acquire_connection()
+      if connection is None:
+        inline.append(index)
+      else:
+        futures[index] = self._gather_executor.submit(self._run_gathered, app, versions, calls[index], connection)
+
+    outcomes = {}
+    try:
+      for index in inline:
+        try:
+          outcomes[index] = (calls[index](), None)
+        except Exception as error:
+          outcomes[index] = error
+    finally:
+      for index, future in futures.items():
+        outcomes[index] = future.exception() or future.result()
+
+    results = []
+    for index in range(len(calls)):
+      outcome = outcomes[index]
+      if isinstance(outcome, BaseException):
+        raise outcome
+
+      result, stats = outcome
+      if stats:
+        # Count the call's queries towards this request's metrics and query budget
+        g.db_query_count = g.get("db_query_count", 0) + stats["db_query_count"]
+        g.db_seconds = g.get("db_seconds", 0.0) + stats["db_seconds"]
+        if stats["query_log"]:
+          g.query_log = g.get("query_log", []) + stats["query_log"]
+      results.append(result)
+
+    return results
+
+  def _run_gathered(self, app: Flask, versions: Dict[str, int], call: Callable[[], Any], connection) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Runs one gathered call on a gather pool thread, on the connection checked out for it, and returns its result and,
+    inside a request, the stats to merge into it
+    The connection goes back to the pool when the call finishes, through the app context teardown or explicitly outside Flask
+    """
+    if app is None:
+      try:
+        self._database_manager.adopt_connection(connection)
+        return call(), None
+      finally:
+        self._database_manager.release_connection()
+
+    with app.app_context():
+      self._database_manager.adopt_connection(connection)
+      g.data_versions = versions
+      result = call()
+      return result, {
+        "db_query_count": g.get("db_query_count", 0),
+        "db_seconds": g.get("db_seconds", 0.0),
+        "query_log": g.get("query_log", [])
+      }
@@ -0,0 +1,208 @@
+import re
+import threading
+from bisect import bisect_left
+from flask import g, has_app_context
+from typing import Any, Dict, List
+
+# Histogram bucket upper bounds: seconds for durations, counts for queries per request
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+# Normalized names are memoized per query string up to this many distinct strings
+MAX_QUERY_NAMES = 2048
+
+# Tables a statement reads or writes, in the order they appear
+TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+`?(\w+)", re.IGNORECASE)
+
+class Histogram:
+  """
+  Fixed-bucket histogram in the Prometheus style
+  Observing a value only bumps counters, the cumulative bucket counts are computed when the histogram is rendered
+  """
+
+  def __init__(self, buckets: tuple):
+    """
+    Initializes the Histogram instance
+
+    Arguments:
+      - buckets (tuple): The ascending bucket upper bounds, without +Inf
+    """
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)
+    self.sum = 0.0
+    self.count = 0
+
+  def observe(self, value: float) -> None:
+    """
+    Records a value in the first bucket whose upper bound is at least the value
+    """
+    self.counts[bisect_left(self.buckets, value)] += 1
+    self.sum += value
+    self.count += 1
+
+  def render(self, name: str, labels: str) -> List[str]:
+    """
+    Returns the _bucket, _sum and _count sample lines of the histogram
+
+    Arguments:
+      - name (str): The metric name
+      - labels (str): The rendered labels, e.g. 'query="select:Courses"'
+    """
+    lines = []
+    cumulative = 0
+    for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+      cumulative += count
+      lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+    lines.append(f"{name}_count{{{labels}}} {self.count}")
+    return lines
+
+class QueryMetrics:
+  """
+  Collects database and request metrics in memory and renders them in the Prometheus text format
+  Handles the following:
+    - Per-statement latency histograms, rows returned and errors, keyed by a normalized query name
+    - Reconnects after lost or dead connections
+    - Per-route request latency, queries per request and database time per request
+  Each process keeps its own metrics, so with several gunicorn workers every worker is scraped separately.
+  """
+
+  def __init__(self):
+    """
+    Initializes the QueryMetrics instance with empty metrics
+    """
+    self._lock = threading.Lock()
+    self._query_names: Dict[str, str] = {}
+    self._query_durations: Dict[str, Histogram] = {}
+    self._query_rows: Dict[str, int] = {}
+    self._query_errors: Dict[str, int] = {}
+    self._request_durations: Dict[str, Histogram] = {}
+    self._request_queries: Dict[str, Histogram] = {}
+    self._request_db_durations: Dict[str, Histogram] = {}
+    self._reconnects = 0
+
+  def query_name(self, query: str) -> str:
+    """
+    Normalizes a query to its statement type and the tables it touches, e.g. "select:Courses,Courses_has_Prerequisites"
+    Parameter values never appear in the query text, so the name stays the same across calls; it is memoized per query string
+
+    Arguments:
+      - query (str): The SQL query
+    """
+    name = self._query_names.get(query)
+
+    if name is None:
+      words = query.split(None, 1)
+      tables = list(dict.fromkeys(TABLE_PATTERN.findall(query)))
+      name = f"{words[0].lower() if words else 'unknown'}:{','.join(tables)}"
+
+      if len(self._query_names) < MAX_QUERY_NAMES:
+        self._query_names[query] = name
+
+    return name
+
+  def observe_query(self, query: str, method: str, seconds: float, status: int, result: Any) -> None:
+    """
+    Records one execute_query call, and adds it to the current request's query count and database time
+
+    Arguments:
+      - query (str): The SQL query
+      - method (str): The query method passed to execute_query, or "stream" for DatabaseManager.stream
+      - seconds (float): How long the query took, including any reconnect and replay
+      - status (int): The status code returned by execute_query
+      - result (any): The result returned by execute_query, or the number of rows a stream read
+    """
+    name = self.query_name(query)
+
+    # Rows returned by reads, rows affected by rowcount writes, rows read by streams
+    if status != 200 or method == "commit":
+      rows = 0
+    elif method == "fetchone":
+      rows = 0 if result is None else 1
+    elif method in ("rowcount", "stream"):
+      rows = result
+    else:
+      rows = len(result)
+
+    with self._lock:
+      histogram = self._query_durations.get(name)
+      if histogram is None:
+        histogram = self._query_durations[name] = Histogram(DURATION_BUCKETS)
+      histogram.observe(seconds)
+
+      if status == 200:
+        self._query_rows[name] = self._query_rows.get(name, 0) + rows
+      else:
+        self._query_errors[name] = self._query_errors.get(name, 0) + 1
+
+    if has_app_context():
+      g.db_query_count = g.get("db_query_count", 0) + 1
+      g.db_seconds = g.get("db_seconds", 0.0) + seconds
+
+  def observe_reconnect(self) -> None:
+    """
+    Records that a lost or dead connection was replaced
+    """
+    with self._lock:
+      self._reconnects += 1
+
+  def observe_request(self, route: str, seconds: float, request_globals=None) -> None:
+    """
+    Records a finished request with the query count and database time collected by observe_query
+
+    Arguments:
+      - route (str): The matched URL rule, e.g. "/terms/<int:term_id>"
+      - seconds (float): How long the request took
+      - request_globals (optional): The request's g, for recording a streamed response once it closes and g is no longer current. Defaults to g.
+    """
+    request_globals = g if request_globals is None else request_globals
+    queries = request_globals.get("db_query_count", 0)
+    db_seconds = request_globals.get("db_seconds", 0.0)
+
+    with self._lock:
+      if route not in self._request_durations:
+        self._request_durations[route] = Histogram(DURATION_BUCKETS)
+        self._request_queries[route] = Histogram(QUERY_COUNT_BUCKETS)
+        self._request_db_durations[route] = Histogram(DURATION_BUCKETS)
+
+      self._request_durations[route].observe(seconds)
+      self._request_queries[route].observe(queries)
+      self._request_db_durations[route].observe(db_seconds)
+
+  def render(self) -> str:
+    """
+    Renders every metric in the Prometheus text exposition format
+    """
+    lines = []
+
+    with self._lock:
+      for name, kind, description, label, metrics in (
+        ("db_query_duration_seconds", "histogram", "Time spent executing each normalized query", "query", self._query_durations),
+        ("db_query_rows_total", "counter", "Rows returned or affected by each normalized query", "query", self._query_rows),
+        ("db_query_errors_total", "counter", "Failed executions of each normalized query", "query", self._query_errors),
+        ("http_request_duration_seconds", "histogram", "Request latency per route", "route", self._request_durations),
+        ("http_request_db_queries", "histogram", "Database queries per request per route", "route", self._request_queries),
+        ("http_request_db_duration_seconds", "histogram", "Database time per request per route", "route", self._request_db_durations)
+      ):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        for key, metric in sorted(metrics.items()):
+          labels = f'{label}="{self.escape(key)}"'
+          if kind == "histogram":
+            lines.extend(metric.render(name, labels))
+          else:
+            lines.append(f"{name}{{{labels}}} {metric}")
+
+      lines.append("# HELP db_reconnects_total Lost or dead connections replaced with a new connection")
+      lines.append("# TYPE db_reconnects_total counter")
+      lines.append(f"db_reconnects_total {self._reconnects}")
+
+    return "\n".join(lines) + "\n"
+
+  @staticmethod
+  def escape(value: str) -> str:
+    """
+    Escapes a label value for the Prometheus text format
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,54 @@
+from flask.json.provider import DefaultJSONProvider
+from operator import attrgetter
+from typing import Any, Callable, Dict, Tuple
+
+# Field names and a getter returning all their values, per row type, filled in on first use
+FIELD_GETTERS: Dict[type, Tuple[Tuple[str, ...], Callable]] = {}
+
+class Row:
+  """
+  Base class of the row types returned by the manager read methods
+  Row types are slotted dataclasses, e.g. @dataclass(slots=True) class Course(Row), so a row carries no per-instance dict
+  and is built straight from the query's result tuple when its fields follow the query's column order.
+  Handles the following:
+    - row["field"] lookups, so templates and callers written against the old dictionaries keep working
+    - Conversion to a dictionary for JSON responses, see RowJSONProvider
+  Rows served from the query cache are shared between requests and must not be modified by callers.
+  """
+
+  __slots__ = ()
+
+  def __getitem__(self, field: str) -> Any:
+    """
+    Returns a field's value, raising KeyError like a dictionary if the row has no such field
+    """
+    try:
+      return getattr(self, field)
+    except AttributeError:
+      raise KeyError(field) from None
+
+  def to_dict(self) -> Dict[str, Any]:
+    """
+    Returns the row's fields as a dictionary; nested rows are left as rows
+    """
+    row_type = type(self)
+    fields = FIELD_GETTERS.get(row_type)
+
+    if fields is None:
+      names = tuple(self.__dataclass_fields__)
+      getter = attrgetter(*names) if len(names) > 1 else (lambda row: (getattr(row, names[0]),))
+      fields = FIELD_GETTERS[row_type] = (names, getter)
+
+    names, getter = fields
+    return dict(zip(names, getter(self)))
+
+class RowJSONProvider(DefaultJSONProvider):
+  """
+  Flask JSON provider that serializes rows with Row.to_dict instead of dataclasses.asdict, which deep copies every nested value
+  """
+
+  @staticmethod
+  def default(o: Any) -> Any:
+    if isinstance(o, Row):
+      return o.to_dict()
+    return DefaultJSONProvider.default(o)
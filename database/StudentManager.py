@@ -1,13 +1,19 @@
 from database.DatabaseManager import DatabaseManager
+from database.QueryCache import QueryCache
+from database.Row import Row
 from blueprints.errorHandlers import QueryError
-from typing import List, TypedDict, Any, Union
+from dataclasses import dataclass
+from typing import List, Any, Union, Tuple
 
-class Student(TypedDict):
+# Row fields follow the column order of the queries that build them
+@dataclass(slots=True)
+class Student(Row):
   id: int
   firstName: str
   lastName: str
 
-class StudentFormatted(TypedDict):
+@dataclass(slots=True)
+class StudentFormatted(Row):
   student: str
   studentID: str
 
@@ -16,17 +22,19 @@ class StudentManager:
   Manages all database queries related to Students and interacts with the DatabaseManager to execute the queries.
   """
 
-  def __init__(self, database_manager: DatabaseManager):
+  def __init__(self, database_manager: DatabaseManager, query_cache: QueryCache):
     """
-    Initializes the TermManager instance and stores the provided DatabaseManager instance.
+    Initializes the TermManager instance and stores the provided DatabaseManager and QueryCache instances.
 
     Arguments:
       - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+      - query_cache (QueryCache): Caches read results and invalidates them when this manager writes.
     """
     self._database_manager = database_manager
+    self._query_cache = query_cache
     self._HTTP_OK = 200
 
-  def perform_query(self, query: str, parameters: tuple = None, method: str = None) -> Any:
+  def perform_query(self, query: str, parameters: tuple = None, method: str = None, many: bool = False) -> Any:
     """
     Helper function that calls the execute_query method of the DatabaseManager class
 
@@ -34,6 +42,7 @@ class StudentManager:
       - query (str): The SQL query to execute
       - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
       - method (str, optional): The query method, e.g., "fetchall", "fetchone", or "commit".
+      - many (bool, optional): Whether parameters is a list of parameter tuples to insert in one multi-row statement. Defaults to False.
 
     Returns:
       - Result if method is "fetchall" or "fetchone", else None
@@ -42,25 +51,30 @@ class StudentManager:
       QueryError: If an error occurs during the query execution.
     """  
     # Execute query and catch status code and query result/error response
-    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method)  
+    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method, many=many)  
 
     if status != self._HTTP_OK:  
       raise QueryError(f"An error occurred while executing the query: {result}")  
     return result  
 
-  def all(self, is_formatted: bool = False) -> Union[List[Student], List[StudentFormatted]]:
+  def all(self, is_formatted: bool = False, limit: int = None, after: Tuple[str, str] = None) -> Union[List[Student], List[StudentFormatted]]:
     """
-    Retrieves all students
+    Retrieves all students, or one page of students ordered by last name and student ID
+    Pages use keyset pagination: each page starts after the (lastName, studentID) of the previous page's last student,
+    so every page is an index range scan no matter how deep it is
+    Results are served from the query cache until the students are written
 
     Arguments:
       - is_formatted (bool, optional): Whether the Student attributes should be combined and formatted for form dropdown, defaults to False.
+      - limit (int, optional): The maximum number of students to return. Defaults to every student.
+      - after (tuple, optional): The (lastName, studentID) of the last student on the previous page. Defaults to the first page.
 
     Returns:
-      - If is_formatted is True, list of dictionaries representing the students. Each dictionary contains:
+      - If is_formatted is True, list of StudentFormatted rows representing the students. Each row contains:
         - "student" (str): The student lastname, firstname, and id
         - "studentID" (str): The student's id
 
-      - If is_formatted is False, list of dictionaries representing the students. Each dictionary contains:
+      - If is_formatted is False, list of Student rows representing the students. Each row contains:
         - "id" (int): The student ID
         - "firstName" (str): The student's first name
         - "lastName" (str): The student's last name
@@ -68,7 +82,30 @@ class StudentManager:
     Raises:
       QueryError: If an error occurs during the query execution.
     """
+    return self._query_cache.fetch(
+      key=("StudentManager.all", is_formatted, limit, after),
+      tables=("Students",),
+      loader=lambda: self._load_all(is_formatted, limit, after)
+    )
+
+  def _load_all(self, is_formatted: bool = False, limit: int = None, after: Tuple[str, str] = None):
+    """
+    Runs the all query without the cache, see all
+    """
     self._database_manager.check_connection()
+
+    # Keyset pagination on the (lastName, studentID) index
+    page_filter = ""
+    page_limit = ""
+    parameters = ()
+
+    if after:
+      page_filter = "WHERE lastName > %s OR (lastName = %s AND studentID > %s)"
+      parameters += (after[0], after[0], after[1])
+
+    if limit:
+      page_limit = "LIMIT %s"
+      parameters += (limit,)
     
     if is_formatted:
       query = """
@@ -76,32 +113,23 @@ class StudentManager:
           CONCAT(lastName, ', ', firstName, ' - ', studentID) AS student,
           studentID
         FROM Students
-        ORDER BY lastName ASC
-      """
-
-      return [
-        {
-          "student": row[0],
-          "studentID": row[1]
-        }
-        for row in self.perform_query(query=query, method="fetchall")
-      ]
+        {}
+        ORDER BY lastName ASC, studentID ASC
+        {}
+      """.format(page_filter, page_limit)
+
+      return [StudentFormatted(*row) for row in self.perform_query(query=query, parameters=parameters, method="fetchall")]
     
     else:
       query = """
         SELECT *
         FROM Students 
-        ORDER BY lastName ASC
-      """
-
-      return [
-        {
-          "id": row[0],
-          "firstName": row[1],
-          "lastName": row[2],
-        }
-        for row in self.perform_query(query=query, method="fetchall")
-      ]
+        {}
+        ORDER BY lastName ASC, studentID ASC
+        {}
+      """.format(page_filter, page_limit)
+
+      return [Student(*row) for row in self.perform_query(query=query, parameters=parameters, method="fetchall")]
         
   def get(self, student_id: int) -> Student:
     """
@@ -111,7 +139,7 @@ class StudentManager:
       - student_id (int): The ID of the student being retrieved
 
     Returns:
-      - Dictionary: A dictionary representing the student. It contains:
+      - Student: A row representing the student, or None if not found. It contains:
         - "id" (int): The student ID
         - "firstName" (str): The student first name
         - "lastName" (str): The student last name
@@ -132,15 +160,12 @@ class StudentManager:
     if result is None:
       return None
     
-    return {
-      "id": result[0],
-      "firstName": result[1],
-      "lastName": result[2],
-    }
+    return Student(*result)
 
-  def create(self, student_id: str, first_name: str, last_name: str) -> None:
+  def create(self, student_id: str, first_name: str, last_name: str) -> bool:
     """
     Creates a new student
+    Runs as one upsert, so an existing row is reported from the affected row count instead of a separate lookup
 
     Arguments:
       - student_id (str): The ID of the student
@@ -148,7 +173,7 @@ class StudentManager:
       - last_name (int): The last name of the student
 
     Returns:
-      - None
+      - bool: True if it was created, False if a student with the ID already exists
 
     Raises:
       QueryError: If an error occurs during the query execution.
@@ -159,9 +184,15 @@ class StudentManager:
     query = """
       INSERT INTO Students (studentID, firstName, lastName)
       VALUES (%s, %s, %s)
+      ON DUPLICATE KEY UPDATE studentID = studentID
     """
 
-    self.perform_query(query=query, parameters=(student_id, first_name, last_name), method="commit")
+    with self._database_manager.transaction():
+      created = self.perform_query(query=query, parameters=(student_id, first_name, last_name), method="rowcount") > 0
+      if created:
+        self._query_cache.invalidate("Students")
+
+    return created
 
   def update(self, first_name: str, last_name: str, student_id: str) -> None:
     """
@@ -186,7 +217,9 @@ class StudentManager:
       WHERE studentID = %s
     """
 
-    self.perform_query(query=query, parameters=(first_name, last_name, student_id), method="commit")
+    with self._database_manager.transaction():
+      self.perform_query(query=query, parameters=(first_name, last_name, student_id), method="commit")
+      self._query_cache.invalidate("Students")
 
   def delete(self, student_id: str) -> None:
     """
@@ -208,4 +241,6 @@ class StudentManager:
       WHERE studentID = %s;
     """
 
-    self.perform_query(query=query, parameters=(student_id,), method="commit")
\ No newline at end of file
+    with self._database_manager.transaction():
+      self.perform_query(query=query, parameters=(student_id,), method="commit")
+      self._query_cache.invalidate("Students", "StudentTermPlans", "StudentTermPlans_has_Courses")
\ No newline at end of file
@@ -1,8 +1,16 @@
 from database.DatabaseManager import DatabaseManager
+from database.QueryCache import QueryCache
+from database.Row import Row
 from blueprints.errorHandlers import QueryError
-from typing import List, TypedDict, Any 
-
-class StudentTermPlan(TypedDict):
+from database.CourseManager import CourseDetail
+from itertools import groupby
+from operator import itemgetter
+from dataclasses import dataclass
+from typing import List, Any, Tuple, Iterator
+
+# Row fields follow the column order of the queries that build them
+@dataclass(slots=True)
+class StudentTermPlan(Row):
   studentTermPlanID: int
   studentID: int
   studentName: str
@@ -10,22 +18,34 @@ class StudentTermPlan(TypedDict):
   courses: str
   advisorApproved: bool
 
+@dataclass(slots=True)
+class StudentTermPlanWithCourseDetails(Row):
+  studentTermPlanID: int
+  studentID: str
+  studentName: str
+  termID: int
+  termName: str
+  advisorApproved: bool
+  courses: List[CourseDetail]
+
 class StudentTermPlanManager:
   """
   Manages all database queries related to Students and interacts with the DatabaseManager to execute the queries.
   """
 
-  def __init__(self, database_manager: DatabaseManager):
+  def __init__(self, database_manager: DatabaseManager, query_cache: QueryCache):
     """
-    Initializes the StudentTermPlanManager instance and stores the provided DatabaseManager instance.
+    Initializes the StudentTermPlanManager instance and stores the provided DatabaseManager and QueryCache instances.
 
     Arguments:
       - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+      - query_cache (QueryCache): Caches read results and invalidates them when this manager writes.
     """
     self._database_manager = database_manager
+    self._query_cache = query_cache
     self._HTTP_OK = 200
 
-  def perform_query(self, query: str, parameters: tuple = None, method: str = None) -> Any:
+  def perform_query(self, query: str, parameters: tuple = None, method: str = None, many: bool = False) -> Any:
     """
     Helper function that calls the execute_query method of the DatabaseManager class
 
@@ -33,6 +53,7 @@ class StudentTermPlanManager:
       - query (str): The SQL query to execute
       - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
       - method (str, optional): The query method, e.g., "fetchall", "fetchone", or "commit".
+      - many (bool, optional): Whether parameters is a list of parameter tuples to insert in one multi-row statement. Defaults to False.
 
     Returns:
       - Result if method is "fetchall" or "fetchone", else None
@@ -41,61 +62,164 @@ class StudentTermPlanManager:
       QueryError: If an error occurs during the query execution.
     """  
     # Execute query and catch status code and query result/error response
-    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method)  
+    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method, many=many)  
 
     if status != self._HTTP_OK:  
       raise QueryError(f"An error occurred while executing the query: {result}")  
     return result  
 
-  def all(self) -> List[StudentTermPlan]:
+  def all(self, limit: int = None, after: int = None, student_id: str = None, term_id: int = None, advisor_approved: bool = None) -> List[StudentTermPlan]:
     """
-    Retrieves all student term plans
+    Retrieves all student term plans, or one page of plans ordered by student term plan ID
+    Pages use keyset pagination: each page starts after the ID of the previous page's last plan,
+    so every page is a primary key range scan no matter how deep it is
+    Plans without any courses are included with courses set to None
 
     Arguments:
-      - None
+      - limit (int, optional): The maximum number of plans to return. Defaults to every plan.
+      - after (int, optional): The ID of the last plan on the previous page. Defaults to the first page.
+      - student_id (str, optional): Only return this student's plans.
+      - term_id (int, optional): Only return plans for this term.
+      - advisor_approved (bool, optional): Only return approved (True) or unapproved (False) plans.
 
     Returns:
-      - List: A list of dictionaries representing the student term plans. Each dictionary contains:
+      - List: A list of StudentTermPlan rows representing the student term plans. Each row contains:
         - "studentTermPlanID" (int): The student term plan ID
         - "studentID" (int): The student ID
         - "studentName" (str): The student first and last name
         - "termName" (str): The term name
-        - "courses" (str): A comma-separated list of courses
+        - "courses" (str): A comma-separated list of courses, or None if the plan has no courses
         - "advisorApproved" (bool): 1 if advisor has approved, otherwise 0
     
     Raises:
       QueryError: If an error occurs during the query execution.
     """
     self._database_manager.check_connection()
-  
+
+    query, parameters = self._all_query(limit, after, student_id, term_id, advisor_approved)
+
+    return [StudentTermPlan(*row) for row in self.perform_query(query=query, parameters=parameters, method="fetchall")]
+
+  def stream(self, limit: int = None, after: int = None, student_id: str = None, term_id: int = None, advisor_approved: bool = None) -> Iterator[StudentTermPlan]:
+    """
+    Streams the same student term plans as all, reading them through a server-side cursor instead of loading them all at once
+    The rows are read on the request's own connection, see DatabaseManager.stream, so no other query may run on the request
+    until the stream has been read to the end or closed; read everything else the caller needs first
+
+    Arguments:
+      - The same filters as all
+
+    Returns:
+      - Generator of StudentTermPlan rows, see all
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    query, parameters = self._all_query(limit, after, student_id, term_id, advisor_approved)
+
+    for chunk in self._database_manager.stream(query=query, parameters=parameters):
+      yield from (StudentTermPlan(*row) for row in chunk)
+
+  def _all_query(self, limit: int = None, after: int = None, student_id: str = None, term_id: int = None, advisor_approved: bool = None) -> Tuple[str, tuple]:
+    """
+    Builds the all query and its parameters, see all
+    Courses are joined and aggregated once per plan rather than looked up by a dependent subquery per plan course
+    """
+    conditions = []
+    parameters = ()
+
+    if after:
+      conditions.append("stp.studentTermPlanID > %s")
+      parameters += (after,)
+
+    if student_id:
+      conditions.append("stp.studentID = %s")
+      parameters += (student_id,)
+
+    if term_id:
+      conditions.append("stp.termID = %s")
+      parameters += (term_id,)
+
+    if advisor_approved is not None:
+      conditions.append("stp.advisorApproved = %s")
+      parameters += (int(advisor_approved),)
+
+    if limit:
+      parameters += (limit,)
+
     query = """
       SELECT
         stp.studentTermPlanID,
         stp.studentID, 
         CONCAT(s.firstName, ' ', s.lastName) as studentName,
         t.name as termName, 
-        GROUP_CONCAT((SELECT CONCAT(code, ' ', name) FROM Courses WHERE courseID = stpc.courseID) ORDER BY stpc.courseID ASC SEPARATOR ', ') AS courses,
+        GROUP_CONCAT(CONCAT(c.code, ' ', c.name) ORDER BY c.courseID ASC SEPARATOR ', ') AS courses,
         CASE WHEN stp.advisorApproved = 1 THEN 'Yes' ELSE 'No' End AS advisorApproved
       FROM StudentTermPlans stp
       INNER JOIN Terms t ON stp.termID = t.termID
       INNER JOIN Students s ON s.studentID = stp.studentID
-      INNER JOIN StudentTermPlans_has_Courses stpc ON stp.studentTermPlanID = stpc.studentTermPlanID
+      LEFT JOIN StudentTermPlans_has_Courses stpc ON stp.studentTermPlanID = stpc.studentTermPlanID
+      LEFT JOIN Courses c ON c.courseID = stpc.courseID
+      {}
       GROUP BY stp.studentTermPlanID
       ORDER BY stp.studentTermPlanID ASC
-    """
+      {}
+    """.format("WHERE " + " AND ".join(conditions) if conditions else "", "LIMIT %s" if limit else "")
 
-    return [
-      {
-        "studentTermPlanID": row[0],
-        "studentID": row[1],
-        "studentName": row[2],
-        "termName": row[3],
-        "courses": row[4],
-        "advisorApproved": row[5]
-      }
-      for row in self.perform_query(query=query, method="fetchall")
-    ]
+    return query, parameters
     
+  def all_nested(self, student_term_plan_id: int = None) -> List[StudentTermPlanWithCourseDetails]:
+    """
+    Retrieves all student term plans, or one plan, with their courses as nested course objects
+    Runs one flat join and groups the rows in Python, so course names containing commas are never split apart
+
+    Arguments:
+      - student_term_plan_id (int, optional): Only retrieve this plan. Defaults to every plan.
+
+    Returns:
+      - List: A list of StudentTermPlanWithCourseDetails rows representing the student term plans, ordered by ID. Each row contains:
+        - "studentTermPlanID" (int): The student term plan ID
+        - "studentID" (str): The student ID
+        - "studentName" (str): The student first and last name
+        - "termID" (int): The term ID
+        - "termName" (str): The term name
+        - "advisorApproved" (bool): Whether the advisor has approved the plan
+        - "courses" (list): The planned courses ordered by ID, each with "id", "code", "name" and "credit"
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    self._database_manager.check_connection()
+
+    query = """
+      SELECT
+        stp.studentTermPlanID,
+        stp.studentID,
+        CONCAT(s.firstName, ' ', s.lastName),
+        t.termID,
+        t.name,
+        stp.advisorApproved,
+        c.courseID, c.code, c.name, c.credit
+      FROM StudentTermPlans stp
+      INNER JOIN Terms t ON stp.termID = t.termID
+      INNER JOIN Students s ON s.studentID = stp.studentID
+      LEFT JOIN StudentTermPlans_has_Courses stpc ON stp.studentTermPlanID = stpc.studentTermPlanID
+      LEFT JOIN Courses c ON stpc.courseID = c.courseID
+      {}
+      ORDER BY stp.studentTermPlanID ASC, c.courseID ASC
+    """.format("WHERE stp.studentTermPlanID = %s" if student_term_plan_id else "")
+
+    student_term_plans = []
+    for _, rows in groupby(self.perform_query(query=query, parameters=(student_term_plan_id,) if student_term_plan_id else None, method="fetchall"), key=itemgetter(0)):
+      rows = list(rows)
+      student_term_plans.append(StudentTermPlanWithCourseDetails(
+        *rows[0][:5],
+        advisorApproved=bool(rows[0][5]),
+        courses=[CourseDetail(*row[6:10]) for row in rows if row[6] is not None]
+      ))
+
+    return student_term_plans
+
   def get(self, student_id: str, term_id: int) -> int:
     """
     Retrieves a student term plan ID of a student term from a given student ID and term ID
@@ -120,9 +244,10 @@ class StudentTermPlanManager:
 
     return self.perform_query(query=query, parameters=(student_id, term_id), method="fetchone")
 
-  def create(self, student_id: str, term_id: int, advisor_approved: bool) -> None:
+  def create(self, student_id: str, term_id: int, advisor_approved: bool) -> bool:
     """
     Creates a new student term plan
+    Runs as one upsert, so an existing row is reported from the affected row count instead of a separate lookup
 
     Arguments:
       - student_id (str): The student ID
@@ -130,7 +255,7 @@ class StudentTermPlanManager:
       - advisor_approved (bool): 1 if approved, otherwise 0
 
     Returns:
-      - None
+      - bool: True if it was created, False if a plan for the student and term already exists
 
     Raises:
       QueryError: If an error occurs during the query execution.
@@ -139,14 +264,21 @@ class StudentTermPlanManager:
     
     query = """
       INSERT INTO StudentTermPlans (studentID, termID, advisorApproved)
-      VALUES (%s, %s, %s);
+      VALUES (%s, %s, %s)
+      ON DUPLICATE KEY UPDATE studentTermPlanID = studentTermPlanID;
     """
 
-    self.perform_query(query=query, parameters=(student_id, term_id, advisor_approved), method="commit")
+    with self._database_manager.transaction():
+      created = self.perform_query(query=query, parameters=(student_id, term_id, advisor_approved), method="rowcount") > 0
+      if created:
+        self._query_cache.invalidate("StudentTermPlans")
+
+    return created
 
   def add_courses(self, courses: List[int], student_term_plan_id: int = None, student_id: str = None, term_id: int = None) -> None:
     """
-    Adds courses to a student term plan
+    Adds courses to a student term plan in a single multi-row INSERT
+    When the plan is given by student ID and term ID, its ID is resolved once for all rows
 
     Arguments:
       - courses (list): An array of course IDs
@@ -163,28 +295,40 @@ class StudentTermPlanManager:
     if not any([student_term_plan_id, student_id, term_id]):
       raise QueryError(f"An error occurred while executing the query: neither a student term plan id or studend id/term id was provided.")
 
+    if not courses:
+      return
+
+    self._database_manager.check_connection()
+
     if student_term_plan_id:
       query = """
         INSERT INTO StudentTermPlans_has_Courses (studentTermPlanID, courseID)
         VALUES (%s, %s)
       """
-      parameters = (student_term_plan_id,)
-    
+
+      with self._database_manager.transaction():
+        self.perform_query(query=query, parameters=[(student_term_plan_id, course_id) for course_id in courses], method="commit", many=True)
+        self._query_cache.invalidate("StudentTermPlans_has_Courses")
+
     else:
-      query = """
+      # Derived table of the new course IDs, one row per ID
+      course_ids = "SELECT %s AS courseID" + " UNION ALL SELECT %s" * (len(courses) - 1)
+
+      query = f"""
         INSERT INTO StudentTermPlans_has_Courses (studentTermPlanID, courseID)
-        VALUES ((SELECT studentTermPlanID FROM StudentTermPlans WHERE studentID = %s AND termID = %s), %s)
+        SELECT stp.studentTermPlanID, c.courseID
+        FROM StudentTermPlans stp
+        CROSS JOIN ({course_ids}) c
+        WHERE stp.studentID = %s AND stp.termID = %s
       """
-      parameters = (student_id, term_id)
 
-    # Iterate through course ids and insert into StudentTermPlans_has_Courses
-    for course_id in courses:
-      self._database_manager.check_connection()
-      self.perform_query(query=query, parameters=parameters+(course_id,), method="commit")
+      with self._database_manager.transaction():
+        self.perform_query(query=query, parameters=(*courses, student_id, term_id), method="commit")
+        self._query_cache.invalidate("StudentTermPlans_has_Courses")
 
   def update_course(self, new_course_id: int, student_term_plan_id: int, course_id: int) -> None:
     """
-    Updates a student term plan course
+    Updates a student term plan course, see update_courses
 
     Arguments:
       - new_course_id (int): The course ID
@@ -197,16 +341,49 @@ class StudentTermPlanManager:
     Raises:
       QueryError: If an error occurs during the query execution.
     """
+    self.update_courses(student_term_plan_id, [(course_id, new_course_id)])
+
+  def update_courses(self, student_term_plan_id: int, changes: List[Tuple[int, int]]) -> None:
+    """
+    Replaces courses in a student term plan with one keyed UPDATE on (studentTermPlanID, courseID)
+    MySQL checks the unique (studentTermPlanID, courseID) index row by row during an UPDATE, so changes that swap courses (A to B, B to A)
+    or chain them (A to B, B to C) would hit a duplicate key; those are applied as a delete of the old courses and an insert of the new ones instead
+
+    Arguments:
+      - student_term_plan_id (int): Student term plan ID
+      - changes (list): (course_id, new_course_id) pairs; new_course_id may be None
+
+    Returns:
+      - None
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    if not changes:
+      return
+
+    course_ids = [course_id for course_id, _ in changes]
+
+    # A new course that is also one of the replaced courses takes its place while that row still holds it
+    if set(course_ids) & {new_course_id for _, new_course_id in changes}:
+      with self._database_manager.transaction():
+        self.remove_courses(student_term_plan_id, course_ids)
+        self.add_courses(student_term_plan_id=student_term_plan_id, courses=[new_course_id for _, new_course_id in changes])
+      return
 
     self._database_manager.check_connection()
 
     query = """
       UPDATE StudentTermPlans_has_Courses
-      SET courseID = %s
-      WHERE studentTermPlanCourseID = (SELECT studentTermPlanCourseID FROM StudentTermPlans_has_Courses WHERE studentTermPlanID = %s AND courseID = %s)
-    """
+      SET courseID = CASE courseID {} END
+      WHERE studentTermPlanID = %s AND courseID IN ({})
+    """.format(" ".join(["WHEN %s THEN %s"] * len(changes)), ", ".join(["%s"] * len(changes)))
+
+    parameters = tuple(value for change in changes for value in change) + (student_term_plan_id,) + tuple(course_ids)
     
-    self.perform_query(query=query, parameters=(new_course_id, student_term_plan_id, course_id), method="commit")
+    with self._database_manager.transaction():
+      self.perform_query(query=query, parameters=parameters, method="commit")
+      self._query_cache.invalidate("StudentTermPlans_has_Courses")
 
   def update_approval(self, student_term_plan_id: int, advisor_approved: int) -> None:
     """
@@ -231,11 +408,13 @@ class StudentTermPlanManager:
       WHERE studentTermPlanID = %s
     """
     
-    self.perform_query(query=query, parameters=(advisor_approved, student_term_plan_id), method="commit")
+    with self._database_manager.transaction():
+      self.perform_query(query=query, parameters=(advisor_approved, student_term_plan_id), method="commit")
+      self._query_cache.invalidate("StudentTermPlans")
 
   def remove_course(self, student_term_plan_id: int, course_id: int) -> None:
     """
-    Removes a course from a student term plan
+    Removes a course from a student term plan, see remove_courses
 
     Arguments:
       - student_term_plan_id (int): The ID of the student term plan
@@ -247,14 +426,35 @@ class StudentTermPlanManager:
     Raises:
       QueryError: If an error occurs during the query execution.
     """
+    self.remove_courses(student_term_plan_id, [course_id])
+
+  def remove_courses(self, student_term_plan_id: int, course_ids: List[int]) -> None:
+    """
+    Removes courses from a student term plan with one keyed DELETE on (studentTermPlanID, courseID)
+
+    Arguments:
+      - student_term_plan_id (int): The ID of the student term plan
+      - course_ids (list): The IDs of the courses being deleted
+
+    Returns:
+      - None
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    if not course_ids:
+      return
+
     self._database_manager.check_connection()
 
     query = """
       DELETE FROM StudentTermPlans_has_Courses
-      WHERE studentTermPlanCourseID = (SELECT studentTermPlanCourseID FROM StudentTermPlans_has_Courses WHERE studentTermPlanID = %s AND courseID = %s)
-    """
+      WHERE studentTermPlanID = %s AND courseID IN ({})
+    """.format(", ".join(["%s"] * len(course_ids)))
 
-    self.perform_query(query=query, parameters=(student_term_plan_id, course_id), method="commit")
+    with self._database_manager.transaction():
+      self.perform_query(query=query, parameters=(student_term_plan_id, *course_ids), method="commit")
+      self._query_cache.invalidate("StudentTermPlans_has_Courses")
 
   def delete(self, student_term_plan_id: int) -> None:
     """
@@ -276,4 +476,6 @@ class StudentTermPlanManager:
       WHERE studentTermPlanID = %s
     """
 
-    self.perform_query(query=query, parameters=(student_term_plan_id,), method="commit")
\ No newline at end of file
+    with self._database_manager.transaction():
+      self.perform_query(query=query, parameters=(student_term_plan_id,), method="commit")
+      self._query_cache.invalidate("StudentTermPlans", "StudentTermPlans_has_Courses")
\ No newline at end of file
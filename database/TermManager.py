@@ -1,30 +1,48 @@
 from database.DatabaseManager import DatabaseManager
+from database.QueryCache import QueryCache
+from database.Row import Row
 from blueprints.errorHandlers import QueryError
-from typing import List, TypedDict, Any 
+from database.CourseManager import CourseDetail
+from itertools import groupby
+from operator import itemgetter
+from dataclasses import dataclass
+from typing import List, Any 
 
-class Term(TypedDict):
+# Row fields follow the column order of the queries that build them
+@dataclass(slots=True)
+class Term(Row):
   id: int
   name: str
   startDate: str
   endDate: str
   courses: str
 
+@dataclass(slots=True)
+class TermWithCourseDetails(Row):
+  id: int
+  name: str
+  startDate: str
+  endDate: str
+  courses: List[CourseDetail]
+
 class TermManager:
   """
   Manages all database queries related to Terms and interacts with the DatabaseManager to execute the queries.
   """
 
-  def __init__(self, database_manager: DatabaseManager):
+  def __init__(self, database_manager: DatabaseManager, query_cache: QueryCache):
     """
-    Initializes the TermManager instance and stores the provided DatabaseManager instance.
+    Initializes the TermManager instance and stores the provided DatabaseManager and QueryCache instances.
 
     Arguments:
       - database_manager (DatabaseManager): An instance of the DatabaseManager class that manages database connections and executing queries.
+      - query_cache (QueryCache): Caches read results and invalidates them when this manager writes.
     """
     self._database_manager = database_manager
+    self._query_cache = query_cache
     self._HTTP_OK = 200
 
-  def perform_query(self, query: str, parameters: tuple = None, method: str = None) -> Any:
+  def perform_query(self, query: str, parameters: tuple = None, method: str = None, many: bool = False) -> Any:
     """
     Helper function that calls the execute_query method of the DatabaseManager class
 
@@ -32,6 +50,7 @@ class TermManager:
       - query (str): The SQL query to execute
       - parameters (tuple, optional): The parameters for the query. Defaults to an empty tuple if not provided.
       - method (str, optional): The query method, e.g., "fetchall", "fetchone", or "commit".
+      - many (bool, optional): Whether parameters is a list of parameter tuples to insert in one multi-row statement. Defaults to False.
 
     Returns:
       - Result if method is "fetchall" or "fetchone", else None
@@ -40,7 +59,7 @@ class TermManager:
       QueryError: If an error occurs during the query execution.
     """  
     # Execute query and catch status code and query result/error response
-    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method)  
+    status, result = self._database_manager.execute_query(query=query, parameters=parameters, method=method, many=many)  
 
     if status != self._HTTP_OK:  
       raise QueryError(f"An error occurred while executing the query: {result}")  
@@ -49,12 +68,13 @@ class TermManager:
   def all(self) -> List[Term]:
     """
     Retrieves all terms
+    Results are served from the query cache until the terms, term courses or courses are written
 
     Arguments:
       - None
 
     Returns:
-      - List: A list of dictionaries representing the terms. Each dictionary contains:
+      - List: A list of Term rows representing the terms. Each row contains:
         - "id" (int): The term ID
         - "name" (str): The term name
         - "startDate" (str): The date the term starts
@@ -64,6 +84,16 @@ class TermManager:
     Raises:
       QueryError: If an error occurs during the query execution.
     """
+    return self._query_cache.fetch(
+      key=("TermManager.all",),
+      tables=("Terms", "Terms_has_Courses", "Courses"),
+      loader=lambda: self._load_all()
+    )
+
+  def _load_all(self):
+    """
+    Runs the all query without the cache, see all
+    """
 
     self._database_manager.check_connection()
   
@@ -78,17 +108,64 @@ class TermManager:
       ORDER BY t.startDate ASC;
     """
 
-    return [
-      {
-        "id": row[0],
-        "name": row[1],
-        "startDate": row[2],
-        "endDate": row[3],
-        "courses": row[4]
-      }
-      for row in self.perform_query(query=query, method="fetchall")
-    ]
+    return [Term(*row) for row in self.perform_query(query=query, method="fetchall")]
     
+  def all_nested(self, term_id: int = None) -> List[TermWithCourseDetails]:
+    """
+    Retrieves all terms, or one term, with their courses as nested course objects
+    Runs one flat join and groups the rows in Python, so course names containing commas are never split apart
+    Results are served from the query cache until the terms, term courses or courses are written
+
+    Arguments:
+      - term_id (int, optional): Only retrieve this term. Defaults to every term.
+
+    Returns:
+      - List: A list of TermWithCourseDetails rows representing the terms, ordered by start date. Each row contains:
+        - "id" (int): The term ID
+        - "name" (str): The term name
+        - "startDate" (str): The date the term starts, as YYYY-MM-DD
+        - "endDate" (str): The date the term ends, as YYYY-MM-DD
+        - "courses" (list): The courses offered in the term ordered by ID, each with "id", "code", "name" and "credit"
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
+    return self._query_cache.fetch(
+      key=("TermManager.all_nested", term_id),
+      tables=("Terms", "Terms_has_Courses", "Courses"),
+      loader=lambda: self._load_all_nested(term_id)
+    )
+
+  def _load_all_nested(self, term_id: int = None) -> List[TermWithCourseDetails]:
+    """
+    Runs the all_nested query without the cache, see all_nested
+    """
+    self._database_manager.check_connection()
+
+    query = """
+      SELECT
+        t.termID, t.name, t.startDate, t.endDate,
+        c.courseID, c.code, c.name, c.credit
+      FROM Terms t
+      LEFT JOIN Terms_has_Courses thc ON t.termID = thc.termID
+      LEFT JOIN Courses c ON thc.courseID = c.courseID
+      {}
+      ORDER BY t.startDate ASC, t.termID ASC, c.courseID ASC
+    """.format("WHERE t.termID = %s" if term_id else "")
+
+    terms = []
+    for _, rows in groupby(self.perform_query(query=query, parameters=(term_id,) if term_id else None, method="fetchall"), key=itemgetter(0)):
+      rows = list(rows)
+      terms.append(TermWithCourseDetails(
+        rows[0][0],
+        rows[0][1],
+        rows[0][2].isoformat(),
+        rows[0][3].isoformat(),
+        [CourseDetail(*row[4:8]) for row in rows if row[4] is not None]
+      ))
+
+    return terms
+
   def get(self, term_season: str, term_year: int, fields: list = ["termID"]) -> Term:
     """
     Retrieves the requested term fields given term season and year
@@ -114,9 +191,10 @@ class TermManager:
 
     return self.perform_query(query=query, parameters=(f"{term_season} {term_year}",), method="fetchone")
 
-  def create(self, term_season: str, term_year: int, term_start_date: str, term_end_date: str) -> None:
+  def create(self, term_season: str, term_year: int, term_start_date: str, term_end_date: str) -> bool:
     """
     Creates a new term
+    Runs as one upsert, so an existing row is reported from the affected row count instead of a separate lookup
 
     Arguments:
       - term_season (str): The season of the term
@@ -125,7 +203,7 @@ class TermManager:
       - term_end_date (int): The date the term ends
 
     Returns:
-      - None
+      - bool: True if it was created, False if a term with the same name already exists
 
     Raises:
       QueryError: If an error occurs during the query execution.
@@ -135,10 +213,16 @@ class TermManager:
     
     query = """
       INSERT INTO Terms (name, startDate, endDate)
-      VALUES (%s, %s, %s);
+      VALUES (%s, %s, %s)
+      ON DUPLICATE KEY UPDATE name = name;
     """
 
-    self.perform_query(query=query, parameters=(f"{term_season} {term_year}", term_start_date, term_end_date), method="commit")
+    with self._database_manager.transaction():
+      created = self.perform_query(query=query, parameters=(f"{term_season} {term_year}", term_start_date, term_end_date), method="rowcount") > 0
+      if created:
+        self._query_cache.invalidate("Terms")
+
+    return created
 
   def add_course(self, term_course_id: int, term_season: str = None, term_year: int = None, term_id: int = None) -> None:
     """
@@ -148,7 +232,6 @@ class TermManager:
       - term_course_id (int): The id of the course being added to the term
       - term_season (str, optional): the season of the term
       - term_year (int, optional): the yar of the term
-      - term_name (str, optional): The name of the term
       - term_id (int, optional): The id of the term
 
     Returns:
@@ -157,23 +240,55 @@ class TermManager:
     Raises:
       QueryError: If an error occurs during the query execution.
     """
-    self._database_manager.check_connection()
-    
+    self.add_courses([term_course_id], term_season=term_season, term_year=term_year, term_id=term_id)
+
+  def add_courses(self, term_course_ids: List[int], term_season: str = None, term_year: int = None, term_id: int = None) -> None:
+    """
+    Adds courses to a term in a single multi-row INSERT
+    When the term is given by season and year, its ID is resolved once for all rows
+
+    Arguments:
+      - term_course_ids (list): The ids of the courses being added to the term
+      - term_season (str, optional): the season of the term
+      - term_year (int, optional): the year of the term
+      - term_id (int, optional): The id of the term
+
+    Returns:
+      - None
+
+    Raises:
+      QueryError: If an error occurs during the query execution.
+    """
     if not any([term_season, term_year, term_id]):
       raise QueryError(f"An error occurred while executing the query: neither a term season/year or id was provided.")
 
+    if not term_course_ids:
+      return
+
+    self._database_manager.check_connection()
+
     if term_season and term_year:
-      query = """
+      # Derived table of the new course IDs, one row per ID
+      courses = "SELECT %s AS courseID" + " UNION ALL SELECT %s" * (len(term_course_ids) - 1)
+
+      query = f"""
         INSERT INTO Terms_has_Courses (termID, courseID)
-        VALUES ((SELECT termID FROM Terms WHERE name = %s), %s);
+        SELECT t.termID, c.courseID
+        FROM Terms t
+        CROSS JOIN ({courses}) c
+        WHERE t.name = %s
       """
-      parameters = (f"{term_season} {term_year}", term_course_id)
+
+      with self._database_manager.transaction():
+        self.perform_query(query=query, parameters=(*term_course_ids, f"{term_season} {term_year}"), method="commit")
+        self._query_cache.invalidate("Terms_has_Courses")
 
     else:
       query = """
         INSERT INTO Terms_has_Courses (termID, courseID)
         VALUES (%s, %s)
       """
-      parameters = (term_id, term_course_id)
 
-    self.perform_query(query=query, parameters=parameters, method="commit")
\ No newline at end of file
+      with self._database_manager.transaction():
+        self.perform_query(query=query, parameters=[(term_id, course_id) for course_id in term_course_ids], method="commit", many=True)
+        self._query_cache.invalidate("Terms_has_Courses")
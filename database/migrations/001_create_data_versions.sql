@@ -0,0 +1,10 @@
+-- -----------------------------------------------------
+-- Create 'DataVersions' Table
+-- One change counter per table, bumped by the app on every write
+-- and used to invalidate cached query results
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS DataVersions (
+  tableName VARCHAR(64) NOT NULL,
+  version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  PRIMARY KEY (tableName)
+);
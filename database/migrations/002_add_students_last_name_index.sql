@@ -0,0 +1,5 @@
+-- -----------------------------------------------------
+-- Index 'Students' on (lastName, studentID)
+-- Serves the keyset-paginated students listing
+-- -----------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_students_last_name ON Students (lastName, studentID);
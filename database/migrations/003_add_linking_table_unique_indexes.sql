@@ -0,0 +1,32 @@
+-- -----------------------------------------------------
+-- Add composite unique indexes to the linking tables
+-- Keyed lookups such as WHERE studentTermPlanID = %s AND courseID = %s
+-- become single index seeks, and duplicate links are rejected.
+-- Existing duplicates are deleted first, keeping the oldest row of each.
+-- -----------------------------------------------------
+DELETE duplicate
+FROM StudentTermPlans_has_Courses duplicate
+INNER JOIN StudentTermPlans_has_Courses original
+  ON duplicate.studentTermPlanID = original.studentTermPlanID
+  AND duplicate.courseID = original.courseID
+  AND duplicate.studentTermPlanCourseID > original.studentTermPlanCourseID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_term_plan_course ON StudentTermPlans_has_Courses (studentTermPlanID, courseID);
+
+DELETE duplicate
+FROM Terms_has_Courses duplicate
+INNER JOIN Terms_has_Courses original
+  ON duplicate.termID = original.termID
+  AND duplicate.courseID = original.courseID
+  AND duplicate.termCourseID > original.termCourseID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_term_course ON Terms_has_Courses (termID, courseID);
+
+DELETE duplicate
+FROM Courses_has_Prerequisites duplicate
+INNER JOIN Courses_has_Prerequisites original
+  ON duplicate.courseID = original.courseID
+  AND duplicate.prerequisiteID = original.prerequisiteID
+  AND duplicate.coursePrerequisiteID > original.coursePrerequisiteID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_course_prerequisite ON Courses_has_Prerequisites (courseID, prerequisiteID);
@@ -0,0 +1,15 @@
+-- -----------------------------------------------------
+-- Create 'IdempotencyKeys' Table
+-- Stores the response to each write request sent with an
+-- Idempotency-Key header, so a retried request is answered
+-- from here instead of being applied twice
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS IdempotencyKeys (
+  idempotencyKey VARCHAR(255) NOT NULL,
+  requestPath VARCHAR(255) NOT NULL,
+  statusCode SMALLINT NOT NULL,
+  responseBody TEXT NOT NULL,
+  createdAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (idempotencyKey),
+  INDEX idx_idempotency_keys_created_at (createdAt)
+);
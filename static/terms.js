@@ -83,12 +83,14 @@ async function addTerm(event) {
 // BUILD UPDATE TERM SECTION //
 // ////////////////////////////////////// //
 // Handle building the update term section and toggling display of it to on
-function buildUpdateTermSection(event, term_id, term_name, courses) {
+async function buildUpdateTermSection(event, term_id, term_name) {
     // Prevent page from refreshing
     event.preventDefault();
 
-    // Build array from comma separated string and trim white space
-    const courses_array = courses.split(",").map(course => course.trim());
+    // Get the term's current course IDs from the JSON API
+    const response = await fetch(`/api/terms/${term_id}`);
+    const term = await response.json();
+    const current_course_ids = term["courses"].map(course => course["id"]);
 
     const edit_section = document.getElementById("edit_term_courses_section");
     edit_section.innerHTML = "";
@@ -109,7 +111,7 @@ function buildUpdateTermSection(event, term_id, term_name, courses) {
         `;
 
     for (const course_object of window.courses) {
-        const is_current_course = courses_array.includes(course_object["course"]);
+        const is_current_course = current_course_ids.includes(course_object["id"]);
 
         edit_section_html += `
             <option value="${course_object['id']}" ${is_current_course ? "disabled" : ""}>
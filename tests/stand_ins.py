@@ -0,0 +1,162 @@
+import os
+import MySQLdb
+from itertools import islice
+from unittest import mock
+from database.DatabaseManager import DatabaseManager
+
+class DatabaseStandIn:
+  """
+  Stands in for the MySQL server behind a real DatabaseManager
+  Queries are answered by the first handler whose fragment appears in the query, with whitespace collapsed to single spaces.
+  A handler takes the query parameters and returns the result rows of a read or the affected row count of a write.
+  Every statement is logged, including BEGIN, COMMIT and ROLLBACK, and queued errors are raised by the next statements.
+  """
+
+  def __init__(self):
+    self.log = []
+    self.errors = []
+    self._handlers = []
+
+  def reset(self):
+    self.log.clear()
+    self.errors.clear()
+    self._handlers.clear()
+
+  def on(self, fragment, handler):
+    self._handlers.append((fragment, handler))
+
+  def run(self, query, parameters, many=False):
+    """
+    Runs a statement, or with many=True one multi-row statement with a handler call per row, returning the summed row count
+    """
+    query = " ".join(query.split())
+    self.log.append(query)
+
+    if self.errors:
+      raise self.errors.pop(0)
+
+    for fragment, handler in self._handlers:
+      if fragment in query:
+        return sum(handler(row) for row in parameters) if many else handler(parameters)
+
+    if many:
+      return len(parameters)
+    return [] if query.startswith("SELECT") else 1
+
+  def statements(self, fragment):
+    return [query for query in self.log if fragment in query]
+
+class CursorStandIn:
+  """
+  Buffered cursor, or an unbuffered one (SSCursor) that keeps its connection busy until its rows are read or it is closed, like MySQL does
+  """
+
+  def __init__(self, connection, unbuffered=False):
+    self._connection = connection
+    self._unbuffered = unbuffered
+    self._rows = iter(())
+    self.rowcount = 0
+
+  def execute(self, query, parameters=()):
+    result = self._connection.run(query, parameters)
+    if isinstance(result, int):
+      self.rowcount = result
+    else:
+      self._rows = iter(result)
+      self.rowcount = len(result)
+      if self._unbuffered:
+        self._connection.reading = self
+
+  def executemany(self, query, parameters):
+    self.rowcount = self._connection.run(query, list(parameters), many=True)
+
+  def fetchall(self):
+    return tuple(self._rows)
+
+  def fetchone(self):
+    return next(self._rows, None)
+
+  def fetchmany(self, size):
+    self._connection.check(self)
+    rows = list(islice(self._rows, size))
+    if not rows and self._connection.reading is self:
+      self._connection.reading = None
+    return rows
+
+  def close(self):
+    if self._connection.reading is self:
+      self._rows = iter(())
+      self._connection.reading = None
+
+class ConnectionStandIn:
+  def __init__(self, database):
+    self._database = database
+    self.reading = None
+    self.closed = False
+
+  def check(self, cursor=None):
+    if self.closed:
+      raise MySQLdb.InterfaceError(0, "")
+    if self.reading not in (None, cursor):
+      raise MySQLdb.ProgrammingError(2014, "Commands out of sync; you can't run this command now")
+
+  def run(self, query, parameters, many=False):
+    self.check()
+    return self._database.run(query, parameters, many)
+
+  def cursor(self, cursor_class=None):
+    return CursorStandIn(self, unbuffered=cursor_class is not None)
+
+  def begin(self):
+    self.check()
+    self._database.log.append("BEGIN")
+
+  def commit(self):
+    self.check()
+    self._database.log.append("COMMIT")
+
+  def rollback(self):
+    self.check()
+    self._database.log.append("ROLLBACK")
+
+  def ping(self):
+    self.check()
+
+  def close(self):
+    self.closed = True
+
+def connect_to(test, database, **environment):
+  """
+  Makes new MySQL connections talk to the given DatabaseStandIn for the rest of the test
+  Keyword arguments override the DatabaseManager environment variables, e.g. query_budget_mode="raise"
+  """
+  environment = {"mysql_pool_min_size": "0", "mysql_read_freshness": "autocommit", "query_budget_mode": "off", **environment}
+
+  for patcher in (mock.patch.dict(os.environ, environment), mock.patch.object(MySQLdb, "connect", lambda *args, **kwargs: ConnectionStandIn(database))):
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+def database_manager(test, database, **environment):
+  """
+  Returns a DatabaseManager whose connections talk to the given DatabaseStandIn for the rest of the test, see connect_to
+  """
+  connect_to(test, database, **environment)
+  return DatabaseManager()
+
+# The app's DatabaseManager is created once, when blueprints.routes is first imported, so every app test shares one DatabaseStandIn
+APP_DATABASE = DatabaseStandIn()
+
+def app_client(test):
+  """
+  Returns a test client of the app, whose database is APP_DATABASE cleared of the previous test's handlers, log and cached results
+  The app is in testing mode, so errors no error handler answers, e.g. a QueryBudgetError, are raised by the client
+  Import the app's modules inside tests, after calling this, so its DatabaseManager never connects to a real server
+  """
+  connect_to(test, APP_DATABASE)
+  from app import app
+  app.testing = True
+  from blueprints.routes import qm
+
+  APP_DATABASE.reset()
+  qm._cache.clear()
+  return app.test_client()
@@ -0,0 +1,37 @@
+import unittest
+from stand_ins import APP_DATABASE, app_client
+
+# Rows of StudentTermPlanManager.all_nested for plan 1 with courses 10 and 20
+PLAN_ROWS = [
+  (1, "A1", "Ada Lovelace", 3, "Fall 2024", 0, 10, "CS161", "INTRO I", 4),
+  (1, "A1", "Ada Lovelace", 3, "Fall 2024", 0, 20, "CS162", "INTRO II", 4)
+]
+
+class BatchEditStudentTermPlanTest(unittest.TestCase):
+  def setUp(self):
+    self.client = app_client(self)
+    self.updates = []
+    APP_DATABASE.on("FROM StudentTermPlans stp", lambda parameters: PLAN_ROWS)
+    APP_DATABASE.on("UPDATE StudentTermPlans_has_Courses", lambda parameters: self.updates.append(parameters) or 1)
+
+  def test_replaces_a_course_with_null(self):
+    response = self.client.post("/api/student-term-plans/1/batch", json={"operations": [{"action": "replace", "course_id": 10, "new_course_id": None}]})
+
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(self.updates, [(10, None, 1, 10)])
+
+  def test_rejects_a_replacement_without_a_new_course(self):
+    response = self.client.post("/api/student-term-plans/1/batch", json={"operations": [{"action": "replace", "course_id": 10}]})
+
+    self.assertEqual(response.status_code, 400)
+    self.assertEqual(self.updates, [])
+
+  def test_rejects_clearing_every_course(self):
+    operations = [{"action": "replace", "course_id": 10, "new_course_id": None}, {"action": "remove", "course_id": 20}]
+    response = self.client.post("/api/student-term-plans/1/batch", json={"operations": operations})
+
+    self.assertEqual(response.status_code, 400)
+    self.assertIn("ROLLBACK", APP_DATABASE.log)
+
+if __name__ == "__main__":
+  unittest.main()
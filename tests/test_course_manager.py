@@ -0,0 +1,69 @@
+import unittest
+from blueprints.errorHandlers import QueryError
+from database.CourseManager import CourseManager
+from database.DataVersionManager import DataVersionManager
+from database.QueryCache import QueryCache
+from stand_ins import DatabaseStandIn, database_manager
+
+class AddPrerequisitesTest(unittest.TestCase):
+  def setUp(self):
+    self.edges = []
+    self.version = 0
+    # Runs while this writer waits for the prerequisite version lock, e.g. another writer committing
+    self.while_locking = lambda: None
+
+    def lock(parameters):
+      self.while_locking()
+      return [(self.version,)]
+
+    def bump(parameters):
+      self.version += 1
+      return 1
+
+    self.database = DatabaseStandIn()
+    self.database.on("FROM Courses WHERE code", lambda parameters: [({"CS161": 1, "CS162": 2, "CS261": 3}[parameters[0]],)])
+    self.database.on("SELECT tableName, version FROM DataVersions", lambda parameters: [("Courses_has_Prerequisites", self.version)])
+    self.database.on("FOR UPDATE", lock)
+    self.database.on("version = version + 1", bump)
+    self.database.on("FROM Courses_has_Prerequisites", lambda parameters: list(self.edges))
+    self.database.on("INSERT INTO Courses_has_Prerequisites", lambda parameters: self.edges.append(parameters) or 1)
+
+    dm = database_manager(self, self.database)
+    self.courses = CourseManager(dm, QueryCache(dm, DataVersionManager(dm)))
+
+  def test_rejects_cycles(self):
+    self.courses.add_prerequisites("CS261", [2])
+
+    with self.assertRaises(QueryError):
+      self.courses.add_prerequisites("CS162", [3])
+
+    self.assertEqual(self.edges, [(3, 2)])
+
+  def test_checks_cycles_against_edges_committed_while_waiting_for_the_lock(self):
+    self.courses.prerequisite_graph()
+
+    # CS161 gets CS162 as a prerequisite in another transaction, which holds the lock until it commits
+    def commit_other_writer():
+      self.edges.append((1, 2))
+      self.version += 1
+    self.while_locking = commit_other_writer
+
+    with self.assertRaises(QueryError):
+      self.courses.add_prerequisites("CS162", [1])
+
+    self.assertEqual(self.edges, [(1, 2)])
+
+  def test_keeps_the_graph_at_the_committed_version(self):
+    self.courses.add_prerequisites("CS261", [2])
+    reads = len(self.database.statements("FROM Courses_has_Prerequisites"))
+
+    graph = self.courses.prerequisite_graph()
+    self.courses.add_prerequisites("CS162", [1])
+
+    self.assertEqual(graph.version, self.version)
+    self.assertIs(self.courses.prerequisite_graph(), graph)
+    self.assertEqual(len(self.database.statements("FROM Courses_has_Prerequisites")), reads)
+    self.assertEqual(graph.prerequisites_of(3), {1, 2})
+
+if __name__ == "__main__":
+  unittest.main()
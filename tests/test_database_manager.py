@@ -0,0 +1,149 @@
+import unittest
+import MySQLdb
+from blueprints.errorHandlers import QueryError
+from stand_ins import DatabaseStandIn, database_manager
+
+def lost_connection():
+  return MySQLdb.OperationalError(2013, "Lost connection to MySQL server during query")
+
+class LostConnectionTest(unittest.TestCase):
+  def setUp(self):
+    self.database = DatabaseStandIn()
+    self.dm = database_manager(self, self.database)
+    self.database.on("FROM Terms", lambda parameters: [(1, "Fall 2024")])
+
+  def test_replays_a_read_on_a_new_connection(self):
+    self.database.errors.append(lost_connection())
+
+    status, result = self.dm.execute_query("SELECT termID, name FROM Terms", method="fetchall")
+
+    self.assertEqual((status, result), (200, ((1, "Fall 2024"),)))
+    self.assertEqual(len(self.database.statements("FROM Terms")), 2)
+
+  def test_returns_the_error_of_a_write_without_replaying_it(self):
+    for method in ("commit", "rowcount"):
+      with self.subTest(method=method):
+        self.database.log.clear()
+        self.database.errors.append(lost_connection())
+
+        status, error = self.dm.execute_query("INSERT INTO Terms (name) VALUES (%s)", ("Fall 2024",), method=method)
+
+        self.assertEqual(status, 500)
+        self.assertEqual(error.args[0], 2013)
+        self.assertEqual(len(self.database.statements("INSERT")), 1)
+
+  def test_runs_the_next_query_on_a_new_connection_after_a_lost_write(self):
+    self.database.errors.append(lost_connection())
+    self.dm.execute_query("INSERT INTO Terms (name) VALUES (%s)", ("Fall 2024",), method="commit")
+
+    self.assertEqual(self.dm.execute_query("SELECT termID, name FROM Terms")[0], 200)
+
+  def test_replays_a_read_only_once(self):
+    self.database.errors.extend([lost_connection(), lost_connection()])
+
+    status, error = self.dm.execute_query("SELECT termID, name FROM Terms", method="fetchone")
+
+    self.assertEqual(status, 500)
+    self.assertEqual(len(self.database.statements("FROM Terms")), 2)
+
+class TransactionTest(unittest.TestCase):
+  def setUp(self):
+    self.database = DatabaseStandIn()
+    self.dm = database_manager(self, self.database)
+    self.events = []
+
+  def insert(self, name):
+    return self.dm.execute_query("INSERT INTO Terms (name) VALUES (%s)", (name,), method="commit")
+
+  def logged(self, name):
+    """
+    Returns a callback that adds an event to the log, next to the statements run so far
+    """
+    return lambda: self.events.append((name, list(self.database.log)))
+
+  def test_commits_every_query_of_the_block_once(self):
+    with self.dm.transaction():
+      self.insert("Fall 2024")
+      with self.dm.transaction():
+        self.insert("Winter 2025")
+
+    self.assertEqual(self.database.log, ["BEGIN", "INSERT INTO Terms (name) VALUES (%s)", "INSERT INTO Terms (name) VALUES (%s)", "COMMIT"])
+    self.assertFalse(self.dm.in_transaction())
+
+  def test_rolls_back_and_reraises_when_the_block_raises(self):
+    with self.assertRaises(QueryError):
+      with self.dm.transaction():
+        self.insert("Fall 2024")
+        raise QueryError("The term could not be added")
+
+    self.assertEqual(self.database.log[-1], "ROLLBACK")
+    self.assertNotIn("COMMIT", self.database.log)
+    self.assertFalse(self.dm.in_transaction())
+
+  def test_rolls_back_the_outer_block_when_a_nested_block_raises(self):
+    with self.assertRaises(QueryError):
+      with self.dm.transaction():
+        self.insert("Fall 2024")
+        with self.dm.transaction():
+          raise QueryError("The term could not be added")
+
+    self.assertEqual(self.database.log.count("ROLLBACK"), 1)
+    self.assertNotIn("COMMIT", self.database.log)
+
+  def test_runs_on_commit_callbacks_after_the_commit(self):
+    with self.dm.transaction():
+      self.insert("Fall 2024")
+      self.dm.on_commit(self.logged("committed"))
+      self.assertEqual(self.events, [])
+
+    self.assertEqual(self.events, [("committed", ["BEGIN", "INSERT INTO Terms (name) VALUES (%s)", "COMMIT"])])
+
+  def test_runs_before_commit_callbacks_inside_the_transaction(self):
+    with self.dm.transaction():
+      self.dm.before_commit(lambda: self.insert("Fall 2024"))
+      self.dm.before_commit(self.logged("before commit"))
+
+    self.assertEqual(self.events, [("before commit", ["BEGIN", "INSERT INTO Terms (name) VALUES (%s)"])])
+    self.assertEqual(self.database.log[-1], "COMMIT")
+
+  def test_drops_callbacks_of_a_transaction_that_rolls_back(self):
+    with self.assertRaises(QueryError):
+      with self.dm.transaction():
+        self.dm.on_commit(self.logged("committed"))
+        self.dm.before_commit(self.logged("before commit"))
+        raise QueryError("The term could not be added")
+
+    with self.dm.transaction():
+      pass
+
+    self.assertEqual(self.events, [])
+
+  def test_rolls_back_when_a_before_commit_callback_raises(self):
+    def fail():
+      raise QueryError("The data version could not be bumped")
+
+    with self.assertRaises(QueryError):
+      with self.dm.transaction():
+        self.dm.on_commit(self.logged("committed"))
+        self.dm.before_commit(fail)
+
+    self.assertEqual(self.database.log[-1], "ROLLBACK")
+    self.assertEqual(self.events, [])
+
+  def test_runs_callbacks_immediately_outside_of_a_transaction(self):
+    self.dm.on_commit(self.logged("committed"))
+    self.dm.before_commit(self.logged("before commit"))
+
+    self.assertEqual([name for name, _ in self.events], ["committed", "before commit"])
+
+  def test_does_not_replay_a_read_when_the_connection_is_lost_in_a_transaction(self):
+    self.database.errors.append(lost_connection())
+
+    with self.dm.transaction():
+      status, _ = self.dm.execute_query("SELECT termID, name FROM Terms")
+
+    self.assertEqual(status, 500)
+    self.assertEqual(len(self.database.statements("FROM Terms")), 1)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,77 @@
+import csv
+import gzip
+import io
+import json
+import unittest
+from unittest import mock
+from blueprints.errorHandlers import QueryError
+from database.ExportManager import ExportManager
+from stand_ins import DatabaseStandIn, database_manager
+
+# Joined plan rows in the export query's order; plan 2 has no courses
+PLAN_ROWS = [
+  (1, "A1", 10, 0, 161),
+  (1, "A1", 10, 0, 162),
+  (2, "A1", 11, 1, None),
+  (3, "B2", 10, 1, 261)
+]
+
+class ExportManagerTest(unittest.TestCase):
+  def setUp(self):
+    self.database = DatabaseStandIn()
+    self.database.on("FROM StudentTermPlans stp", lambda parameters: PLAN_ROWS)
+    self.database.on("FROM Students", lambda parameters: [("A1", "Ada", "Lovelace"), ("B2", "Alan", "Turing")])
+
+    # Fetch one row per round trip, so records span several chunks
+    self.dm = database_manager(self, self.database, mysql_stream_chunk_size="1")
+    self.exports = ExportManager(self.dm)
+
+  def export(self, entity, **options):
+    return b"".join(self.exports.export(entity, **options))
+
+  def test_collects_the_joined_ids_of_each_record(self):
+    self.assertEqual(list(self.exports.records("student-term-plans")), [
+      (1, "A1", 10, 0, [161, 162]),
+      (2, "A1", 11, 1, []),
+      (3, "B2", 10, 1, [261])
+    ])
+
+  def test_passes_the_rows_of_an_entity_without_joined_ids_through(self):
+    self.assertEqual(list(self.exports.records("students")), [("A1", "Ada", "Lovelace"), ("B2", "Alan", "Turing")])
+
+  def test_writes_csv_with_the_ids_joined_by_semicolons(self):
+    rows = list(csv.reader(io.StringIO(self.export("student-term-plans").decode())))
+
+    self.assertEqual(rows, [
+      ["studentTermPlanID", "studentID", "termID", "advisorApproved", "courseIDs"],
+      ["1", "A1", "10", "0", "161;162"],
+      ["2", "A1", "11", "1", ""],
+      ["3", "B2", "10", "1", "261"]
+    ])
+
+  def test_writes_one_json_object_per_line(self):
+    lines = self.export("student-term-plans", export_format="ndjson").decode().splitlines()
+
+    self.assertEqual(json.loads(lines[0]), {"studentTermPlanID": 1, "studentID": "A1", "termID": 10, "advisorApproved": 0, "courseIDs": [161, 162]})
+    self.assertEqual(len(lines), 3)
+
+  def test_compresses_the_output_with_gzip(self):
+    self.assertEqual(gzip.decompress(self.export("students", compress=True)), self.export("students"))
+
+  def test_frees_the_connection_when_the_consumer_stops_early(self):
+    # Write out every record as its own piece, so the first piece is sent while the rows are still being read
+    with mock.patch("database.ExportManager.EXPORT_CHUNK_SIZE", 1):
+      pieces = self.exports.export("student-term-plans")
+      next(pieces)
+      pieces.close()
+
+    self.assertEqual(self.dm.execute_query("SELECT studentID FROM Students")[0], 200)
+
+  def test_rejects_unsupported_entities_and_formats(self):
+    with self.assertRaisesRegex(QueryError, "Unsupported export entity: grades"):
+      next(self.exports.export("grades"))
+    with self.assertRaisesRegex(QueryError, "Unsupported export format: xml"):
+      next(self.exports.export("students", export_format="xml"))
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from datetime import date
+from unittest import mock
+from database.PlanValidator import PlanValidator
+from database.PrerequisiteGraph import PrerequisiteGraph
+from stand_ins import DatabaseStandIn, database_manager
+
+FALL = date(2024, 9, 25)
+WINTER = date(2025, 1, 6)
+
+# CS162 needs CS161, CS261 needs CS162
+GRAPH = PrerequisiteGraph([(2, 1), (3, 2)])
+
+class PlanValidatorTest(unittest.TestCase):
+  def setUp(self):
+    self.database = DatabaseStandIn()
+    self.rows = []
+    self.database.on("FROM StudentTermPlans stp", lambda parameters: self.rows)
+    courses = mock.Mock(**{"prerequisite_graph.return_value": GRAPH})
+    self.validator = PlanValidator(database_manager(self, self.database), courses)
+
+  def plan(self, *rows):
+    """
+    Sets the planned courses, as (studentID, startDate, studentTermPlanID, termID, termName, courseID) rows in the query's order
+    """
+    self.rows = list(rows)
+
+  def test_accepts_prerequisites_planned_in_earlier_terms(self):
+    self.plan(
+      ("A1", FALL, 1, 1, "Fall 2024", 1),
+      ("A1", WINTER, 2, 2, "Winter 2025", 2)
+    )
+
+    self.assertEqual(self.validator.validate(), [])
+
+  def test_reports_prerequisites_planned_in_the_same_term(self):
+    self.plan(
+      ("A1", FALL, 1, 1, "Fall 2024", 1),
+      ("A1", FALL, 1, 1, "Fall 2024", 2)
+    )
+
+    self.assertEqual(self.validator.validate(), [{
+      "studentID": "A1",
+      "studentTermPlanID": 1,
+      "termID": 1,
+      "termName": "Fall 2024",
+      "courseID": 2,
+      "missingPrerequisiteIDs": [1]
+    }])
+
+  def test_does_not_count_other_students_plans(self):
+    self.plan(
+      ("A1", FALL, 1, 1, "Fall 2024", 1),
+      ("B2", WINTER, 2, 2, "Winter 2025", 2)
+    )
+
+    self.assertEqual([violation["studentID"] for violation in self.validator.validate()], ["B2"])
+
+  def test_orders_terms_that_share_a_start_date_by_term_id(self):
+    self.plan(
+      ("A1", FALL, 7, 1, "Fall 2024", 1),
+      ("A1", FALL, 5, 2, "Fall 2024 Accelerated", 2),
+      ("A1", WINTER, 6, 3, "Winter 2025", 3)
+    )
+
+    self.assertEqual(self.validator.validate(), [])
+    self.assertIn("ORDER BY stp.studentID, t.startDate, t.termID, stp.studentTermPlanID", self.database.log[0])
+
+if __name__ == "__main__":
+  unittest.main()
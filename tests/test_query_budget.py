@@ -0,0 +1,84 @@
+import unittest
+from unittest import mock
+from flask import Flask, Response
+from blueprints.errorHandlers import QueryBudgetError
+from database.QueryBudget import QueryBudget
+from stand_ins import APP_DATABASE, app_client
+
+PREREQUISITE_QUERY = "SELECT courseID FROM Courses WHERE code = %s"
+
+class QueryBudgetTest(unittest.TestCase):
+  def setUp(self):
+    context = Flask(__name__).test_request_context()
+    context.push()
+    self.addCleanup(context.pop)
+
+  def test_reports_a_statement_repeated_once_per_item(self):
+    budget = QueryBudget(mode="warn", max_repeats=3)
+    for _ in range(4):
+      budget.record(PREREQUISITE_QUERY)
+
+    self.assertEqual(budget.check(), [f"ran the same query 4 times (possible N+1): {PREREQUISITE_QUERY}"])
+
+  def test_counts_statements_with_different_placeholder_runs_as_one_shape(self):
+    budget = QueryBudget(mode="warn", max_repeats=1)
+    budget.record("DELETE FROM Courses WHERE courseID IN (%s, %s)")
+    budget.record("DELETE FROM Courses WHERE courseID IN (%s, %s, %s)")
+
+    self.assertEqual(len(budget.check()), 1)
+
+  def test_raises_over_budget_in_raise_mode(self):
+    budget = QueryBudget(mode="raise", max_queries=2)
+    for table in ("Courses", "Terms", "Students"):
+      budget.record(f"SELECT * FROM {table}")
+
+    with self.assertRaisesRegex(QueryBudgetError, "ran 3 queries, over the budget of 2"):
+      budget.enforce("/courses", Response())
+
+  def test_counts_queries_in_warn_mode(self):
+    budget = QueryBudget(mode="warn", max_queries=2)
+    for table in ("Courses", "Terms", "Students"):
+      budget.record(f"SELECT * FROM {table}")
+    response = Response()
+
+    with mock.patch("builtins.print") as report:
+      budget.enforce("/courses", response)
+
+    self.assertEqual(response.headers["X-Query-Count"], "3")
+    report.assert_called_once_with("Query budget exceeded by /courses: ran 3 queries, over the budget of 2")
+
+class RouteQueryBudgetTest(unittest.TestCase):
+  def setUp(self):
+    self.client = app_client(self)
+    from blueprints.routes import dm, qm
+    self.courses = qm._courses
+
+    patcher = mock.patch.object(dm._query_budget, "mode", "raise")
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+    APP_DATABASE.on("FROM Courses WHERE code", lambda parameters: [(9,)])
+    APP_DATABASE.on("FOR UPDATE", lambda parameters: [(0,)])
+
+  def add_course(self, prerequisite_course_ids):
+    return self.client.post("/add-course", json={"course_code": "CS999", "course_credit": 4, "course_name": "TEST", "prerequisite_course_ids": prerequisite_course_ids})
+
+  def test_add_course_runs_the_same_statements_for_any_number_of_prerequisites(self):
+    one = self.add_course([1])
+    many = self.add_course(list(range(10, 30)))
+
+    self.assertEqual(many.status_code, 200)
+    self.assertEqual(many.headers["X-Query-Count"], one.headers["X-Query-Count"])
+
+  def test_add_course_fails_when_it_checks_prerequisites_one_at_a_time(self):
+    # A regression that looks the course up again for every prerequisite
+    def add_prerequisites(course_code, prerequisite_course_ids):
+      for _ in prerequisite_course_ids:
+        self.courses.get(course_code)
+
+    with mock.patch.object(self.courses, "add_prerequisites", add_prerequisites):
+      with self.assertRaisesRegex(QueryBudgetError, r"Query budget exceeded by /add-course: ran the same query 2 times \(possible N\+1\)"):
+        self.add_course([1, 2])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from unittest import mock
+from database.DataVersionManager import DataVersionManager
+from database.LRUCache import LRUCache
+from database.QueryCache import QueryCache
+from stand_ins import DatabaseStandIn, database_manager
+
+class LRUCacheTest(unittest.TestCase):
+  def test_evicts_the_least_recently_used_entry(self):
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    self.assertEqual(cache.get("a"), (True, 1))
+    self.assertEqual(cache.get("b"), (False, None))
+    self.assertEqual(cache.get("c"), (True, 3))
+    self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+  def test_expires_entries_after_the_time_to_live(self):
+    cache = LRUCache(ttl=10)
+    with mock.patch("database.LRUCache.time.monotonic", side_effect=[100, 109, 110]):
+      cache.set("a", 1)
+      self.assertEqual(cache.get("a"), (True, 1))
+      self.assertEqual(cache.get("a"), (False, None))
+
+    self.assertEqual(len(cache), 0)
+
+class QueryCacheTest(unittest.TestCase):
+  def setUp(self):
+    self.database = DatabaseStandIn()
+    self.versions = {}
+    self.database.on("FROM DataVersions", lambda parameters: list(self.versions.items()))
+    self.database.on("INSERT INTO DataVersions", self.bump)
+
+    self.dm = database_manager(self, self.database)
+    self.cache = QueryCache(self.dm, DataVersionManager(self.dm))
+    self.loads = 0
+
+  def bump(self, parameters):
+    (table,) = parameters
+    self.versions[table] = self.versions.get(table, 0) + 1
+    return 1
+
+  def load(self):
+    self.loads += 1
+    return [("CS161", self.versions.get("Courses", 0))]
+
+  def fetch(self):
+    return self.cache.fetch(key=("CourseManager.all",), tables=("Courses",), loader=self.load)
+
+  def test_serves_repeated_reads_from_the_cache(self):
+    self.assertEqual(self.fetch(), self.fetch())
+    self.assertEqual(self.loads, 1)
+
+  def test_reloads_once_a_write_bumps_the_table_version(self):
+    self.fetch()
+    self.cache.invalidate("Courses")
+
+    self.assertEqual(self.fetch(), [("CS161", 1)])
+    self.assertEqual(self.loads, 2)
+
+  def test_picks_up_a_bump_made_by_another_worker(self):
+    self.fetch()
+    self.versions["Courses"] = 5
+
+    self.assertEqual(self.fetch(), [("CS161", 5)])
+
+  def test_ignores_bumps_of_other_tables(self):
+    self.fetch()
+    self.cache.invalidate("Terms")
+    self.fetch()
+
+    self.assertEqual(self.loads, 1)
+
+  def test_does_not_cache_results_read_inside_a_transaction(self):
+    with self.dm.transaction():
+      self.fetch()
+    self.fetch()
+
+    self.assertEqual(self.loads, 2)
+
+  def test_skips_the_cache_for_tables_written_in_the_transaction(self):
+    self.fetch()
+
+    with self.dm.transaction():
+      self.cache.invalidate("Courses")
+      self.fetch()
+      # The bump waits for the commit, so the version has not moved yet
+      self.assertEqual(self.versions, {})
+
+    self.assertEqual(self.loads, 2)
+    self.assertEqual(self.versions, {"Courses": 1})
+
+  def test_bumps_a_table_written_several_times_in_a_transaction_once(self):
+    with self.dm.transaction():
+      self.cache.invalidate("Courses")
+      self.cache.invalidate("Courses", "Terms")
+
+    self.assertEqual(self.versions, {"Courses": 1, "Terms": 1})
+    self.assertEqual(len(self.database.statements("INSERT INTO DataVersions")), 1)
+
+  def test_drops_bumps_of_a_transaction_that_rolls_back(self):
+    with self.assertRaises(RuntimeError):
+      with self.dm.transaction():
+        self.cache.invalidate("Courses")
+        raise RuntimeError("rolled back")
+
+    self.assertEqual(self.versions, {})
+    self.assertEqual(self.database.log[-1], "ROLLBACK")
+
+if __name__ == "__main__":
+  unittest.main()
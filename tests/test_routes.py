@@ -0,0 +1,233 @@
+import html
+import re
+import unittest
+from unittest import mock
+from stand_ins import APP_DATABASE, app_client
+
+def queries_run():
+  """
+  Returns the queries the app ran on APP_DATABASE, leaving out transaction statements
+  """
+  return [query for query in APP_DATABASE.log if query not in ("BEGIN", "COMMIT", "ROLLBACK")]
+
+class RequestMetricsTest(unittest.TestCase):
+  def setUp(self):
+    self.client = app_client(self)
+    from blueprints.routes import dm
+    self.metrics = dm._metrics
+
+  def observed_queries(self, route):
+    histogram = self.metrics._request_queries.get(route)
+    return histogram.sum if histogram else 0
+
+  def test_counts_the_queries_of_a_page(self):
+    before = self.observed_queries("/terms")
+
+    self.client.get("/terms").close()
+
+    self.assertEqual(self.observed_queries("/terms") - before, len(queries_run()))
+
+  def test_counts_the_queries_a_streamed_page_runs_while_it_is_sent(self):
+    APP_DATABASE.on("FROM StudentTermPlans stp", lambda parameters: [(1, "A1", "Ada Lovelace", "Fall 2024", "CS161 INTRO I", "No")])
+    before = self.observed_queries("/student-term-plans")
+
+    response = self.client.get("/student-term-plans")
+    response.get_data()
+    response.close()
+
+    self.assertIn(b"Ada Lovelace", response.data)
+    self.assertEqual(self.observed_queries("/student-term-plans") - before, len(queries_run()))
+
+# Ordered by (lastName, studentID) like the students query
+STUDENTS = [("A3", "Grace", "Hopper"), ("A1", "Ada", "Lovelace"), ("A2", "Alan", "Turing")]
+
+def students_page(parameters):
+  """
+  Answers the students query, keeping the students after the cursor's (lastName, studentID) up to the limit
+  """
+  *after, limit = parameters
+  if after:
+    students = [student for student in STUDENTS if (student[2], student[0]) > (after[0], after[2])]
+  else:
+    students = STUDENTS
+  return students[:limit]
+
+class StudentsPageTest(unittest.TestCase):
+  def setUp(self):
+    self.client = app_client(self)
+    self.parameters = []
+    APP_DATABASE.on("FROM Students", lambda parameters: self.parameters.append(parameters) or students_page(parameters))
+
+  def get_page(self, url):
+    response = self.client.get(url)
+    body = response.get_data(as_text=True)
+    links = {name: html.unescape(href) for href, name in re.findall(r'<a href="([^"]*)">(First page|Next page)</a>', body)}
+    return response, body, links
+
+  def test_follows_the_next_page_link_to_the_rest_of_the_students(self):
+    response, body, links = self.get_page("/students?limit=2")
+
+    self.assertEqual(response.status_code, 200)
+    self.assertIn("Hopper", body)
+    self.assertIn("Lovelace", body)
+    self.assertNotIn("Turing", body)
+    self.assertEqual(list(links), ["Next page"])
+
+    response, body, links = self.get_page(links["Next page"])
+
+    self.assertEqual(response.status_code, 200)
+    self.assertIn("Turing", body)
+    self.assertNotIn("Lovelace", body)
+    self.assertEqual(list(links), ["First page"])
+    self.assertEqual(links["First page"], "/students?limit=2")
+
+  def test_asks_for_one_more_student_than_the_page_holds(self):
+    self.client.get("/students?limit=2")
+
+    self.assertIn("ORDER BY lastName ASC, studentID ASC LIMIT %s", APP_DATABASE.statements("FROM Students")[0])
+    self.assertEqual(self.parameters, [(3,)])
+
+  def test_rejects_a_malformed_cursor(self):
+    for cursor in ("not-a-cursor", "WzFd"):
+      with self.subTest(cursor=cursor):
+        self.assertEqual(self.client.get(f"/students?after={cursor}").status_code, 400)
+
+class ConditionalPageTest(unittest.TestCase):
+  def setUp(self):
+    self.client = app_client(self)
+    self.versions = {"Courses": 3}
+    APP_DATABASE.on("FROM DataVersions", lambda parameters: list(self.versions.items()))
+
+  def courses_read(self):
+    return [query for query in queries_run() if "DataVersions" not in query]
+
+  def test_tags_a_page_for_revalidation(self):
+    response = self.client.get("/courses")
+
+    self.assertEqual(response.status_code, 200)
+    self.assertTrue(response.headers["ETag"].startswith('W/"'))
+    self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+  def test_answers_a_matching_etag_without_running_the_page(self):
+    etag = self.client.get("/courses").headers["ETag"]
+    APP_DATABASE.log.clear()
+
+    response = self.client.get("/courses", headers={"If-None-Match": etag})
+
+    self.assertEqual(response.status_code, 304)
+    self.assertEqual(response.data, b"")
+    self.assertEqual(response.headers["ETag"], etag)
+    self.assertEqual(self.courses_read(), [])
+
+  def test_sends_the_page_again_once_a_table_it_reads_is_written(self):
+    etag = self.client.get("/courses").headers["ETag"]
+    self.versions["Courses_has_Prerequisites"] = 1
+
+    response = self.client.get("/courses", headers={"If-None-Match": etag})
+
+    self.assertEqual(response.status_code, 200)
+    self.assertNotEqual(response.headers["ETag"], etag)
+
+  def test_ignores_writes_to_tables_the_page_does_not_read(self):
+    etag = self.client.get("/courses").headers["ETag"]
+    self.versions["Students"] = 1
+
+    self.assertEqual(self.client.get("/courses", headers={"If-None-Match": etag}).status_code, 304)
+
+  def test_does_not_tag_error_responses(self):
+    response = self.client.get("/students?after=not-a-cursor")
+
+    self.assertEqual(response.status_code, 400)
+    self.assertNotIn("ETag", response.headers)
+
+class IdempotentRouteTest(unittest.TestCase):
+  def setUp(self):
+    self.client = app_client(self)
+    # IdempotencyKeys rows by key, as (requestPath, statusCode, responseBody), and the keys the next lookup misses
+    self.stored = {}
+    self.missed = set()
+    APP_DATABASE.on("FROM IdempotencyKeys WHERE", self.look_up)
+    APP_DATABASE.on("INSERT INTO IdempotencyKeys", self.store)
+
+  def look_up(self, parameters):
+    key = parameters[0]
+    if key in self.missed:
+      self.missed.remove(key)
+      return []
+    return [self.stored[key]] if key in self.stored else []
+
+  def store(self, parameters):
+    key, *response = parameters
+    if key in self.stored:
+      return 0
+    self.stored[key] = tuple(response)
+    return 1
+
+  def add_student(self, idempotency_key="key-1", path="/add-student"):
+    return self.client.post(path, json={"student_id": "A1", "first_name": "Ada", "last_name": "Lovelace"}, headers={"Idempotency-Key": idempotency_key})
+
+  def test_replays_the_stored_response_of_a_retried_request(self):
+    first = self.add_student()
+    retry = self.add_student()
+
+    self.assertEqual(first.status_code, 200)
+    self.assertEqual((retry.status_code, retry.get_json()), (200, first.get_json()))
+    self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+    self.assertNotIn("Idempotent-Replayed", first.headers)
+    self.assertEqual(len(APP_DATABASE.statements("INSERT INTO Students")), 1)
+
+  def test_rejects_a_key_reused_for_a_different_request(self):
+    self.add_student()
+
+    response = self.add_student(path="/add-term")
+
+    self.assertEqual(response.status_code, 422)
+    self.assertEqual(response.get_json()["message"], "The idempotency key has already been used for a different request.")
+
+  def test_rolls_back_and_replays_when_a_concurrent_request_stored_the_key_first(self):
+    # The other request stores its response after this request looked the key up
+    self.store(("key-1", "/add-student", 400, '{"message":"A student already exists for the provided student id."}'))
+    self.missed.add("key-1")
+
+    response = self.add_student()
+
+    self.assertEqual(response.status_code, 400)
+    self.assertEqual(response.get_json()["message"], "A student already exists for the provided student id.")
+    self.assertEqual(response.headers["Idempotent-Replayed"], "true")
+
+    # The student was inserted in the request's transaction, which rolled back
+    transaction = APP_DATABASE.log[APP_DATABASE.log.index("BEGIN"):]
+    self.assertEqual(len([query for query in transaction if query.startswith("INSERT INTO Students")]), 1)
+    self.assertIn("ROLLBACK", transaction)
+    self.assertNotIn("COMMIT", transaction)
+
+class StreamedPageTest(unittest.TestCase):
+  def setUp(self):
+    self.client = app_client(self)
+    from blueprints.routes import dm
+    self.pool = dm._pool
+    APP_DATABASE.on("FROM StudentTermPlans stp", lambda parameters: [(plan_id, "A1", f"Student {plan_id}", "Fall 2024", "CS161 INTRO I", "No") for plan_id in range(1, 4)])
+
+  def assertEveryConnectionReturned(self):
+    self.assertEqual(len(self.pool._idle), self.pool._size)
+
+  def test_streams_the_page_and_returns_the_connection(self):
+    response = self.client.get("/student-term-plans?limit=2")
+    body = response.get_data(as_text=True)
+    response.close()
+
+    self.assertEqual(response.status_code, 200)
+    self.assertIn("Student 2", body)
+    self.assertNotIn("Student 3", body)
+    self.assertEveryConnectionReturned()
+
+  def test_returns_the_connection_when_the_client_goes_away(self):
+    # Send every template output as its own piece, so the response is closed before the rows are read
+    with mock.patch("blueprints.routes.STREAM_CHUNK_SIZE", 1):
+      response = self.client.get("/student-term-plans?limit=2")
+      response.close()
+
+    self.assertEveryConnectionReturned()
+
+if __name__ == "__main__":
+  unittest.main()
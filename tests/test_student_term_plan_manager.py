@@ -0,0 +1,90 @@
+import unittest
+from contextlib import contextmanager
+from database.StudentTermPlanManager import StudentTermPlanManager
+
+class PlanCoursesTable:
+  """
+  Stands in for the DatabaseManager with an in-memory StudentTermPlans_has_Courses table
+  Statements are applied row by row and checked against the unique (studentTermPlanID, courseID) index like MySQL does
+  """
+
+  def __init__(self, rows):
+    self.rows = list(rows)
+    self.statements = []
+    self._depth = 0
+
+  def check_connection(self):
+    pass
+
+  def in_transaction(self):
+    return self._depth > 0
+
+  @contextmanager
+  def transaction(self):
+    self._depth += 1
+    try:
+      yield
+    finally:
+      self._depth -= 1
+
+  def execute_query(self, query, parameters=None, method=None, many=False):
+    statement = query.split()[0]
+    self.statements.append(statement)
+
+    if statement == "UPDATE":
+      changes = len(parameters) // 3
+      new_course_ids = dict(zip(parameters[0:changes * 2:2], parameters[1:changes * 2:2]))
+      plan_id = parameters[changes * 2]
+      for index, (row_plan_id, course_id) in enumerate(self.rows):
+        if row_plan_id == plan_id and course_id in new_course_ids:
+          row = (plan_id, new_course_ids[course_id])
+          if row in self.rows:
+            return (500, f"Duplicate entry '{plan_id}-{row[1]}' for key 'uq_student_term_plan_course'")
+          self.rows[index] = row
+
+    elif statement == "DELETE":
+      plan_id, *course_ids = parameters
+      self.rows = [row for row in self.rows if not (row[0] == plan_id and row[1] in course_ids)]
+
+    elif statement == "INSERT":
+      for row in parameters:
+        if row in self.rows:
+          return (500, f"Duplicate entry '{row[0]}-{row[1]}' for key 'uq_student_term_plan_course'")
+        self.rows.append(row)
+
+    return (200, "Commit successful")
+
+class QueryCacheStandIn:
+  def invalidate(self, *tables):
+    pass
+
+class UpdateCoursesTest(unittest.TestCase):
+  def manager(self, rows):
+    table = PlanCoursesTable(rows)
+    return StudentTermPlanManager(table, QueryCacheStandIn()), table
+
+  def test_replaces_courses_with_one_update(self):
+    manager, table = self.manager([(1, 10), (1, 20)])
+
+    manager.update_courses(1, [(10, 30)])
+
+    self.assertEqual(sorted(table.rows), [(1, 20), (1, 30)])
+    self.assertEqual(table.statements, ["UPDATE"])
+
+  def test_swaps_courses(self):
+    manager, table = self.manager([(1, 10), (1, 20), (2, 10)])
+
+    manager.update_courses(1, [(10, 20), (20, 10)])
+
+    self.assertEqual(sorted(table.rows), [(1, 10), (1, 20), (2, 10)])
+    self.assertEqual(table.statements, ["DELETE", "INSERT"])
+
+  def test_chains_courses(self):
+    manager, table = self.manager([(1, 10), (1, 20)])
+
+    manager.update_courses(1, [(10, 20), (20, 30)])
+
+    self.assertEqual(sorted(table.rows), [(1, 20), (1, 30)])
+
+if __name__ == "__main__":
+  unittest.main()